@@ -0,0 +1,144 @@
+"""Recommends the distribution and sort keys of a table from a data sample.
+
+Samples the table, from the local Parquet files or from a warehouse, and
+reports for the configured slice count:
+* the slice skew of every join (foreign key) column used as DISTKEY,
+* the share of blocks zone maps skip for common predicates under each
+  candidate compound SORTKEY,
+then prints the CREATE TABLE statement of SqlQueriesCreate with the
+recommended keys, and optionally writes it back with a schema migration
+recreating the table.
+
+Usage:
+    python ./analyze_keys.py --parquet ./data/sas_data --slices 8
+    python ./analyze_keys.py --dsn postgresql://user:pw@cluster:5439/dev --write
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+PLUGINS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'plugins')
+sys.path.insert(0, PLUGINS_DIR)
+
+from helpers.ddl import foreign_keys, set_table_keys
+from helpers.key_analysis import (DEFAULT_MAX_SKEW, DEFAULT_ROWS_PER_BLOCK, DEFAULT_SLICES,
+                                  Predicate, recommend_keys)
+from helpers.migrations import save_statements
+from helpers.sql_queries_create import SqlQueriesCreate
+
+SQL_QUERIES_CREATE = os.path.join(PLUGINS_DIR, 'helpers', 'sql_queries_create.py')
+
+
+def sample_parquet(path, columns, sample_rows, seed=0):
+    """Samples about `sample_rows` rows of the Parquet files under `path`.
+
+    Each row group contributes a binomially drawn number of rows, picked
+    without replacement and read with a single `take`; row groups drawing
+    no rows are not read.
+
+    Returns:
+        tuple: (pyarrow.Table sample, rows in all files)
+    """
+    files = [pq.ParquetFile(filename)
+             for filename in sorted(glob.glob(os.path.join(path, '**', '*.parquet'), recursive=True))]
+    total_rows = sum(parquet_file.metadata.num_rows for parquet_file in files)
+    fraction = min(sample_rows / total_rows, 1.0)
+    rng = np.random.default_rng(seed)
+    tables = []
+    for parquet_file in files:
+        for idx in range(parquet_file.num_row_groups):
+            num_rows = parquet_file.metadata.row_group(idx).num_rows
+            picked = rng.binomial(num_rows, fraction)
+            if not picked:
+                continue
+            table = parquet_file.read_row_group(idx, columns=columns)
+            if picked < num_rows:
+                table = table.take(pa.array(np.sort(rng.choice(num_rows, size=picked, replace=False))))
+            tables.append(table)
+    if not tables:
+        return pa.schema([files[0].schema_arrow.field(column) for column in columns]).empty_table(), total_rows
+    return pa.concat_tables(tables), total_rows
+
+
+def sample_warehouse(dsn, table, columns, sample_rows):
+    """Samples about `sample_rows` rows of a warehouse table.
+
+    Returns:
+        tuple: (pyarrow.Table sample, rows in the table, slices or None)
+    """
+    import psycopg2
+    with psycopg2.connect(dsn) as conn, conn.cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM {table}')
+        total_rows = cursor.fetchone()[0]
+        cursor.execute(f'SELECT {", ".join(columns)} FROM {table} WHERE RANDOM() < %s',
+                       (min(sample_rows / max(total_rows, 1), 1.0),))
+        rows = cursor.fetchall()
+        cursor.execute('SELECT version()')
+        slices = None
+        if 'redshift' in cursor.fetchone()[0].lower():
+            cursor.execute('SELECT COUNT(*) FROM stv_slices')
+            slices = cursor.fetchone()[0]
+    return pa.table({column: [row[i] for row in rows] for i, column in enumerate(columns)}), total_rows, slices
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--table', default='staging_immigration', help='table of SqlQueriesCreate')
+    parser.add_argument('--parquet', default='./data/sas_data', help='local Parquet files of the table')
+    parser.add_argument('--dsn', help='sample a warehouse instead of the local Parquet files')
+    parser.add_argument('--sample-rows', type=int, default=1000000)
+    parser.add_argument('--slices', type=int, help=f'default: stv_slices with --dsn, else {DEFAULT_SLICES}')
+    parser.add_argument('--rows-per-block', type=int, default=DEFAULT_ROWS_PER_BLOCK)
+    parser.add_argument('--max-skew', type=float, default=DEFAULT_MAX_SKEW)
+    parser.add_argument('--predicates', nargs='+', default=['arrdate:range:7', 'i94port:eq'],
+                        help="'column:eq' or 'column:range:width'")
+    parser.add_argument('--join-columns', nargs='*', help='default: the foreign keys of the table')
+    parser.add_argument('--write', action='store_true', help=f'rewrite {SQL_QUERIES_CREATE} and add a migration')
+    parser.add_argument('--description', help='description of the migration added by --write')
+    args = parser.parse_args()
+
+    attribute = f'{args.table}_create'
+    ddl = getattr(SqlQueriesCreate, attribute)
+    predicates = [Predicate.parse(spec) for spec in args.predicates]
+    join_columns = args.join_columns if args.join_columns is not None else [fk[0] for fk in foreign_keys(ddl)]
+    columns = list(dict.fromkeys(join_columns + [predicate.column for predicate in predicates]))
+
+    if args.dsn:
+        sample, table_rows, slices = sample_warehouse(args.dsn, f'public.{args.table}', columns, args.sample_rows)
+    else:
+        sample, table_rows = sample_parquet(args.parquet, columns, args.sample_rows)
+        slices = None
+    slices = args.slices or slices or DEFAULT_SLICES
+    print(f'{args.table}: {sample.num_rows} sampled of {table_rows} rows, {slices} slices', file=sys.stderr)
+
+    keys = recommend_keys(sample, join_columns, predicates, slices, table_rows,
+                          args.rows_per_block, args.max_skew)
+
+    print('DISTKEY candidates (skew = fullest slice / mean):')
+    for column, report in sorted(keys['skew'].items(), key=lambda item: item[1]['skew']):
+        print(f'  {column:<12} distinct {report["distinct"]:>8}  skew {report["skew"]:.2f}')
+    print('SORTKEY candidates (share of blocks skipped):')
+    for key, report in sorted(keys['pruning'].items(), key=lambda item: -sum(item[1].values())):
+        print(f'  {key:<24} ' + '  '.join(f'{p} {share:.0%}' for p, share in report.items()))
+    print('Recommendation: ' + json.dumps({k: keys[k] for k in ('diststyle', 'distkey', 'sortkey')}))
+
+    rewritten = set_table_keys(ddl, keys['diststyle'], keys['distkey'], keys['sortkey'])
+    print(rewritten)
+    if args.write:
+        description = args.description or f'Change the distribution and sort keys of {args.table}'
+        migration = save_statements({attribute: rewritten}, description)
+        if migration:
+            print(f'Updated {SQL_QUERIES_CREATE}; migration {migration[0]} recreates {", ".join(migration[1])}',
+                  file=sys.stderr)
+        else:
+            print(f'{SQL_QUERIES_CREATE} is up to date', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Benchmark of the import time and memory of dags/dag.py, as the scheduler parses it.
+
+Every run imports the DAG file in a clean interpreter, after importing
+Airflow itself so that its cost is reported separately. The benchmark fails
+when the median DAG import time exceeds the budget or when a module that
+should only be loaded inside execute() is imported at parse time.
+
+Usage:
+    I94_CONFIG=./i94.cfg python ./benchmarks/dag_parse_benchmark.py --runs 5 --budget-ms 500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DAG_FILE = os.path.join(ROOT, 'dags', 'dag.py')
+PLUGINS_DIR = os.path.join(ROOT, 'plugins')
+
+CHILD = """
+import importlib.util, json, resource, sys, time
+sys.path.insert(0, {plugins!r})
+start = time.perf_counter()
+import airflow.models
+airflow_seconds = time.perf_counter() - start
+airflow_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+loaded = set(sys.modules)
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location('i94_dag', {dag!r})
+spec.loader.exec_module(importlib.util.module_from_spec(spec))
+dag_seconds = time.perf_counter() - start
+print(json.dumps({{
+    'airflow_seconds': airflow_seconds,
+    'dag_seconds': dag_seconds,
+    'airflow_rss_kb': airflow_rss,
+    'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'modules': sorted({{name.split('.')[0] for name in set(sys.modules) - loaded}}),
+}}))
+"""
+
+
+def parse_once():
+    """Imports the DAG file in a fresh interpreter and returns its measurements."""
+    output = subprocess.run([sys.executable, '-c', CHILD.format(plugins=PLUGINS_DIR, dag=DAG_FILE)],
+                            check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=500, help='maximum median DAG import time')
+    parser.add_argument('--forbid', nargs='*', default=['pyspark', 'pyarrow', 'pandas', 'boto3'],
+                        help='top-level modules that must not be imported at parse time')
+    args = parser.parse_args()
+
+    runs = [parse_once() for _ in range(args.runs)]
+    dag_ms = statistics.median(run['dag_seconds'] for run in runs) * 1000
+    airflow_ms = statistics.median(run['airflow_seconds'] for run in runs) * 1000
+    peak_mb = max(run['peak_rss_kb'] for run in runs) / 1024
+    dag_mb = max(run['peak_rss_kb'] - run['airflow_rss_kb'] for run in runs) / 1024
+
+    print(f'airflow import: {airflow_ms:8.1f} ms (median of {args.runs})')
+    print(f'DAG import:     {dag_ms:8.1f} ms (median of {args.runs}, budget {args.budget_ms:.0f} ms)')
+    print(f'peak RSS:       {peak_mb:8.1f} MB ({dag_mb:.1f} MB over Airflow)')
+    print('modules loaded by the DAG: ' + ', '.join(runs[0]['modules']))
+
+    failures = []
+    if dag_ms > args.budget_ms:
+        failures.append(f'DAG import took {dag_ms:.1f} ms, over the {args.budget_ms:.0f} ms budget')
+    forbidden = sorted(set(args.forbid) & set(runs[0]['modules']))
+    if forbidden:
+        failures.append('heavy modules imported at parse time: ' + ', '.join(forbidden))
+    for failure in failures:
+        print('FAIL: ' + failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark of the dimension load paths against a local Postgres.
+
+Compares the staged bulk path (gzipped CSV + one COPY, replayed locally as
+COPY FROM STDIN) with the multi-row INSERT ... VALUES fallback at several
+batch sizes.
+
+Usage:
+    python ./benchmarks/dim_load_benchmark.py \
+        --dsn postgresql://postgres@localhost:5432/postgres --rows 100000
+"""
+import argparse
+import gzip
+import io
+import os
+import sys
+import time
+
+import psycopg2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'plugins'))
+
+from helpers.bulk_load import insert_values, rows_to_gzip_csv
+
+
+TABLE = 'bench_dim_i94port'
+COLUMNS = ['code', 'port']
+
+
+def synthetic_rows(n):
+    """Returns n code:label rows shaped like dim_i94port."""
+    return [[f'{i:06d}', f'PORT {i}, AK = X; Y'] for i in range(n)]
+
+
+def reset_table(conn):
+    with conn.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+        cursor.execute(f'CREATE TABLE {TABLE} (code VARCHAR PRIMARY KEY, port VARCHAR)')
+    conn.commit()
+
+
+def load_copy(conn, rows):
+    """Serializes to gzipped CSV and loads it with a single COPY."""
+    payload = rows_to_gzip_csv(rows)
+    with conn.cursor() as cursor:
+        cursor.copy_expert(f"COPY {TABLE} ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                           gzip.GzipFile(fileobj=io.BytesIO(payload)))
+    conn.commit()
+    return len(payload)
+
+
+def load_insert(conn, rows, batch_size):
+    """Loads with multi-row INSERT ... VALUES statements."""
+    with conn.cursor() as cursor:
+        insert_values(cursor, TABLE, COLUMNS, rows, batch_size)
+    conn.commit()
+
+
+def timed(conn, fn):
+    reset_table(conn)
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    with conn.cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM {TABLE}')
+        count = cursor.fetchone()[0]
+    return elapsed, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--dsn', required=True, help='libpq connection string for a local Postgres')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--batch-sizes', default='100,500,2000')
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.rows)
+    conn = psycopg2.connect(args.dsn)
+    try:
+        elapsed, count = timed(conn, lambda: load_copy(conn, rows))
+        print(f'copy (gzip csv): {count} rows in {elapsed:.2f} s ({count / elapsed:,.0f} rows/s)')
+
+        for batch_size in [int(b) for b in args.batch_sizes.split(',')]:
+            elapsed, count = timed(conn, lambda: load_insert(conn, rows, batch_size))
+            print(f'insert (batch {batch_size}): {count} rows in {elapsed:.2f} s '
+                  f'({count / elapsed:,.0f} rows/s)')
+    finally:
+        with conn.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+        conn.commit()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
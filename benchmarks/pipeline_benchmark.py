@@ -0,0 +1,256 @@
+"""End-to-end benchmark of i94_dag against local stand-ins for S3 and Redshift.
+
+Runs every task of the DAG in-process, in dependency order, on synthetic
+sources scaled from the real I94 volumes (see synthetic_i94.py):
+* S3 is an in-memory moto bucket,
+* Redshift is a local Postgres reached through warehouse_shim, which replays
+  the Redshift DDL and the COPYs from S3,
+* XComs are kept in memory.
+The immigration source is generated directly as sas_data Parquet, as there
+is no SAS7BDAT writer, so the SAS7BDAT conversion finds no file to convert.
+Reports the wall time of every task, the rows it processed per second and
+the MB/s of the S3 objects it reads. With --baseline, fails when a task is
+slower than in an earlier --output report by more than --tolerance.
+
+Needs Airflow 1.10, moto, psycopg2 and pyarrow.
+
+Usage:
+    python ./benchmarks/pipeline_benchmark.py --dsn postgresql://postgres@localhost:5432/postgres \
+        --scale 1 --output ./bench_1x.json
+    python ./benchmarks/pipeline_benchmark.py --dsn postgresql://postgres@localhost:5432/postgres \
+        --scale 1 --baseline ./bench_1x.json --tolerance 0.2
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DAG_FILE = os.path.join(ROOT, 'dags', 'dag.py')
+PLUGINS_DIR = os.path.join(ROOT, 'plugins')
+sys.path.insert(0, PLUGINS_DIR)
+
+import boto3
+
+import synthetic_i94
+import warehouse_shim
+from helpers.connections import ConnectionPool, register_pool
+from helpers.ddl import table_name
+from helpers.sql_queries_create import SqlQueriesCreate
+from helpers.swap_load import RETIRED_SUFFIX, SHADOW_SUFFIX
+from helpers.task_graph import critical_path
+
+BUCKET = 'i94-benchmark'
+REDSHIFT_CONN_ID = 'redshift'
+AWS_CONN_ID = 'aws_credentials'
+IAM_ROLE = 'arn:aws:iam::000000000000:role/benchmark'
+
+
+class LocalTaskInstance:
+    """In-memory stand-in for the XCom methods of a TaskInstance."""
+
+    def __init__(self, task_id, xcoms):
+        self.task_id = task_id
+        self.xcoms = xcoms
+
+    def xcom_push(self, key, value):
+        self.xcoms[(self.task_id, key)] = value
+
+    def xcom_pull(self, task_ids, key='return_value'):
+        if isinstance(task_ids, str):
+            return self.xcoms.get((task_ids, key))
+        return [self.xcoms.get((task_id, key)) for task_id in task_ids]
+
+
+def mock_s3():
+    """Returns the moto context standing in for S3."""
+    try:
+        from moto import mock_aws
+        return mock_aws()
+    except ImportError:
+        from moto import mock_s3 as mock
+        return mock()
+
+
+def configure(dsn, tmp_dir):
+    """Points the DAG config and its Airflow connections at the stand-ins."""
+    config_path = os.path.join(tmp_dir, 'i94.cfg')
+    with open(config_path, 'w') as f:
+        f.write(f'[S3]\nBUCKET={BUCKET}\n\n[IAM_ROLE]\nARN={IAM_ROLE}\n')
+    os.environ.update({
+        'I94_CONFIG': config_path,
+        'AWS_ACCESS_KEY_ID': 'benchmark',
+        'AWS_SECRET_ACCESS_KEY': 'benchmark',
+        'AWS_DEFAULT_REGION': 'us-east-1',
+        f'AIRFLOW_CONN_{AWS_CONN_ID.upper()}': 'aws://benchmark:benchmark@',
+        f'AIRFLOW_CONN_{REDSHIFT_CONN_ID.upper()}': dsn,
+    })
+
+
+def load_dag():
+    """Imports dags/dag.py, returning the module."""
+    spec = importlib.util.spec_from_file_location('i94_dag', DAG_FILE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def reset_warehouse(pool):
+    """Drops the tables of the DAG so every run starts from an empty warehouse."""
+    ddls = list(SqlQueriesCreate.dim_tables.values()) + list(SqlQueriesCreate.staging_tables.values())
+    with pool.session() as conn:
+        with conn.cursor() as cursor:
+            for name in [table_name(ddl) for ddl in ddls] + ['load_watermarks', 'schema_migrations']:
+                for suffix in ('', SHADOW_SUFFIX, RETIRED_SUFFIX):
+                    cursor.execute(f'DROP TABLE IF EXISTS public.{name}{suffix} CASCADE')
+
+
+def input_bytes(s3_client, task, context):
+    """Bytes of the S3 objects a task reads, 0 if it reads none."""
+    key = getattr(task, 's3_key', None)
+    if not key or not getattr(task, 's3_bucket', None):
+        return 0
+    key = key.format(**context)
+    paginator = s3_client.get_paginator('list_objects_v2')
+    return sum(obj['Size'] for page in paginator.paginate(Bucket=task.s3_bucket, Prefix=key)
+               for obj in page.get('Contents', []))
+
+
+def rows_processed(xcoms, task_id, result):
+    """Rows a task loaded or wrote, from its XComs or return value."""
+    rows = xcoms.get((task_id, 'rows_loaded'))
+    if rows is None and isinstance(result, dict):
+        rows = result.get('rows')
+    if rows is None and isinstance(result, int) and not isinstance(result, bool):
+        rows = result
+    return rows
+
+
+def run_dag(module, pool, s3_client, execution_date, cache_dir):
+    """Runs every task of the DAG in dependency order.
+
+    PostgresOperator tasks run their SQL through `pool`, as they would
+    otherwise open their own connection outside the shim.
+
+    Returns:
+        dict: {task_id: {'seconds', 'rows', 'bytes'}}
+    """
+    from airflow.operators.postgres_operator import PostgresOperator
+
+    dag = module.dag
+    xcoms = {}
+    report = {}
+    for task in dag.topological_sort():
+        if hasattr(task, 'cache_dir'):
+            task.cache_dir = cache_dir
+        context = {'dag': dag, 'task': task, 'execution_date': execution_date,
+                   'ds': execution_date.strftime('%Y-%m-%d'), 'ti': LocalTaskInstance(task.task_id, xcoms)}
+        size = input_bytes(s3_client, task, context)
+        start = time.perf_counter()
+        if isinstance(task, PostgresOperator):
+            with pool.session() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(task.sql)
+            result = None
+        else:
+            result = task.execute(context)
+        seconds = time.perf_counter() - start
+        if result is not None:
+            xcoms[(task.task_id, 'return_value')] = result
+        report[task.task_id] = {'seconds': seconds,
+                                'rows': rows_processed(xcoms, task.task_id, result),
+                                'bytes': size}
+        print(f'{task.task_id}: {seconds:.2f} s', file=sys.stderr)
+    return report
+
+
+def _cell(value, spec, width):
+    return ' ' * width if value is None else format(value, spec).rjust(width)
+
+
+def print_report(report, graph):
+    """Prints the throughput of every task and the critical path of the run."""
+    print(f'{"task":<52} {"seconds":>8} {"rows":>11} {"rows/s":>11} {"MB":>8} {"MB/s":>7}')
+    for task_id, stats in report.items():
+        rows, seconds = stats['rows'], stats['seconds']
+        mb = stats['bytes'] / 1e6 if stats['bytes'] else None
+        print(f'{task_id:<52} {seconds:>8.2f} {_cell(rows, ",", 11)} '
+              f'{_cell(rows / seconds if rows and seconds else None, ",.0f", 11)} '
+              f'{_cell(mb, ".1f", 8)} {_cell(mb / seconds if mb and seconds else None, ".1f", 7)}')
+    sequential = sum(stats['seconds'] for stats in report.values())
+    seconds, path = critical_path(graph, {task_id: stats['seconds'] for task_id, stats in report.items()})
+    print(f'Sequential: {sequential:.1f} s; critical path with parallel tasks: {seconds:.1f} s')
+    print('  ' + ' >> '.join(task_id for task_id in path if report[task_id]['seconds'] >= 0.01))
+
+
+def regressions(report, baseline, tolerance, min_seconds):
+    """Lists the tasks slower than in `baseline` by more than `tolerance`."""
+    slower = []
+    for task_id, stats in baseline['tasks'].items():
+        if task_id not in report or stats['seconds'] < min_seconds:
+            continue
+        ratio = report[task_id]['seconds'] / stats['seconds']
+        if ratio > 1 + tolerance:
+            slower.append(f'{task_id}: {report[task_id]["seconds"]:.2f} s vs {stats["seconds"]:.2f} s '
+                          f'({ratio - 1:+.0%})')
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--dsn', required=True, help='libpq connection string for a local Postgres')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiple of the real I94 volumes, e.g. 1, 10, 100')
+    parser.add_argument('--execution-date', help='default: the start_date of the DAG')
+    parser.add_argument('--output', help='write the report as JSON, e.g. to use as a --baseline')
+    parser.add_argument('--baseline', help='JSON report of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown per task')
+    parser.add_argument('--min-seconds', type=float, default=0.5, help='ignore faster baseline tasks')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir, mock_s3():
+        configure(args.dsn, tmp_dir)
+        module = load_dag()
+        execution_date = (datetime.strptime(args.execution_date, '%Y-%m-%d') if args.execution_date
+                          else module.dag.start_date)
+
+        start = time.perf_counter()
+        sources = synthetic_i94.generate(os.path.join(tmp_dir, 'bucket'), args.scale, execution_date,
+                                         module.SAS_LABELS_KEY)
+        generated = time.perf_counter() - start
+        s3_client = boto3.client('s3')
+        s3_client.create_bucket(Bucket=BUCKET)
+        size = synthetic_i94.upload(s3_client, BUCKET, os.path.join(tmp_dir, 'bucket'))
+        print(f'Scale {args.scale:g}: {sum(rows or 0 for rows in sources.values()):,} source rows, '
+              f'{size / 1e6:.1f} MB generated in {generated:.1f} s', file=sys.stderr)
+
+        pool = ConnectionPool(lambda: warehouse_shim.connect(args.dsn, s3_client))
+        register_pool(REDSHIFT_CONN_ID, pool)
+        reset_warehouse(pool)
+        try:
+            report = run_dag(module, pool, s3_client, execution_date, os.path.join(tmp_dir, 'sas_labels_cache'))
+        finally:
+            pool.close_all()
+
+    graph = {task.task_id: set(task.upstream_task_ids) for task in module.dag.tasks}
+    print_report(report, graph)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'scale': args.scale, 'execution_date': str(execution_date), 'tasks': report}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('scale') != args.scale:
+            print(f'Baseline was run at scale {baseline.get("scale")}, not {args.scale:g}')
+        slower = regressions(report, baseline, args.tolerance, args.min_seconds)
+        for line in slower:
+            print('REGRESSION: ' + line)
+        sys.exit(1 if slower else 0)
+
+
+if __name__ == '__main__':
+    main()
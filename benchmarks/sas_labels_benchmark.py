@@ -0,0 +1,94 @@
+"""Micro-benchmark for the streaming SAS labels tokenizer.
+
+Generates a synthetic labels file with the same layout as
+I94_SAS_Labels_Descriptions.SAS, scaled to the requested number of entries,
+and reports parse throughput and peak memory for both the full parse and the
+single-block streaming path.
+
+Usage:
+    python ./benchmarks/sas_labels_benchmark.py --entries 200000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'plugins'))
+
+from helpers.sas_labels import iter_sas_value, parse_sas_labels
+
+
+BLOCKS = ['i94cntyl', '$i94prtl', 'i94model', 'i94addrl']
+
+
+def write_synthetic_labels(path, entries):
+    """Writes a synthetic SAS labels file.
+
+    Args:
+        path (str): destination file.
+        entries (int): total number of code:label pairs across all blocks.
+    """
+    per_block = entries // len(BLOCKS)
+    with open(path, 'w') as f:
+        f.write("libname library 'Your file location' ;\nproc format library=library ;\n\n")
+        for block in BLOCKS:
+            f.write(f'/* {block.lstrip("$").upper()} - synthetic block */\n')
+            f.write(f'  value {block}\n')
+            for i in range(per_block):
+                if i % 3 == 0:
+                    f.write(f"\t'{i:06d}'\t=\t'PORT {i}, AK = X; Y       '\n")
+                else:
+                    f.write(f"   {i} =  'LABEL {i}'\n")
+            f.write(';\n\n')
+        f.write('/* I94VISA - Visa codes collapsed into three categories:\n')
+        f.write('   1 = Business\n   2 = Pleasure\n   3 = Student\n*/\n')
+
+
+def measure(fn):
+    """Runs fn and returns (result, seconds, peak traced memory in bytes).
+
+    Timing and memory are measured in separate runs, as tracing every
+    allocation slows the parse down by several times.
+    """
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--entries', type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'labels.SAS')
+        write_synthetic_labels(path, args.entries)
+        size_mb = os.path.getsize(path) / 1e6
+        print(f'Synthetic labels file: {args.entries} entries, {size_mb:.1f} MB')
+
+        def full_parse():
+            with open(path) as f:
+                return sum(len(rows) for rows in parse_sas_labels(f).values())
+
+        def stream_block():
+            with open(path) as f:
+                return sum(1 for _ in iter_sas_value(f, 'i94addrl'))
+
+        for name, fn in [('parse_sas_labels (all blocks)', full_parse),
+                         ('iter_sas_value (last block, streamed)', stream_block)]:
+            count, elapsed, peak = measure(fn)
+            print(f'{name}: {count} pairs in {elapsed:.2f} s '
+                  f'({count / elapsed:,.0f} pairs/s, {size_mb / elapsed:.1f} MB/s), '
+                  f'peak memory {peak / 1e6:.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+"""Synthetic I94 sources shaped like the files copy_data_to_s3.py uploads.
+
+Writes, at a multiple of the real volumes, the immigration Parquet partition
+of an execution date, the temperature, airport and demographics CSVs and the
+SAS labels file, under the keys of `s3_table_keys`. Rows are generated and
+written in chunks, so memory use does not grow with the scale.
+
+Usage (standalone, to a local directory):
+    python ./benchmarks/synthetic_i94.py --scale 0.1 --output ./data/synthetic
+"""
+import argparse
+import itertools
+import os
+import string
+import sys
+import tempfile
+from datetime import date, datetime
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'plugins'))
+
+from helpers.table_configs import s3_table_keys
+
+
+# Rows of the real sources: one month of immigration (April 2016), and the
+# full temperature, airport and demographics files.
+BASE_ROWS = {
+    'public.staging_immigration': 3096313,
+    'public.staging_temperature': 8599212,
+    'public.staging_airports': 55075,
+    'public.staging_demographics': 2891,
+}
+CHUNK_ROWS = 500000
+ROWS_PER_PARQUET_FILE = 1000000
+
+SAS_EPOCH = date(1960, 1, 1)
+COUNTRY_CODES = [float(code) for code in range(101, 390)]
+PORT_CODES = [''.join(letters) for letters in itertools.islice(itertools.product(string.ascii_uppercase, repeat=3), 660)]
+STATE_CODES = [''.join(letters) for letters in itertools.islice(itertools.product(string.ascii_uppercase, repeat=2), 55)]
+MODE_CODES = [1.0, 2.0, 3.0, 9.0]
+VISA_CODES = [1.0, 2.0, 3.0]
+CITIES = ['City {}'.format(i) for i in range(3490)]
+TEMPERATURE_MONTHS = (2013 - 1743) * 12 - 1
+RACES = ['White', 'Hispanic or Latino', 'Asian', 'Black or African-American', 'American Indian and Alaska Native']
+
+
+def _choice(values, r):
+    """Picks values by uniform randoms in [0, 1)."""
+    return pc.take(pa.array(values), pc.cast(pc.floor(pc.multiply(r, len(values))), pa.int64()))
+
+
+def _integers(r, low, high):
+    """Scales uniform randoms in [0, 1) to integers in [low, high)."""
+    return pc.add(pc.floor(pc.multiply(r, high - low)), float(low))
+
+
+def _randoms(n, seed):
+    return pc.random(n, initializer=seed)
+
+
+def _nulls(values, r, share):
+    """Nulls a `share` of the values."""
+    return pc.if_else(pc.less(r, share), pa.scalar(None, values.type), values)
+
+
+def _strftime(sas_days, date_format):
+    unix_days = pc.cast(pc.add(sas_days, float((SAS_EPOCH - date(1970, 1, 1)).days)), pa.int32())
+    return pc.strftime(pc.cast(pc.cast(unix_days, pa.date32()), pa.timestamp('s')), format=date_format)
+
+
+def immigration_batch(start, n, execution_date, seed):
+    """Rows of sas_data, with the SAS day offsets and date strings of the real files."""
+    r = lambda i: _randoms(n, seed * 100 + i)
+    month_start = float((date(execution_date.year, execution_date.month, 1) - SAS_EPOCH).days)
+    arrdate = pc.add(_integers(r(0), 0, 28), month_start)
+    depdate = _nulls(pc.add(arrdate, _integers(r(1), 0, 30)), r(2), 0.05)
+    i94bir = _integers(r(3), 1, 90)
+    dtaddto = pc.if_else(pc.less(r(4), 0.02), pa.scalar('D/S'),
+                         _strftime(pc.add(arrdate, 180.0), '%m%d%Y'))
+    columns = {
+        'cicid': pa.array(range(start, start + n), pa.float64()),
+        'i94yr': pa.repeat(pa.scalar(float(execution_date.year)), n),
+        'i94mon': pa.repeat(pa.scalar(float(execution_date.month)), n),
+        'i94cit': _choice(COUNTRY_CODES, r(5)),
+        'i94res': _choice(COUNTRY_CODES, r(6)),
+        'i94port': _choice(PORT_CODES, r(7)),
+        'arrdate': arrdate,
+        'i94mode': _choice(MODE_CODES, r(8)),
+        'i94addr': _nulls(_choice(STATE_CODES, r(9)), r(10), 0.05),
+        'depdate': depdate,
+        'i94bir': i94bir,
+        'i94visa': _choice(VISA_CODES, r(11)),
+        'count': pa.repeat(pa.scalar(1.0), n),
+        'dtadfile': _strftime(arrdate, '%Y%m%d'),
+        'visapost': _nulls(_choice(PORT_CODES[:120], r(12)), r(13), 0.6),
+        'occup': _nulls(_choice(['STU', 'OTH', 'MKT'], r(14)), r(15), 0.99),
+        'entdepa': _choice(['G', 'T', 'O', 'A'], r(16)),
+        'entdepd': _nulls(_choice(['O', 'R', 'K', 'N'], r(17)), r(2), 0.05),
+        'entdepu': _nulls(_choice(['Y', 'U'], r(18)), r(19), 0.99),
+        'matflag': _nulls(pa.repeat(pa.scalar('M'), n), r(2), 0.05),
+        'biryear': pc.subtract(float(execution_date.year), i94bir),
+        'dtaddto': dtaddto,
+        'gender': _nulls(_choice(['M', 'F', 'X'], r(20)), r(21), 0.1),
+        'insnum': _nulls(_choice([str(i) for i in range(1000, 5000)], r(22)), r(23), 0.96),
+        'airline': _choice(['AA', 'UA', 'DL', 'BA', 'LH', 'AF', 'QF', 'EK'], r(24)),
+        'admnum': _integers(r(25), 10 ** 9, 10 ** 11),
+        'fltno': _choice([str(i).zfill(5) for i in range(1, 2000)], r(26)),
+        'visatype': _choice(['WT', 'B2', 'WB', 'B1', 'F1', 'E2', 'F2', 'GMT'], r(27)),
+    }
+    return pa.table(columns)
+
+
+def _remainder(values, divisor):
+    return pc.subtract(values, pc.multiply(pc.divide(values, divisor), divisor))
+
+
+def _coordinate(city_index, limit, factor, positive, negative):
+    """Coordinate of a city such as '57.05N', spread over [0, limit) by the fractional part of city_index * factor."""
+    scaled = pc.multiply(pc.cast(city_index, pa.float64()), factor)
+    fraction = pc.subtract(scaled, pc.floor(scaled))
+    degrees = pc.cast(pc.round(pc.multiply(fraction, limit), 2), pa.string())
+    hemisphere = pc.if_else(pc.less(_remainder(city_index, 3), 1), negative, positive)
+    return pc.binary_join_element_wise(degrees, hemisphere, '')
+
+
+def temperature_batch(start, n, seed):
+    """Rows of GlobalLandTemperaturesByCity.csv: every city monthly from Nov 1743 to Sep 2013.
+
+    As in the real file, about 7% of the cities are in the United States and
+    the coordinates of a city are the same on all its rows.
+    """
+    r = lambda i: _randoms(n, seed * 100 + i)
+    index = pa.array(range(start, start + n), pa.int64())
+    city_index = pc.divide(index, TEMPERATURE_MONTHS)
+    months = pc.add(_remainder(index, TEMPERATURE_MONTHS), 1743 * 12 + 10)
+    years = pc.divide(months, 12)
+    month_of_year = pc.add(_remainder(months, 12), 1)
+    dt = pc.binary_join_element_wise(pc.cast(years, pa.string()),
+                                     pc.utf8_lpad(pc.cast(month_of_year, pa.string()), 2, '0'),
+                                     pa.scalar('01'), '-')
+    city_number = pc.cast(city_index, pa.string())
+    country = pc.if_else(pc.equal(_remainder(city_index, 14), 0), pa.scalar('United States'),
+                         pc.binary_join_element_wise(pa.scalar('Country'),
+                                                     pc.cast(_remainder(city_index, 159), pa.string()), ' '))
+    return pa.table({
+        'dt': dt,
+        'AverageTemperature': _nulls(pc.round(pc.subtract(pc.multiply(r(0), 45.0), 10.0), 3), r(1), 0.04),
+        'AverageTemperatureUncertainty': _nulls(pc.round(pc.multiply(r(2), 5.0), 3), r(1), 0.04),
+        'City': pc.binary_join_element_wise(pa.scalar('City'), city_number, ' '),
+        'Country': country,
+        'Latitude': _coordinate(city_index, 70.0, 0.618034, 'N', 'S'),
+        'Longitude': _coordinate(city_index, 180.0, 0.732051, 'E', 'W'),
+    })
+
+
+def airports_batch(start, n, seed):
+    """Rows of airport-codes_csv.csv."""
+    r = lambda i: _randoms(n, seed * 100 + i)
+    ident = pc.cast(pa.array(range(start, start + n)), pa.string())
+    # Airports of the port cities are in the state of the port label.
+    city_index = pc.cast(pc.floor(pc.multiply(r(6), len(CITIES))), pa.int64())
+    return pa.table({
+        'ident': pc.binary_join_element_wise(pa.scalar('X'), ident, ''),
+        'type': _choice(['small_airport', 'heliport', 'medium_airport', 'closed', 'large_airport'], r(0)),
+        'name': pc.binary_join_element_wise(pa.scalar('Airport'), ident, ' '),
+        'elevation_ft': _nulls(_integers(r(1), -100, 12000), r(2), 0.13),
+        'continent': _choice(['NA', 'SA', 'EU', 'AS', 'AF', 'OC', 'AN'], r(3)),
+        'iso_country': _choice(['US', 'BR', 'CA', 'AU', 'KR', 'MX', 'RU'], r(4)),
+        'iso_region': pc.binary_join_element_wise(pa.scalar('US'),
+                                                  pc.take(pa.array(STATE_CODES), _remainder(city_index, len(STATE_CODES))),
+                                                  '-'),
+        'municipality': _nulls(pc.take(pa.array(CITIES), city_index), r(7), 0.1),
+        'gps_code': _nulls(_choice(PORT_CODES, r(8)), r(9), 0.25),
+        'iata_code': _nulls(_choice(PORT_CODES, r(10)), r(11), 0.83),
+        'local_code': _nulls(_choice(PORT_CODES, r(12)), r(13), 0.48),
+        'coordinates': pc.binary_join_element_wise(pc.cast(pc.round(pc.multiply(r(14), 180.0), 4), pa.string()),
+                                                   pc.cast(pc.round(pc.multiply(r(15), 90.0), 4), pa.string()),
+                                                   ', '),
+    })
+
+
+def demographics_batch(start, n, seed):
+    """Rows of us-cities-demographics.csv: one per city and race, for five races per city."""
+    r = lambda i: _randoms(n, seed * 100 + i)
+    index = pa.array(range(start, start + n), pa.int64())
+    city_index = pc.divide(index, len(RACES))
+    male = _integers(r(0), 1000, 2000000)
+    female = _integers(r(1), 1000, 2000000)
+    return pa.table({
+        'City': pc.take(pa.array(CITIES), _remainder(city_index, len(CITIES))),
+        'State': pc.binary_join_element_wise(pa.scalar('State'), pc.cast(_remainder(city_index, 49), pa.string()), ' '),
+        'Median Age': pc.divide(_integers(r(4), 220, 700), 10.0),
+        'Male Population': pc.cast(male, pa.int64()),
+        'Female Population': pc.cast(female, pa.int64()),
+        'Total Population': pc.cast(pc.add(male, female), pa.int64()),
+        'Number of Veterans': pc.cast(_integers(r(5), 0, 150000), pa.int64()),
+        'Foreign-born': pc.cast(_integers(r(6), 0, 1500000), pa.int64()),
+        'Average Household Size': pc.round(pc.divide(_integers(r(7), 200, 500), 100.0), 2),
+        'State Code': _choice(STATE_CODES, r(8)),
+        'Race': pc.take(pa.array(RACES), _remainder(index, len(RACES))),
+        'Count': pc.cast(_integers(r(10), 100, 1000000), pa.int64()),
+    })
+
+
+def write_labels(path):
+    """Writes a SAS labels file with the blocks and sizes of the real one."""
+    with open(path, 'w') as f:
+        f.write("libname library 'Your file location' ;\nproc format library=library ;\n\n")
+        f.write('/* I94CIT & I94RES - This format shows all the valid and invalid codes for processing */\n')
+        f.write('  value i94cntyl\n')
+        f.writelines(f"   {int(code)} =  'COUNTRY {int(code)}'\n" for code in COUNTRY_CODES)
+        f.write(';\n\n/* I94PORT - This format shows all the valid and invalid codes for processing */\n')
+        f.write('  value $i94prtl\n')
+        f.writelines(f"\t'{code}'\t=\t'{CITIES[i].upper()}, {STATE_CODES[i % len(STATE_CODES)]}             '\n"
+                     for i, code in enumerate(PORT_CODES))
+        f.write(';\n\n/* I94MODE - There are missing values as well as not reported (9) */\n')
+        f.write("\tvalue i94model\n\t1 = 'Air'\n\t2 = 'Sea'\n\t3 = 'Land'\n\t9 = 'Not reported' ;\n\n")
+        f.write('/* I94ADDR - There is lots of invalid codes in this variable */\n\tvalue i94addrl\n')
+        f.writelines(f"\t'{code}'='STATE {code}'\n" for code in STATE_CODES)
+        f.write(';\n\n/* I94VISA - Visa codes collapsed into three categories:\n')
+        f.write('   1 = Business\n   2 = Pleasure\n   3 = Student\n*/\n')
+
+
+def _write_csv(path, batches, delimiter):
+    with open(path, 'wb') as f:
+        for idx, batch in enumerate(batches):
+            pv.write_csv(batch, f, write_options=pv.WriteOptions(include_header=idx == 0, delimiter=delimiter))
+
+
+def _batches(make_batch, rows, seed, **kwargs):
+    for idx, start in enumerate(range(0, rows, CHUNK_ROWS)):
+        yield make_batch(start, min(CHUNK_ROWS, rows - start), seed=seed + idx, **kwargs)
+
+
+def generate(output_dir, scale, execution_date, labels_key, seed=0):
+    """Writes the synthetic sources under `output_dir`, as they are laid out in S3.
+
+    Args:
+        output_dir (str): local directory standing for the bucket root.
+        scale (float): multiple of the real volumes, e.g. 1, 10 or 100.
+        execution_date (datetime): run whose immigration partition is written.
+        labels_key (str): key of the SAS labels file.
+        seed (int): random seed.
+    Returns:
+        dict: {key: rows} of the written sources.
+    """
+    written = {}
+    for table in s3_table_keys:
+        if 'lookup_prefix' in table:
+            # Built by the DAG from the other sources.
+            continue
+        rows = max(int(BASE_ROWS[table['name']] * scale), 1)
+        key = table['key'].format(execution_date=execution_date)
+        path = os.path.join(output_dir, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if table['name'] == 'public.staging_immigration':
+            for idx, start in enumerate(range(0, rows, ROWS_PER_PARQUET_FILE)):
+                part_rows = min(ROWS_PER_PARQUET_FILE, rows - start)
+                part_path = os.path.join(path, 'part-{:05d}.snappy.parquet'.format(idx))
+                writer = None
+                for batch_start in range(start, start + part_rows, CHUNK_ROWS):
+                    batch = immigration_batch(batch_start, min(CHUNK_ROWS, start + part_rows - batch_start),
+                                              execution_date, seed + batch_start // CHUNK_ROWS)
+                    if writer is None:
+                        writer = pq.ParquetWriter(part_path, batch.schema, compression='snappy')
+                    writer.write_table(batch)
+                writer.close()
+                written[os.path.relpath(part_path, output_dir)] = part_rows
+            continue
+        make_batch = {'public.staging_temperature': temperature_batch,
+                      'public.staging_airports': airports_batch,
+                      'public.staging_demographics': demographics_batch}[table['name']]
+        _write_csv(path, _batches(make_batch, rows, seed), table['sep'])
+        written[key] = rows
+
+    labels_path = os.path.join(output_dir, labels_key)
+    os.makedirs(os.path.dirname(labels_path), exist_ok=True)
+    write_labels(labels_path)
+    written[labels_key] = None
+    return written
+
+
+def upload(s3_client, bucket, output_dir):
+    """Uploads the files under `output_dir` to `bucket` under their relative paths.
+
+    Returns:
+        int: bytes uploaded.
+    """
+    size = 0
+    for root, _, files in os.walk(output_dir):
+        for filename in files:
+            path = os.path.join(root, filename)
+            s3_client.upload_file(path, bucket, os.path.relpath(path, output_dir).replace(os.sep, '/'))
+            size += os.path.getsize(path)
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--scale', type=float, default=1.0, help='multiple of the real volumes')
+    parser.add_argument('--execution-date', default='2016-04-01')
+    parser.add_argument('--labels-key', default='i94_data/I94_SAS_Labels_Descriptions.SAS')
+    parser.add_argument('--output', default=os.path.join(tempfile.gettempdir(), 'synthetic_i94'))
+    args = parser.parse_args()
+
+    execution_date = datetime.strptime(args.execution_date, '%Y-%m-%d')
+    for key, rows in generate(args.output, args.scale, execution_date, args.labels_key).items():
+        print(f'{key}: {rows if rows is not None else "-"} rows')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""Local Postgres stand-in for the Redshift statements issued by the DAG.
+
+Connections opened with `connect` translate, on every cursor:
+* CREATE TABLE statements, dropping the Redshift-only attributes (DISTSTYLE,
+  DISTKEY, SORTKEY, ENCODE) and the primary and foreign keys, which Redshift
+  does not enforce either;
+* the COPY statements built by CopyToRedshiftOperator.build_copy_sql, which
+  are replayed as a single COPY FROM STDIN streaming the S3 objects (Parquet
+  files are re-encoded to CSV on the fly), so the cursor rowcount is the
+  number of rows loaded.
+"""
+import gzip
+import io
+import re
+import tempfile
+
+import psycopg2
+import psycopg2.extensions
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+
+_COPY = re.compile(r"^\s*COPY\s+(?P<table>[\w.]+)\s*(?:\((?P<columns>[^)]*)\))?\s+"
+                   r"FROM\s+'s3://(?P<bucket>[^/']+)/(?P<key>[^']*)'(?P<options>.*)$",
+                   re.IGNORECASE | re.DOTALL)
+_IGNORE_HEADER = re.compile(r'\bIGNOREHEADER\s+(\d+)', re.IGNORECASE)
+_DELIMITER = re.compile(r"\bDELIMITER\s+'([^']*)'", re.IGNORECASE)
+_CREATE_TABLE = re.compile(r'^\s*CREATE\s+TABLE\b', re.IGNORECASE)
+_REDSHIFT_DDL = [
+    re.compile(r'\s+REFERENCES\s+[\w.]+\s*\(\s*\w+\s*\)', re.IGNORECASE),
+    re.compile(r'\s+PRIMARY\s+KEY\b', re.IGNORECASE),
+    re.compile(r'\s+ENCODE\s+\w+', re.IGNORECASE),
+    re.compile(r'\s+DISTSTYLE\s+\w+', re.IGNORECASE),
+    re.compile(r'\s+(?:(?:COMPOUND|INTERLEAVED)\s+)?(?:DISTKEY|SORTKEY)\s*\([^)]*\)', re.IGNORECASE),
+    re.compile(r'\s+(?:DISTKEY|SORTKEY)\b', re.IGNORECASE),
+]
+
+CHUNK_SIZE = 1024 ** 2
+
+
+def translate_ddl(sql):
+    """Removes the Redshift-only clauses of a CREATE TABLE statement."""
+    for pattern in _REDSHIFT_DDL:
+        sql = pattern.sub('', sql)
+    return sql
+
+
+def parse_copy(sql):
+    """Parses a COPY statement built by CopyToRedshiftOperator.build_copy_sql.
+
+    Returns:
+        dict: table, columns, bucket, key, parquet, gzip,
+            ignore_headers and delimiter; None for any other statement.
+    """
+    match = _COPY.match(sql)
+    if not match:
+        return None
+    options = match.group('options')
+    ignore_headers = _IGNORE_HEADER.search(options)
+    delimiter = _DELIMITER.search(options)
+    return {'table': match.group('table'),
+            'columns': match.group('columns'),
+            'bucket': match.group('bucket'),
+            'key': match.group('key'),
+            'parquet': re.search(r'\bPARQUET\b', options, re.IGNORECASE) is not None,
+            'gzip': re.search(r'\bGZIP\b', options, re.IGNORECASE) is not None,
+            'ignore_headers': int(ignore_headers.group(1)) if ignore_headers else 0,
+            'delimiter': delimiter.group(1) if delimiter else ','}
+
+
+def source_objects(s3_client, copy):
+    """Lists the (bucket, key) of the objects a parsed COPY loads.
+
+    As on Redshift, every object under the key prefix is loaded.
+    """
+    paginator = s3_client.get_paginator('list_objects_v2')
+    return [(copy['bucket'], obj['Key'])
+            for page in paginator.paginate(Bucket=copy['bucket'], Prefix=copy['key'])
+            for obj in page.get('Contents', [])]
+
+
+def _parquet_chunks(s3_client, bucket, key):
+    """Streams a Parquet object as header-less CSV."""
+    with tempfile.TemporaryFile() as f:
+        s3_client.download_fileobj(bucket, key, f)
+        f.seek(0)
+        for batch in pq.ParquetFile(f).iter_batches():
+            buffer = io.BytesIO()
+            pv.write_csv(batch, buffer, write_options=pv.WriteOptions(include_header=False))
+            yield buffer.getvalue()
+
+
+def _csv_chunks(s3_client, bucket, key, compressed, ignore_headers):
+    """Streams a CSV object without its header lines."""
+    body = s3_client.get_object(Bucket=bucket, Key=key)['Body']
+    stream = io.BufferedReader(gzip.GzipFile(fileobj=body) if compressed else body, CHUNK_SIZE)
+    for _ in range(ignore_headers):
+        stream.readline()
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+        yield chunk
+
+
+class ChunkReader(io.RawIOBase):
+    """Read-only file object over an iterator of byte strings."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buffer:
+            self._buffer = next(self._chunks, None)
+            if self._buffer is None:
+                self._buffer = b''
+                return 0
+        size = min(len(b), len(self._buffer))
+        b[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+class ShimCursor(psycopg2.extensions.cursor):
+    """Cursor replaying Redshift DDL and S3 COPY statements on Postgres."""
+
+    def execute(self, query, vars=None):
+        copy = parse_copy(query) if isinstance(query, str) else None
+        if copy:
+            return self.copy_from_s3(copy)
+        if isinstance(query, str) and _CREATE_TABLE.match(query):
+            query = translate_ddl(query)
+        return super(ShimCursor, self).execute(query, vars)
+
+    def copy_from_s3(self, copy):
+        """Loads the objects of a parsed COPY in one COPY FROM STDIN."""
+        s3_client = self.connection.s3_client
+
+        def chunks():
+            for bucket, key in source_objects(s3_client, copy):
+                if copy['parquet']:
+                    yield from _parquet_chunks(s3_client, bucket, key)
+                else:
+                    yield from _csv_chunks(s3_client, bucket, key, copy['gzip'], copy['ignore_headers'])
+
+        columns = ' ({})'.format(copy['columns']) if copy['columns'] else ''
+        delimiter = ',' if copy['parquet'] else copy['delimiter']
+        sql = "COPY {}{} FROM STDIN WITH (FORMAT csv, DELIMITER '{}')".format(copy['table'], columns, delimiter)
+        self.copy_expert(sql, ChunkReader(chunks()), size=CHUNK_SIZE)
+
+
+class ShimConnection(psycopg2.extensions.connection):
+    """Connection whose cursors are ShimCursors reading from `s3_client`."""
+
+    s3_client = None
+
+    def cursor(self, *args, **kwargs):
+        kwargs.setdefault('cursor_factory', ShimCursor)
+        return super(ShimConnection, self).cursor(*args, **kwargs)
+
+
+def connect(dsn, s3_client):
+    """Opens a Postgres connection standing in for Redshift.
+
+    Args:
+        dsn (str): libpq connection string of a local Postgres.
+        s3_client (boto client object): client of the S3 stand-in.
+    Returns:
+        ShimConnection
+    """
+    conn = psycopg2.connect(dsn, connection_factory=ShimConnection)
+    conn.s3_client = s3_client
+    return conn
@@ -1,77 +1,220 @@
 import os
+import time
 import boto3
+import hashlib
+import sqlite3
 import configparser
-from botocore.exceptions import ClientError
-
-def upload_file_to_S3(filename, key, bucket_name):
-	"""Uploads a file to an S3 bucket.
-	
-	Args:
-		filename (str): the path to the file to be uploaded.
-		key (str): the path to save the file in the bucket.
-		bucket_name (str): the name of the S3 bucket.
-	"""
-    s3.Bucket(bucket_name).upload_file(filename, key)
-
-def check_exists(s3_service, bucket_name, key):
-	"""Checks if a file already exists in a S3 Bucket.
-	
-	Args:
-		s3_service (boto resource object): the s3 access object.
-		bucket_name (str): the name of the S3 bucket.
-		key (str): the path to save the file in the bucket.
-	Returns:
-		True if file exists in S3 bucket, else False
-	"""
-	
-    try:
-        s3_service.Object(bucket_name, key).load()
-    except ClientError as e:
-        return int(e.response['Error']['Code']) != 404
-    return True
-
-
-if __init__ == "__main__":
-	# Parse the config file
-	config_file = './i94.cfg'
-	assert(os.path.exists(config_file)),
-		f"Config file not found at {config_file}"
-	config = configparser.ConfigParser()
-	config.read(config_file)
-
-	REDSHIFT_ARN = config['IAM_ROLE']['ARN']
-	S3_BUCKET = config['S3']['BUCKET']
-
-	# Create the S3 Object
-	s3 = boto3.resource('s3')
-
-	# Set the paths for the data in Udacity Workspace
-	immigration_dir = os.path.abspath('../../data/18-83510-I94-Data-2016')
-	sas_data_dir = os.path.abspath('./data/sas_data')
-	
-	# Gather data files
-	source_immigration_data = [os.path.join(immigration_dir, f) for f in os.listdir(immigration_dir)]
-	source_sas_data = [os.path.join(sas_data_dir, f) for f in os.listdir(sas_data_dir)]
-	source_temperature_data = [os.path.abspath('../../data2/GlobalLandTemperaturesByCity.csv')]
-	source_airport_data = [os.path.abspath('./data/airport-codes_csv.csv')]
-	source_us_cities_demographics = [os.path.abspath('./data/us-cities-demographics.csv')]
-
-	# Upload the data to S3
-	upload_dict = {'immigration': source_immigration_data,
-				'sas_data': source_sas_data,
-				'temperature': source_temperature_data,
-				'airport': source_airport_data,
-				'demographics': source_us_cities_demographics}
-
-	print(f'S3 Bucket: {S3_BUCKET}')
-	for dataset_name in upload_dict.keys():
-		print(f'Copying: {dataset_name}')
-		filenames = upload_dict[dataset_name]
-		for filename in filenames:
-			s3_filepath = os.path.join(dataset_name, os.path.basename(filename))
-			if not check_exists(s3, S3_BUCKET, s3_filepath):
-				print(f'\tCopying {os.path.basename(filename)} ...', end='', flush=True)
-				upload_file_to_S3(filename, s3_filepath, S3_BUCKET)
-				print('done!')
-			else:
-				print(f'\tExists: {s3_filepath}')
\ No newline at end of file
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from boto3.s3.transfer import TransferConfig
+
+MB = 1024 ** 2
+
+
+def upload_file_to_S3(s3_client, filename, key, bucket_name, transfer_config):
+    """Uploads a file to an S3 bucket, using multipart uploads for large files.
+
+    Args:
+        s3_client (boto client object): the s3 client.
+        filename (str): the path to the file to be uploaded.
+        key (str): the path to save the file in the bucket.
+        bucket_name (str): the name of the S3 bucket.
+        transfer_config (TransferConfig): multipart chunk size and concurrency.
+    Returns:
+        int: the number of bytes uploaded.
+    """
+    s3_client.upload_file(filename, bucket_name, key, Config=transfer_config)
+    return os.path.getsize(filename)
+
+
+def list_existing_keys(s3_client, bucket_name, prefix):
+    """Lists every key under a prefix with one paginated listing.
+
+    Args:
+        s3_client (boto client object): the s3 client.
+        bucket_name (str): the name of the S3 bucket.
+        prefix (str): the key prefix to list.
+    Returns:
+        dict: {key: ETag} for the keys that already exist under the prefix.
+    """
+    keys = {}
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        keys.update((obj['Key'], obj['ETag'].strip('"')) for obj in page.get('Contents', []))
+    return keys
+
+
+def file_etag(filename, transfer_config):
+    """Computes the ETag S3 reports for a file uploaded with `transfer_config`.
+
+    Files below the multipart threshold get the MD5 of their content;
+    larger files get the MD5 of the concatenated part digests, suffixed with
+    the number of parts. Part sizes follow boto3's adjustment: at least 5 MB
+    and at most 10,000 parts.
+
+    Args:
+        filename (str): the path to the file.
+        transfer_config (TransferConfig): multipart threshold and chunk size.
+    Returns:
+        str: the expected ETag, without quotes.
+    """
+    size = os.path.getsize(filename)
+    chunksize = max(transfer_config.multipart_chunksize, 5 * MB)
+    while size / chunksize > 10000:
+        chunksize *= 2
+    file_md5 = hashlib.md5()
+    digests = []
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunksize), b''):
+            file_md5.update(chunk)
+            digests.append(hashlib.md5(chunk).digest())
+    if size < transfer_config.multipart_threshold:
+        return file_md5.hexdigest()
+    return '{}-{}'.format(hashlib.md5(b''.join(digests)).hexdigest(), len(digests))
+
+
+class UploadState:
+    """SQLite record of the ETag computed for each local file.
+
+    The ETag is only recomputed when a file's size or mtime changes, so
+    unchanged multi-GB files are not re-read on every run.
+    """
+
+    def __init__(self, path):
+        """Args:
+            path (str): the SQLite database file.
+        """
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS uploads (
+                key TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime REAL,
+                etag TEXT
+            )
+        """)
+
+    def etag(self, filename, key, transfer_config):
+        """Returns the local ETag of a file, using the cached value if unchanged.
+
+        Args:
+            filename (str): the path to the file.
+            key (str): the S3 key of the file.
+            transfer_config (TransferConfig): multipart threshold and chunk size.
+        """
+        stat = os.stat(filename)
+        row = self.conn.execute('SELECT size, mtime, etag FROM uploads WHERE key = ?', (key,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime:
+            return row[2]
+
+        etag = file_etag(filename, transfer_config)
+        with self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?)',
+                              (key, stat.st_size, stat.st_mtime, etag))
+        return etag
+
+
+def gather_files(directory):
+    """Lists the files below a directory, recursing into partition folders.
+
+    Args:
+        directory (str): the local directory.
+    Returns:
+        list: (path, path relative to `directory`) for every file.
+    """
+    files = []
+    for root, _, names in os.walk(directory):
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            files.append((path, os.path.relpath(path, directory)))
+    return files
+
+
+def upload_dataset(s3_client, bucket_name, dataset_name, filenames, transfer_config, max_workers, state):
+    """Uploads the files of a dataset that are missing or changed in the bucket.
+
+    Args:
+        s3_client (boto client object): the s3 client.
+        bucket_name (str): the name of the S3 bucket.
+        dataset_name (str): the dataset name, used as the key prefix.
+        filenames (list): (path, relative key) of the files to upload.
+        transfer_config (TransferConfig): multipart chunk size and concurrency.
+        max_workers (int): number of files uploaded concurrently.
+        state (UploadState): cache of the local files' ETags.
+    Returns:
+        tuple: (bytes uploaded, seconds elapsed)
+    """
+    existing_keys = list_existing_keys(s3_client, bucket_name, dataset_name + '/')
+
+    pending = []
+    for filename, relative_key in filenames:
+        s3_filepath = os.path.join(dataset_name, relative_key)
+        # Only hash the local file when there is a remote object to compare it to.
+        if s3_filepath in existing_keys and \
+                existing_keys[s3_filepath] == state.etag(filename, s3_filepath, transfer_config):
+            print(f'\tUnchanged: {s3_filepath}')
+        else:
+            pending.append((filename, s3_filepath))
+
+    total_bytes = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(upload_file_to_S3, s3_client, filename, s3_filepath,
+                                   bucket_name, transfer_config): s3_filepath
+                   for filename, s3_filepath in pending}
+        for future in as_completed(futures):
+            total_bytes += future.result()
+            print(f'\tCopied: {futures[future]}', flush=True)
+    return total_bytes, time.perf_counter() - start
+
+
+def main():
+    """Uploads the project datasets to S3, several files at a time."""
+    # Parse the config file
+    config_file = './i94.cfg'
+    assert os.path.exists(config_file), f"Config file not found at {config_file}"
+    config = configparser.ConfigParser()
+    config.read(config_file)
+
+    S3_BUCKET = config['S3']['BUCKET']
+    STATE_DB = config.get('UPLOAD', 'STATE_DB', fallback='./upload_state.db')
+    MAX_WORKERS = config.getint('UPLOAD', 'MAX_WORKERS', fallback=4)
+    transfer_config = TransferConfig(
+        multipart_threshold=config.getint('UPLOAD', 'MULTIPART_THRESHOLD_MB', fallback=64) * MB,
+        multipart_chunksize=config.getint('UPLOAD', 'MULTIPART_CHUNKSIZE_MB', fallback=64) * MB,
+        max_concurrency=config.getint('UPLOAD', 'MAX_CONCURRENCY', fallback=8)
+    )
+
+    # Create the S3 client (clients, unlike resources, are thread-safe)
+    s3_client = boto3.client('s3')
+    state = UploadState(STATE_DB)
+
+    # Set the paths for the data in Udacity Workspace. The DAG converts the
+    # SAS7BDAT files into the sas_data Parquet partitions itself.
+    immigration_dir = os.path.abspath('../../data/18-83510-I94-Data-2016')
+
+    # Gather data files
+    source_immigration_data = gather_files(immigration_dir)
+    source_temperature_data = [(os.path.abspath('../../data2/GlobalLandTemperaturesByCity.csv'),
+                                'GlobalLandTemperaturesByCity.csv')]
+    source_airport_data = [(os.path.abspath('./data/airport-codes_csv.csv'), 'airport-codes_csv.csv')]
+    source_us_cities_demographics = [(os.path.abspath('./data/us-cities-demographics.csv'),
+                                      'us-cities-demographics.csv')]
+
+    # Upload the data to S3
+    upload_dict = {'immigration': source_immigration_data,
+                   'temperature': source_temperature_data,
+                   'airport': source_airport_data,
+                   'demographics': source_us_cities_demographics}
+
+    print(f'S3 Bucket: {S3_BUCKET}')
+    for dataset_name, filenames in upload_dict.items():
+        print(f'Copying: {dataset_name}')
+        total_bytes, elapsed = upload_dataset(s3_client, S3_BUCKET, dataset_name, filenames,
+                                              transfer_config, MAX_WORKERS, state)
+        if total_bytes:
+            print(f'\t{total_bytes / MB:.1f} MB in {elapsed:.1f} s '
+                  f'({total_bytes / MB / elapsed:.1f} MB/s)')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Reports the critical path of the DAG and the wall-clock time it saves.
+
+Compares the dependency-derived task graph of the DAG with the former
+stage-barrier layout, where every dimension table was created before any
+staging table and the dimension loads waited for every staging COPY.
+Task durations are rough estimates unless measured ones are given, e.g.
+exported from the Airflow metadata database with:
+
+    SELECT json_object_agg(task_id, EXTRACT(EPOCH FROM end_date - start_date))
+    FROM task_instance WHERE dag_id = 'i94_dag' AND execution_date = '2016-04-01';
+
+Usage:
+    python ./critical_path.py
+    python ./critical_path.py --durations ./durations.json
+"""
+import argparse
+import fnmatch
+import json
+import os
+import sys
+
+PLUGINS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'plugins')
+sys.path.insert(0, PLUGINS_DIR)
+
+from helpers.sql_queries_create import SqlQueriesCreate
+from helpers.table_configs import s3_table_keys, sas_table_configs
+from helpers.task_graph import barrier_task_graph, critical_path, finish_times, load_task_id, task_graph
+
+# Estimated seconds per task for a month of immigration data on 2 dc2.large
+# nodes; the first matching pattern wins.
+ESTIMATED_DURATIONS = [
+    ('convert_public.staging_immigration_from_sas7bdat', 150),
+    ('convert_public.staging_immigration_dates', 240),
+    ('load_public.staging_immigration_from_s3', 420),
+    ('convert_public.staging_temperature_to_parquet', 180),
+    ('convert_*', 15),
+    ('build_*_lookup', 10),
+    ('load_*_from_s3', 20),
+    ('load_*_from_sas', 10),
+    ('cache_sas_labels', 5),
+    ('create_*', 2),
+    ('migrate_schema', 2),
+    ('qc_*', 5),
+    ('maintain_tables', 60),
+]
+
+
+def task_durations(graph, measured):
+    """Returns the duration of every task, measured or estimated."""
+    durations = {}
+    for task_id in graph:
+        if task_id in measured:
+            durations[task_id] = float(measured[task_id] or 0)
+            continue
+        durations[task_id] = next((float(seconds) for pattern, seconds in ESTIMATED_DURATIONS
+                                   if fnmatch.fnmatchcase(task_id, pattern)), 0.0)
+    return durations
+
+
+def print_path(title, graph, measured):
+    """Prints the critical path of a task graph and returns its length in seconds."""
+    durations = task_durations(graph, measured)
+    seconds, path = critical_path(graph, durations)
+    print(f'{title}: {seconds:.0f} s over {len(graph)} tasks')
+    for task_id in path:
+        if durations[task_id]:
+            print(f'  {durations[task_id]:>8.0f} s  {task_id}')
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--durations', help='JSON file of {task_id: seconds} measured in a DAG run')
+    args = parser.parse_args()
+
+    measured = {}
+    if args.durations:
+        with open(args.durations) as f:
+            measured = json.load(f)
+
+    barrier = barrier_task_graph(SqlQueriesCreate.dim_tables, SqlQueriesCreate.staging_tables,
+                                 s3_table_keys, sas_table_configs)
+    derived = task_graph({**SqlQueriesCreate.dim_tables, **SqlQueriesCreate.staging_tables},
+                         s3_table_keys, sas_table_configs)
+    before = print_path('Stage barriers', barrier, measured)
+    after = print_path('Table dependencies', derived, measured)
+
+    print('Tables loaded after (s):  barriers  dependencies')
+    loaded_before = finish_times(barrier, task_durations(barrier, measured))[0]
+    loaded_after = finish_times(derived, task_durations(derived, measured))[0]
+    for table in s3_table_keys + sas_table_configs:
+        task_id = load_task_id(table)
+        print(f'  {table["name"]:<32} {loaded_before[task_id]:>8.0f}  {loaded_after[task_id]:>12.0f}')
+
+    saved = before - after
+    print(f'Expected wall-clock reduction: {saved:.0f} s ({saved / before:.0%})' if before else 'No durations')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,115 +1,202 @@
-import os
-import configparser
 from datetime import datetime, timedelta
 
 from airflow import DAG
 from airflow.operators.dummy_operator import DummyOperator
 from airflow.operators.postgres_operator import PostgresOperator
-from copy_to_redshift import CopyToRedshiftOperator
-from sas_to_redshift import SASToRedshiftOperator
-from data_quality import DataQualityOperator
+from operators.copy_to_redshift import CopyToRedshiftOperator
+from operators.sas_to_redshift import SASToRedshiftOperator
+from operators.sas_labels_cache import SASLabelsCacheOperator
+from operators.csv_to_parquet import CsvToParquetOperator
+from operators.temperature_to_parquet import TemperatureToParquetOperator
+from operators.pivot_to_parquet import PivotToParquetOperator
+from operators.airports_to_parquet import AirportsToParquetOperator
+from operators.port_airports import PortAirportsOperator
+from operators.sas_dates_to_parquet import SASDatesToParquetOperator
+from operators.sas7bdat_to_parquet import SAS7BDATToParquetOperator
+from operators.data_quality import DataQualityOperator
+from operators.table_maintenance import TableMaintenanceOperator
+from operators.migrate_schema import MigrateSchemaOperator
 
-from pyspark.sql import SparkSession
-from pyspark.sql.types import DateType
-import pyspark.sql.functions as F
-from pyspark.sql.functions import udf, col, count, rand, isnan, when
+from helpers.dag_config import load_config
+from helpers.sql_queries_create import SqlQueriesCreate
+from helpers.table_configs import s3_table_keys, sas_table_configs
+from helpers.task_graph import (CACHE_LABELS_TASK_ID, END_TASK_ID, MAINTENANCE_TASK_ID, MIGRATE_TASK_ID,
+                                 START_TASK_ID, check_task_id, create_task_id, extract_task_id, load_task_id,
+                                 preprocess_task_id, task_graph)
 
-from sql_queries_create import SqlQueriesCreate
-from table_configs import s3_table_keys, sas_table_configs
-
-config = configparser.ConfigParser()
-config.read('/home/pi/4-capstone/i94.cfg')
+config = load_config()
 
 S3_BUCKET = config['S3']['BUCKET']
 REDSHIFT_ARN = config['IAM_ROLE']['ARN']
+SAS_LABELS_KEY = 'i94_data/I94_SAS_Labels_Descriptions.SAS'
 
 default_args = {
     'owner': 'robrobinson',
     'depends_on_past': False,
-    'start_date': datetime(2019, 1, 12, 0, 0, 0, 0),
-    'end_date': datetime(2019, 1, 12, 0, 0, 0, 0),
+    'start_date': datetime(2016, 1, 1, 0, 0, 0, 0),
+    'end_date': datetime(2016, 12, 1, 0, 0, 0, 0),
     'retries': 1,
     'retry_delay': timedelta(minutes=1),
-    'catchup': False,
     'email_on_retry': False
 }
 
 dag = DAG('i94_dag',
           default_args=default_args,
           description='Load and transform data in Redshift with Airflow',
+          # One run per month of I94 data: each run loads the
+          # i94yr={execution_date.year}/i94mon={execution_date.month} partition.
+          schedule_interval='@monthly',
+          catchup=True,
+          max_active_runs=1
         )
 
-start_operator = DummyOperator(task_id='Begin_execution',  dag=dag)
-dim_tables_created = DummyOperator(task_id='DimTables_created',  dag=dag)
-staging_tables_created = DummyOperator(task_id='StagingTables_created',  dag=dag)
-tables_copied = DummyOperator(task_id='Tables_copied',  dag=dag)
-end_operator = DummyOperator(task_id='Stop_execution',  dag=dag)
+start_operator = DummyOperator(task_id=START_TASK_ID,  dag=dag)
+end_operator = DummyOperator(task_id=END_TASK_ID,  dag=dag)
 
-### CREATE DIM TABLES
-### Execute Create-tables Queries directly with Postgres
-for table in SqlQueriesCreate.dim_tables.keys():
-    create_table_task = PostgresOperator(
-            task_id=f"create_{table}_table",
-            postgres_conn_id="redshift",
-            sql=SqlQueriesCreate.dim_tables[table],
-            dag=dag
-        )
-    
-    start_operator >> create_table_task
-    create_table_task >> dim_tables_created
+### DROP THE TABLES WHOSE LAYOUT CHANGED SINCE THE LAST RUN
+migrate_schema = MigrateSchemaOperator(
+    task_id=MIGRATE_TASK_ID,
+    dag=dag,
+    redshift_conn_id='redshift'
+  )
 
-### CREATE STAGING TABLES
-for table in SqlQueriesCreate.staging_tables.keys():
+### CREATE TABLES
+### Execute Create-tables Queries directly with Postgres
+create_ddls = {**SqlQueriesCreate.dim_tables, **SqlQueriesCreate.staging_tables}
+for table, ddl in create_ddls.items():
     create_table_task = PostgresOperator(
-            task_id=f"create_{table}_table",
+            task_id=create_task_id(table),
             postgres_conn_id="redshift",
-            sql=SqlQueriesCreate.staging_tables[table],
+            sql=ddl,
             dag=dag
         )
-    
-    dim_tables_created >> create_table_task
-    create_table_task >> staging_tables_created
 
 ### COPY DATA TO STAGING TABLES
 for table in s3_table_keys:
+    s3_key = table['key']
+    if 'sas7bdat_prefix' in table:
+        # Convert the monthly SAS7BDAT files into the Parquet partitions read by `key`.
+        SAS7BDATToParquetOperator(
+            task_id=extract_task_id(table),
+            dag=dag,
+            aws_credentials_id='aws_credentials',
+            s3_bucket=S3_BUCKET,
+            s3_key=table['sas7bdat_prefix'],
+            output_prefix=table['sas7bdat_output_prefix'],
+            ddl=table['ddl']
+          )
+    if 'parquet_prefix' in table:
+        # Convert CSV sources to typed, compressed Parquet before the COPY,
+        # keeping only the temperatures the analysis joins, pivoting the
+        # demographics to one row per city and typing the airport coordinates.
+        convert_operator, convert_options = CsvToParquetOperator, {}
+        if 'reduce' in table:
+            convert_operator, convert_options = TemperatureToParquetOperator, table['reduce']
+        elif 'pivot' in table:
+            convert_operator, convert_options = PivotToParquetOperator, table['pivot']
+        elif 'airports' in table:
+            convert_operator, convert_options = AirportsToParquetOperator, table['airports']
+        convert_operator(
+            task_id=preprocess_task_id(table),
+            dag=dag,
+            aws_credentials_id='aws_credentials',
+            s3_bucket=S3_BUCKET,
+            s3_key=table['key'],
+            output_prefix=table['parquet_prefix'],
+            ddl=table['ddl'],
+            delimiter=table['sep'],
+            rows_per_file=table.get('rows_per_file'),
+            **convert_options
+          )
+        s3_key = f"{table['parquet_prefix']}/"
+    elif 'dates_prefix' in table:
+        # Store the SAS day offsets and date strings as DATE columns.
+        SASDatesToParquetOperator(
+            task_id=preprocess_task_id(table),
+            dag=dag,
+            aws_credentials_id='aws_credentials',
+            s3_bucket=S3_BUCKET,
+            s3_key=table['key'],
+            output_prefix=table['dates_prefix'],
+            date_columns=table['date_columns'],
+            key_columns=table.get('key_columns', {}),
+            ddl=table['ddl']
+          )
+        s3_key = f"{table['dates_prefix']}/"
+    elif 'lookup_prefix' in table:
+        # Match the I94 ports to the converted airports of their city.
+        source = next(source for source in s3_table_keys if source['name'] == table['lookup_source'])
+        PortAirportsOperator(
+            task_id=preprocess_task_id(table),
+            dag=dag,
+            aws_credentials_id='aws_credentials',
+            s3_bucket=S3_BUCKET,
+            airports_prefix=source['parquet_prefix'],
+            labels_key=SAS_LABELS_KEY,
+            output_prefix=table['lookup_prefix'],
+            ddl=table['ddl']
+          )
+        s3_key = f"{table['lookup_prefix']}/"
+
     copy_table_from_s3_to_redshift = CopyToRedshiftOperator(
-        task_id=f'load_{table["name"]}_from_s3',
+        task_id=load_task_id(table),
         dag=dag,
         aws_credentials_id='aws_credentials',
         redshift_conn_id='redshift',
         iam_role=REDSHIFT_ARN,
         table=table['name'],
         s3_bucket=S3_BUCKET,
-        s3_key=table['key'],
+        s3_key=s3_key,
         file_format=table['file_format'],
-        delimiter=table['sep']
+        delimiter=table['sep'],
+        load_mode=table.get('load_mode', 'full'),
+        partition_filter=table.get('partition_filter', ''),
+        ddl=table['ddl']
       )
-    
-    staging_tables_created >> copy_table_from_s3_to_redshift
-    copy_table_from_s3_to_redshift >> tables_copied
-    
+
+### PARSE THE SAS LABELS FILE ONCE FOR ALL DIM TABLES
+cache_sas_labels = SASLabelsCacheOperator(
+    task_id=CACHE_LABELS_TASK_ID,
+    dag=dag,
+    aws_credentials_id='aws_credentials',
+    s3_bucket=S3_BUCKET,
+    s3_key=SAS_LABELS_KEY
+  )
+
 ### LOAD DATA INTO DIM TABLES
 for table in sas_table_configs:
   load_table_from_sas = SASToRedshiftOperator(
-    task_id=f'load_{table["name"]}_from_sas',
+    task_id=load_task_id(table),
     dag=dag,
     aws_credentials_id='aws_credentials',
     redshift_conn_id='redshift',
     table=table['name'],
     s3_bucket=S3_BUCKET,
-    s3_key='i94_data/I94_SAS_Labels_Descriptions.SAS',
+    s3_key=SAS_LABELS_KEY,
     sas_value=table['value'],
-    columns=table['columns']
+    columns=table['columns'],
+    surrogate_key=table.get('surrogate_key', '')
   )
 
+### CHECK EVERY TABLE AS SOON AS IT IS LOADED
+for table in s3_table_keys + sas_table_configs:
   check_table = DataQualityOperator(
-    task_id=f'qc_{table["name"]}_table',
+    task_id=check_task_id(table),
     dag=dag,
     redshift_conn_id='redshift',
-    table=table['name'],
-    dq_checks=table['qc_check']
+    tables=[{'table': table['name'], 'checks': table.get('dq_checks', []),
+             'load_task_id': load_task_id(table)}]
   )
-  
-  tables_copied >> load_table_from_sas
-  load_table_from_sas >> check_table
-  check_table >> end_operator
+
+### VACUUM / ANALYZE ONLY WHERE THE TABLE STATISTICS CALL FOR IT
+maintain_tables = TableMaintenanceOperator(
+    task_id=MAINTENANCE_TASK_ID,
+    dag=dag,
+    redshift_conn_id='redshift',
+    tables=[table['name'] for table in s3_table_keys + sas_table_configs]
+  )
+
+### WIRE THE TASKS FROM THE FOREIGN KEYS AND THE SOURCE OF EVERY LOAD
+for task_id, upstream_task_ids in task_graph(create_ddls, s3_table_keys, sas_table_configs).items():
+    for upstream_task_id in sorted(upstream_task_ids):
+        dag.get_task(upstream_task_id) >> dag.get_task(task_id)
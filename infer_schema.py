@@ -0,0 +1,171 @@
+"""Infers the narrowest column types and encodings of the warehouse tables.
+
+Samples the local copies of the datasets (the same files copy_data_to_s3.py
+uploads) and the SAS labels file, and rewrites the CREATE TABLE statements
+of SqlQueriesCreate with the narrowest types holding every sampled value
+(SMALLINT/INT/BIGINT/DATE/CHAR(n)/VARCHAR(n)) and a compression encoding per
+column. Foreign keys get the type of the column they reference.
+
+Usage:
+    python ./infer_schema.py --sample-rows 1000000            # print the DDL
+    python ./infer_schema.py --sample-rows 1000000 --write    # update SqlQueriesCreate and add a migration
+"""
+import argparse
+import glob
+import os
+import sys
+
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+PLUGINS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'plugins')
+sys.path.insert(0, PLUGINS_DIR)
+
+from helpers.airports import SOURCE_SCHEMA as AIRPORTS_SCHEMA, reduce_airports
+from helpers.migrations import save_statements
+from helpers.parquet_convert import ddl_columns, ddl_schema, read_csv_batches
+from helpers.pivot import pivot_batches, pivot_source_schema
+from helpers.sas_dates import convert_dates
+from helpers.sas_labels import parse_sas_labels
+from helpers.schema_inference import infer_types, keep_parquet_floats, profile_batches, render_ddl
+from helpers.sql_queries_create import SqlQueriesCreate
+from helpers.table_configs import s3_table_keys, sas_table_configs
+from helpers.temperature_reduce import SOURCE_SCHEMA as TEMPERATURE_SCHEMA, reduce_temperatures
+
+SQL_QUERIES_CREATE = os.path.join(PLUGINS_DIR, 'helpers', 'sql_queries_create.py')
+
+# Local copies of the S3 sources: (table, path, delimiter), None for Parquet.
+SOURCES = [
+    ('staging_immigration', './data/sas_data', None),
+    ('staging_airports', './data/airport-codes_csv.csv', ','),
+    ('staging_temperature', '../../data2/GlobalLandTemperaturesByCity.csv', ','),
+    ('staging_demographics', './data/us-cities-demographics.csv', ';'),
+]
+
+
+def profile_csv(path, names, delimiter, max_rows):
+    """Profiles a CSV, its columns matched to `names` by position."""
+    reader = pv.open_csv(
+        path,
+        read_options=pv.ReadOptions(column_names=names, skip_rows=1),
+        parse_options=pv.ParseOptions(delimiter=delimiter),
+        convert_options=pv.ConvertOptions(column_types={name: pa.string() for name in names},
+                                          null_values=[''], strings_can_be_null=True)
+    )
+    return profile_batches(reader, names, from_text=True, max_rows=max_rows)
+
+
+def converted_batches(path, config, delimiter):
+    """Streams a CSV as the DAG reshapes it before the COPY.
+
+    Args:
+        path (str): local CSV file.
+        config (dict): table config of s3_table_keys with a 'reduce', 'pivot'
+            or 'airports' entry.
+        delimiter (str): CSV delimiter.
+    Returns:
+        iterable: RecordBatches typed after the table's DDL.
+    """
+    schema = ddl_schema(config['ddl'])
+    if 'reduce' in config:
+        return reduce_temperatures(read_csv_batches(path, TEMPERATURE_SCHEMA, delimiter), schema, **config['reduce'])
+    if 'airports' in config:
+        return reduce_airports(read_csv_batches(path, AIRPORTS_SCHEMA, delimiter), schema, **config['airports'])
+    pivot = config['pivot']
+    source_schema = pivot_source_schema(schema, pivot['pivot_column'], pivot['value_column'], pivot['columns'])
+    return pivot_batches(read_csv_batches(path, source_schema, delimiter), schema, **pivot)
+
+
+def profile_parquet(path, names, max_rows, date_columns=None):
+    """Profiles the Parquet files under `path`, their columns matched by name.
+
+    `date_columns` are converted as SASDatesToParquetOperator does before
+    the COPY.
+
+    Returns:
+        tuple: ({name: ColumnProfile}, {name: arrow type as loaded})
+    """
+    files = sorted(glob.glob(os.path.join(path, '**', '*.parquet'), recursive=True))
+    schema = pq.read_schema(files[0])
+    columns = [name for name in names if name in schema.names]
+    date_columns = {column: fmt for column, fmt in (date_columns or {}).items() if column in columns}
+    types = {name: pa.date32() if name in date_columns else schema.field(name).type for name in columns}
+
+    def batches():
+        for filename in files:
+            for batch in pq.ParquetFile(filename).iter_batches(columns=columns):
+                yield convert_dates(pa.Table.from_batches([batch]), date_columns)[0] if date_columns else batch
+
+    return profile_batches(batches(), columns, max_rows=max_rows), types
+
+
+def profile_sas_labels(path):
+    """Profiles the code/label columns of every dimension table."""
+    with open(path, encoding='utf-8') as f:
+        labels = parse_sas_labels(f)
+    profiles = {}
+    for table in sas_table_configs:
+        rows = labels[table['value']]
+        batch = pa.RecordBatch.from_arrays([pa.array([str(row[i]) for row in rows]) for i in range(2)],
+                                           names=table['columns'])
+        profiles[table['name']] = profile_batches([batch], table['columns'], from_text=True)
+    return profiles
+
+
+def statement_attribute(ddl):
+    """Returns the SqlQueriesCreate attribute holding a statement."""
+    return next(name for name, value in vars(SqlQueriesCreate).items() if value is ddl)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sample-rows', type=int, default=1000000, help='rows profiled per table, 0 for all')
+    parser.add_argument('--sas-labels', default='./I94_SAS_Labels_Descriptions.SAS')
+    parser.add_argument('--write', action='store_true', help=f'rewrite {SQL_QUERIES_CREATE} and add a migration')
+    parser.add_argument('--description', default='Narrow the column types and encodings',
+                        help='description of the migration added by --write')
+    args = parser.parse_args()
+    max_rows = args.sample_rows or None
+
+    ddls = {statement_attribute(ddl).replace('_create', ''): ddl
+            for ddl in list(SqlQueriesCreate.staging_tables.values()) + list(SqlQueriesCreate.dim_tables.values())}
+
+    profiles = profile_sas_labels(args.sas_labels)
+    for table, path, delimiter in SOURCES:
+        names = [name for name, _ in ddl_columns(ddls[table])]
+        config = next(config for config in s3_table_keys if config['name'].split('.')[-1] == table)
+        # Surrogate key columns keep their SMALLINT type rather than that of the source codes.
+        names = [name for name in names if name not in config.get('key_columns', {})]
+        print(f'Profiling {table} from {path}', file=sys.stderr)
+        if delimiter is None:
+            profiles[table], parquet_types = profile_parquet(path, names, max_rows, config.get('date_columns'))
+            # The date conversion writes the DDL types, so only Parquet copied as is keeps its doubles.
+            # Before infer_types, so the foreign keys get FLOAT too.
+            kept = [] if 'dates_prefix' in config else keep_parquet_floats(profiles[table], parquet_types)
+            for name in kept:
+                print(f'NOTE: {table}.{name} holds whole numbers but is a double in Parquet; kept as FLOAT '
+                      f'until the converter writes it as an integer', file=sys.stderr)
+        elif 'reduce' in config or 'pivot' in config or 'airports' in config:
+            profiles[table] = profile_batches(converted_batches(path, config, delimiter), names, max_rows=max_rows)
+        else:
+            profiles[table] = profile_csv(path, names, delimiter, max_rows)
+
+    types = infer_types(ddls, profiles)
+
+    statements = {}
+    for table, ddl in ddls.items():
+        statements[statement_attribute(ddl)] = render_ddl(ddl, types.get(table, {}), profiles.get(table, {}))
+        print(statements[statement_attribute(ddl)])
+
+    if args.write:
+        migration = save_statements(statements, args.description)
+        if migration:
+            print(f'Updated {SQL_QUERIES_CREATE}; migration {migration[0]} recreates {", ".join(migration[1])}',
+                  file=sys.stderr)
+        else:
+            print(f'{SQL_QUERIES_CREATE} is up to date', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
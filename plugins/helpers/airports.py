@@ -0,0 +1,134 @@
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from helpers.temperature_reduce import normalize_key
+
+
+# Columns of airport-codes_csv.csv, in file order.
+SOURCE_SCHEMA = pa.schema([
+    ('ident', pa.string()),
+    ('type', pa.string()),
+    ('name', pa.string()),
+    ('elevation_ft', pa.float64()),
+    ('continent', pa.string()),
+    ('iso_country', pa.string()),
+    ('iso_region', pa.string()),
+    ('municipality', pa.string()),
+    ('gps_code', pa.string()),
+    ('iata_code', pa.string()),
+    ('local_code', pa.string()),
+    ('coordinates', pa.string()),
+])
+
+# Airports of a port are ranked by type, the busiest kind first; closed
+# airports are left out.
+AIRPORT_TYPES = ['large_airport', 'medium_airport', 'small_airport', 'seaplane_base', 'heliport', 'balloonport']
+
+# The coordinates column holds 'longitude, latitude'.
+_COORDINATES = r'^\s*(?P<longitude>[-+0-9.eE]+)\s*,\s*(?P<latitude>[-+0-9.eE]+)\s*$'
+# A US port label ends with its state, e.g. 'BOSTON, MA' or 'PORTLAND, OR #ARPT'.
+_PORT_LABEL = r'^(?P<city>.*),\s*(?P<state>[A-Z]{2})\b[^,]*$'
+_ABBREVIATIONS = [(r'\bSAINT\b', 'ST'), (r'\bFORT\b', 'FT'), (r'\bMOUNT\b', 'MT')]
+
+
+def place_key(values):
+    """Normalizes place names so that 'St. Louis' and 'SAINT LOUIS' both become 'ST LOUIS'.
+
+    Args:
+        values (pyarrow.Array): place names.
+    Returns:
+        pyarrow.Array: normalized names.
+    """
+    values = normalize_key(values)
+    for pattern, abbreviation in _ABBREVIATIONS:
+        values = pc.replace_substring_regex(values, pattern, abbreviation)
+    return values
+
+
+def split_coordinates(coordinates):
+    """Splits 'longitude, latitude' strings into FLOAT columns.
+
+    Args:
+        coordinates (pyarrow.Array): values of the coordinates column.
+    Returns:
+        tuple: (latitude, longitude) float64 arrays, null where the value
+            does not hold two numbers.
+    """
+    parts = pc.extract_regex(coordinates, _COORDINATES)
+    return (pc.cast(pc.struct_field(parts, 'latitude'), pa.float64()),
+            pc.cast(pc.struct_field(parts, 'longitude'), pa.float64()))
+
+
+def reduce_airports(batches, schema, require_iata=True):
+    """Types the coordinates of the airport rows and drops those without an IATA code.
+
+    Args:
+        batches (iterable): RecordBatches typed after SOURCE_SCHEMA.
+        schema (pyarrow.Schema): output schema, SOURCE_SCHEMA with latitude
+            and longitude instead of coordinates.
+        require_iata (bool): drop the airports without an iata_code, which
+            no flight or I94 port refers to.
+    Yields:
+        pyarrow.RecordBatch: rows matching `schema`.
+    """
+    for batch in batches:
+        if require_iata:
+            batch = batch.filter(pc.is_valid(batch.column('iata_code')))
+        if not batch.num_rows:
+            continue
+        latitude, longitude = split_coordinates(batch.column('coordinates'))
+        table = pa.Table.from_batches([batch]).append_column('latitude', latitude).append_column('longitude', longitude)
+        yield from table.select(schema.names).cast(schema).to_batches()
+
+
+def parse_port_labels(rows):
+    """Splits the US port labels of dim_i94port into a city key and a state.
+
+    Args:
+        rows (list): [code, label] pairs of the i94prtl block, e.g.
+            ['BOS', 'BOSTON, MA  '].
+    Returns:
+        pyarrow.Table: port_code, city_key and state of every port whose
+            label ends with a state code; foreign and unknown ports are left out.
+    """
+    labels = pc.utf8_trim_whitespace(pa.array([label for _, label in rows], pa.string()))
+    parts = pc.extract_regex(labels, _PORT_LABEL)
+    ports = pa.table({'port_code': pa.array([code for code, _ in rows], pa.string()),
+                      'city_key': place_key(pc.struct_field(parts, 'city')),
+                      'state': pc.struct_field(parts, 'state')})
+    return ports.filter(pc.is_valid(ports.column('state')))
+
+
+def port_airports(ports, airports):
+    """Matches the I94 ports to the open airports of their city and state.
+
+    Args:
+        ports (pyarrow.Table): table returned by parse_port_labels.
+        airports (pyarrow.Table): staging_airports rows, with at least
+            ident, type, iso_region, municipality and iata_code.
+    Returns:
+        pyarrow.Table: port_code, ident, iata_code, airport_type and
+            airport_rank, 1 for the best-ranked airport of a port, sorted
+            by port_code and airport_rank.
+    """
+    airports = airports.filter(pc.is_in(airports.column('type'), value_set=pa.array(AIRPORT_TYPES)))
+    region = pc.extract_regex(airports.column('iso_region'), r'^US-(?P<state>[A-Z]{2})$')
+    airports = pa.table({'city_key': place_key(airports.column('municipality')),
+                         'state': pc.struct_field(region, 'state'),
+                         'ident': airports.column('ident'),
+                         'iata_code': airports.column('iata_code'),
+                         'airport_type': airports.column('type'),
+                         'type_rank': pc.index_in(airports.column('type'), value_set=pa.array(AIRPORT_TYPES))})
+    matches = ports.join(airports, ['city_key', 'state'], join_type='inner')
+    matches = matches.sort_by([('port_code', 'ascending'), ('type_rank', 'ascending'), ('ident', 'ascending')])
+
+    # Rank within a port: the position of a row after the port's first row.
+    port_codes = matches.column('port_code').to_pylist()
+    ranks = []
+    for i, port_code in enumerate(port_codes):
+        ranks.append(1 if i == 0 or port_codes[i - 1] != port_code else ranks[-1] + 1)
+    return pa.table({'port_code': matches.column('port_code'),
+                     'ident': matches.column('ident'),
+                     'iata_code': matches.column('iata_code'),
+                     'airport_type': matches.column('airport_type'),
+                     'airport_rank': pa.array(ranks, pa.int16())})
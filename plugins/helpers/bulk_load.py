@@ -0,0 +1,43 @@
+import csv
+import gzip
+import io
+
+from psycopg2.extras import execute_values
+
+
+def rows_to_gzip_csv(rows):
+    """Serializes rows to a gzip-compressed CSV without a header.
+
+    Args:
+        rows (iterable): row tuples/lists to serialize.
+    Returns:
+        bytes: the compressed CSV.
+    """
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0) as gz:
+        text = io.TextIOWrapper(gz, encoding='utf-8', newline='')
+        csv.writer(text).writerows(rows)
+        text.flush()
+        text.detach()
+    return buffer.getvalue()
+
+
+def insert_values(cursor, table, columns, rows, batch_size=500):
+    """Inserts rows with multi-row INSERT ... VALUES statements.
+
+    Args:
+        cursor (cursor): open DB-API cursor.
+        table (str): destination table name.
+        columns (list): destination column names.
+        rows (iterable): row tuples/lists to insert.
+        batch_size (int): number of rows per INSERT statement.
+    Returns:
+        int: rows inserted, summed from the cursor rowcount of every batch.
+    """
+    sql = 'INSERT INTO {} ({}) VALUES %s'.format(table, ', '.join(columns))
+    rows = list(rows)
+    inserted = 0
+    for start in range(0, len(rows), batch_size):
+        execute_values(cursor, sql, rows[start:start + batch_size], page_size=batch_size)
+        inserted += cursor.rowcount
+    return inserted
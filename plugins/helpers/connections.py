@@ -0,0 +1,234 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+DEFAULT_MAX_CONNECTIONS = 4
+
+
+class PoolMetrics:
+    """Counters describing how a ConnectionPool has been used.
+
+    Attributes:
+        opened (int): connections opened against the warehouse.
+        reused (int): acquisitions served by an idle pooled connection.
+        discarded (int): connections dropped because they were closed or broken.
+        wait_time (float): total seconds spent waiting for a free connection.
+    """
+
+    def __init__(self):
+        self.opened = 0
+        self.reused = 0
+        self.discarded = 0
+        self.wait_time = 0.0
+
+    def as_dict(self):
+        """Returns the metrics as a dict, e.g. for logging or XCom."""
+        return {'opened': self.opened,
+                'reused': self.reused,
+                'discarded': self.discarded,
+                'wait_time': round(self.wait_time, 6)}
+
+
+class ConnectionPool:
+    """Bounded pool of DB-API connections.
+
+    At most `max_connections` connections are open at any time; callers
+    block until one is released once the limit has been reached.
+    """
+
+    def __init__(self, connect, max_connections=DEFAULT_MAX_CONNECTIONS):
+        """Args:
+            connect (callable): returns a new DB-API connection.
+            max_connections (int): upper bound on open connections.
+        """
+        self.connect = connect
+        self.max_connections = max_connections
+        self.metrics = PoolMetrics()
+        self._idle = []
+        self._open = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout=None):
+        """Returns an idle connection, opening one if the pool has room.
+
+        Args:
+            timeout (:obj:`float`, optional): seconds to wait for a free
+                connection before raising TimeoutError.
+        """
+        start = time.perf_counter()
+        with self._cond:
+            while not self._idle and self._open >= self.max_connections:
+                if not self._cond.wait(timeout):
+                    raise TimeoutError('No free connection after {} s'.format(timeout))
+            self.metrics.wait_time += time.perf_counter() - start
+
+            while self._idle:
+                conn = self._idle.pop()
+                if not conn.closed:
+                    self.metrics.reused += 1
+                    return conn
+                self._open -= 1
+                self.metrics.discarded += 1
+
+            self._open += 1
+
+        try:
+            conn = self.connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.metrics.opened += 1
+        return conn
+
+    def release(self, conn, discard=False):
+        """Returns a connection to the pool.
+
+        Args:
+            conn (connection): connection obtained from `acquire`.
+            discard (bool): close the connection instead of keeping it.
+        """
+        with self._cond:
+            if discard or conn.closed:
+                self._open -= 1
+                self.metrics.discarded += 1
+                if not conn.closed:
+                    conn.close()
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def session(self):
+        """Yields a pooled connection inside a single transaction.
+
+        The transaction is committed on success and rolled back on error;
+        connections that fail to roll back are discarded.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                self.release(conn, discard=True)
+                raise
+            self.release(conn)
+            raise
+        self.release(conn)
+
+    @contextmanager
+    def autocommit_session(self):
+        """Yields a pooled connection in autocommit mode.
+
+        Needed for statements that cannot run inside a transaction block,
+        such as VACUUM. The connection is switched back before release;
+        after an error it is discarded instead, as switching a broken
+        connection back would raise and hide the error.
+        """
+        conn = self.acquire()
+        try:
+            conn.autocommit = True
+        except Exception:
+            self.release(conn, discard=True)
+            raise
+        try:
+            yield conn
+        except Exception:
+            self.release(conn, discard=True)
+            raise
+        try:
+            conn.autocommit = False
+        except Exception:
+            self.release(conn, discard=True)
+            raise
+        self.release(conn)
+
+    def close_all(self):
+        """Closes every idle connection."""
+        with self._cond:
+            while self._idle:
+                self._idle.pop().close()
+                self._open -= 1
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(redshift_conn_id, max_connections=DEFAULT_MAX_CONNECTIONS):
+    """Returns the pool for an Airflow connection id in this worker process.
+
+    Pools are keyed by process id as well, so a forked task runner never
+    reuses connections opened by its parent. Airflow runs every task
+    instance in its own process, so connections are reused between the
+    sessions of one task (e.g. a load and its statistics query), not
+    across operators.
+
+    Args:
+        redshift_conn_id (str): Airflow ID for redshift connection.
+        max_connections (int): upper bound on open connections.
+    Returns:
+        ConnectionPool
+    """
+    key = (os.getpid(), redshift_conn_id)
+    with _pools_lock:
+        if key not in _pools:
+            from airflow.hooks.postgres_hook import PostgresHook
+            hook = PostgresHook(postgres_conn_id=redshift_conn_id)
+            _pools[key] = ConnectionPool(hook.get_conn, max_connections)
+        return _pools[key]
+
+
+def register_pool(redshift_conn_id, pool):
+    """Sets the pool returned for an Airflow connection id in this process.
+
+    Lets code running the operators outside Airflow, such as the local
+    pipeline benchmark, supply its own connections.
+
+    Args:
+        redshift_conn_id (str): Airflow ID for redshift connection.
+        pool (ConnectionPool): pool to use for `redshift_conn_id`.
+    """
+    with _pools_lock:
+        _pools[(os.getpid(), redshift_conn_id)] = pool
+
+
+@contextmanager
+def redshift_session(redshift_conn_id):
+    """Yields a pooled connection for `redshift_conn_id` in one transaction.
+
+    Args:
+        redshift_conn_id (str): Airflow ID for redshift connection.
+    """
+    with get_pool(redshift_conn_id).session() as conn:
+        yield conn
+
+
+@contextmanager
+def autocommit_session(redshift_conn_id):
+    """Yields a pooled connection for `redshift_conn_id` in autocommit mode.
+
+    Args:
+        redshift_conn_id (str): Airflow ID for redshift connection.
+    """
+    with get_pool(redshift_conn_id).autocommit_session() as conn:
+        yield conn
+
+
+def warehouse_dialect(cursor):
+    """Tells Redshift from a plain Postgres stand-in.
+
+    Args:
+        cursor (cursor): open DB-API cursor.
+    Returns:
+        str: 'redshift' or 'postgres'.
+    """
+    cursor.execute('SELECT version()')
+    return 'redshift' if 'redshift' in cursor.fetchone()[0].lower() else 'postgres'
@@ -0,0 +1,28 @@
+import configparser
+import os
+
+
+DEFAULT_CONFIG_PATH = '/home/pi/4-capstone/i94.cfg'
+
+_configs = {}
+
+
+def load_config(path=None):
+    """Returns the parsed project config, cached per process.
+
+    The scheduler re-parses DAG files constantly; the file is only parsed
+    again when its modification time changes.
+
+    Args:
+        path (:obj:`str`, optional): config file; defaults to the I94_CONFIG
+            environment variable, then DEFAULT_CONFIG_PATH.
+    Returns:
+        configparser.ConfigParser
+    """
+    path = path or os.environ.get('I94_CONFIG', DEFAULT_CONFIG_PATH)
+    mtime = os.stat(path).st_mtime_ns
+    if path not in _configs or _configs[path][0] != mtime:
+        config = configparser.ConfigParser()
+        config.read(path)
+        _configs[path] = (mtime, config)
+    return _configs[path][1]
@@ -0,0 +1,91 @@
+import re
+
+
+_REFERENCES = re.compile(r'^\s*(?P<column>\w+)\s.*?REFERENCES\s+(?P<table>[\w.]+)\s*\(\s*(?P<ref_column>\w+)\s*\)',
+                         re.IGNORECASE | re.MULTILINE)
+_COLUMN_KEY = re.compile(r'\s+(?:DISTKEY|SORTKEY)\b', re.IGNORECASE)
+_CREATE_TABLE = re.compile(r'CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(?P<table>[\w.]+)', re.IGNORECASE)
+
+
+def table_name(ddl):
+    """Returns the name, without its schema, of the table a CREATE TABLE statement creates.
+    """
+    return _CREATE_TABLE.search(ddl).group('table').split('.')[-1]
+
+
+def rename_table(ddl, table):
+    """Returns a CREATE TABLE statement creating `table` instead.
+
+    Args:
+        ddl (str): a CREATE TABLE statement from SqlQueriesCreate.
+        table (str): the new table name, optionally with its schema.
+    Returns:
+        str: the statement with the table name replaced.
+    """
+    match = _CREATE_TABLE.search(ddl)
+    return ddl[:match.start('table')] + table + ddl[match.end('table'):]
+
+
+def foreign_keys(ddl):
+    """Lists the foreign keys declared in a CREATE TABLE statement.
+
+    Args:
+        ddl (str): a CREATE TABLE statement from SqlQueriesCreate.
+    Returns:
+        list: (column, referenced table, referenced column), the referenced
+            table without its schema.
+    """
+    return [(m.group('column'), m.group('table').split('.')[-1], m.group('ref_column'))
+            for m in _REFERENCES.finditer(ddl)]
+
+
+def set_table_keys(ddl, diststyle=None, distkey=None, sortkey=None):
+    """Replaces the distribution and sort keys of a CREATE TABLE statement.
+
+    Column-level DISTKEY/SORTKEY attributes and every table attribute after
+    the column list are removed, and the new keys are declared as table
+    attributes.
+
+    Args:
+        ddl (str): a CREATE TABLE statement from SqlQueriesCreate.
+        diststyle (:obj:`str`, optional): 'EVEN', 'KEY', 'ALL' or 'AUTO'.
+        distkey (:obj:`str`, optional): distribution key column, implies KEY.
+        sortkey (:obj:`list`, optional): compound sort key columns.
+    Returns:
+        str: the rewritten statement.
+    """
+    depth = 0
+    for end, char in enumerate(ddl):
+        depth += {'(': 1, ')': -1}.get(char, 0)
+        if char == ')' and depth == 0:
+            break
+    body, close, tail = ddl[:end], ')', ddl[end + 1:]
+    body = '\n'.join(_COLUMN_KEY.sub('', line) for line in body.split('\n'))
+    indent = re.search(r'\n(\s*)CREATE', ddl).group(1)
+
+    attributes = []
+    if distkey:
+        attributes.append('DISTSTYLE KEY DISTKEY ({})'.format(distkey))
+    elif diststyle:
+        attributes.append('DISTSTYLE {}'.format(diststyle))
+    if sortkey:
+        attributes.append('COMPOUND SORTKEY ({})'.format(', '.join(sortkey)))
+
+    keys = ''.join('\n{}{}'.format(indent, attribute) for attribute in attributes)
+    semicolon = ';' if ';' in tail else ''
+    return '{}{}{}{}\n{}'.format(body, close, keys, semicolon, tail.rpartition('\n')[2])
+
+
+def replace_statements(source, statements):
+    """Replaces statements of the SqlQueriesCreate module source.
+
+    Args:
+        source (str): text of sql_queries_create.py.
+        statements (dict): {attribute name: new statement}
+    Returns:
+        str: the updated source.
+    """
+    for attribute, statement in statements.items():
+        pattern = re.compile(r'(\b{}\s*=\s*\(\s*""")(.*?)(""")'.format(attribute), re.DOTALL)
+        source = pattern.sub(lambda m: m.group(1) + statement + m.group(3), source, count=1)
+    return source
@@ -0,0 +1,124 @@
+import time
+
+
+ROW_COUNT_CHECK = 'row_count'
+ROWS_LOADED_CHECK = 'rows_loaded'
+SOURCE_ROWS_CHECK = 'source_rows_match'
+
+
+def compile_checks(table_checks):
+    """Compiles the checks of many tables into a single UNION ALL query.
+
+    Each table is scanned once: its row count and every check are computed
+    as aggregates of the same SELECT. Checks are dicts with a `condition`
+    (a SQL predicate counting offending rows) and an `expected_result`.
+    Entries with `'count_rows': False` skip the row count, and tables left
+    without any aggregate are not queried at all.
+
+    The DAG checks every table in its own task as soon as it is loaded, so
+    there it is called with a single table and batching only saves scans
+    within that table; the UNION ALL only spans tables when one
+    DataQualityOperator is given several.
+
+    Args:
+        table_checks (list): [{'table': str, 'checks': [check, ...]}, ...]
+    Returns:
+        tuple: (sql, layout) where layout[i] lists the check names of the
+            i-th table, in column order. sql is empty if there is nothing
+            to compute.
+    """
+    layout = [([ROW_COUNT_CHECK] if entry.get('count_rows', True) else [])
+              + [check['name'] for check in entry['checks'] if 'condition' in check]
+              for entry in table_checks]
+    width = max([len(names) for names in layout] + [0])
+
+    selects = []
+    for idx, entry in enumerate(table_checks):
+        if not layout[idx]:
+            continue
+        aggregates = ['COUNT(*)'] if entry.get('count_rows', True) else []
+        aggregates += ['SUM(CASE WHEN {} THEN 1 ELSE 0 END)'.format(check['condition'])
+                       for check in entry['checks'] if 'condition' in check]
+        aggregates += ['CAST(NULL AS BIGINT)'] * (width - len(aggregates))
+        columns = ['{} AS table_idx'.format(idx)] + ['{} AS c{}'.format(aggregate, col)
+                                                      for col, aggregate in enumerate(aggregates)]
+        selects.append('SELECT {} FROM {}'.format(', '.join(columns), entry['table']))
+    return '\nUNION ALL\n'.join(selects), layout
+
+
+def reconcile_row_counts(table, rows_loaded, source_rows, min_rows=1):
+    """Checks the row counts a load operator recorded, without scanning the table.
+
+    Args:
+        table (str): table name.
+        rows_loaded (int): rows loaded, as reported by the warehouse.
+        source_rows (int): rows in the source objects, or None if unknown.
+        min_rows (int): minimum number of rows expected.
+    Returns:
+        list: result dicts, as returned by `run_checks`.
+    """
+    results = [{'table': table, 'check': ROWS_LOADED_CHECK, 'result': rows_loaded,
+                'expected': min_rows, 'passed': rows_loaded >= min_rows, 'seconds': 0.0}]
+    if source_rows is not None:
+        results.append({'table': table, 'check': SOURCE_ROWS_CHECK, 'result': rows_loaded,
+                        'expected': source_rows, 'passed': rows_loaded == source_rows, 'seconds': 0.0})
+    return results
+
+
+def run_checks(cursor, table_checks, min_rows=1, row_counts=None):
+    """Runs the checks of many tables in one round trip.
+
+    Checks given as `qc_sql` (a query returning a single value) cannot be
+    batched and are run one by one on the same cursor. Tables with
+    recorded load counts are reconciled against them instead of COUNT(*).
+
+    Args:
+        cursor (cursor): open DB-API cursor.
+        table_checks (list): [{'table': str, 'checks': [check, ...]}, ...]
+        min_rows (int): minimum number of rows expected in every table.
+        row_counts (:obj:`dict`, optional): {table: (rows_loaded, source_rows)}
+            published by the load operators.
+    Returns:
+        list: one dict per check with table, check, result, expected,
+            passed and seconds (the batched query's time for batched checks).
+    """
+    results = []
+    row_counts = row_counts or {}
+
+    for entry in table_checks:
+        if entry['table'] in row_counts:
+            rows_loaded, source_rows = row_counts[entry['table']]
+            results.extend(reconcile_row_counts(entry['table'], rows_loaded, source_rows, min_rows))
+
+    sql, layout = compile_checks([dict(entry, count_rows=entry['table'] not in row_counts)
+                                  for entry in table_checks])
+    rows = {}
+    elapsed = 0.0
+    if sql:
+        start = time.perf_counter()
+        cursor.execute(sql)
+        rows = {row[0]: row[1:] for row in cursor.fetchall()}
+        elapsed = time.perf_counter() - start
+
+    for idx, entry in enumerate(table_checks):
+        expected = {check['name']: check.get('expected_result', 0)
+                    for check in entry['checks'] if 'condition' in check}
+        expected[ROW_COUNT_CHECK] = min_rows
+        for col, name in enumerate(layout[idx]):
+            result = rows[idx][col] or 0
+            passed = result >= expected[name] if name == ROW_COUNT_CHECK else result == expected[name]
+            results.append({'table': entry['table'], 'check': name, 'result': result,
+                            'expected': expected[name], 'passed': passed, 'seconds': elapsed})
+
+    for entry in table_checks:
+        for check in entry['checks']:
+            if 'qc_sql' not in check:
+                continue
+            start = time.perf_counter()
+            cursor.execute(check['qc_sql'])
+            result = cursor.fetchone()[0]
+            results.append({'table': entry['table'], 'check': check.get('name', check['qc_sql']),
+                            'result': result, 'expected': check.get('expected_result'),
+                            'passed': result == check.get('expected_result'),
+                            'seconds': time.perf_counter() - start})
+    return results
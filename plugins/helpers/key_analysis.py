@@ -0,0 +1,151 @@
+import itertools
+import math
+import random
+import zlib
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+DEFAULT_SLICES = 4
+DEFAULT_ROWS_PER_BLOCK = 100000
+DEFAULT_MAX_SKEW = 1.25
+
+
+class Predicate:
+    """A common query predicate used to score sort keys.
+
+    Attributes:
+        column (str): filtered column.
+        kind (str): 'eq' for `column = value`, 'range' for
+            `column BETWEEN value AND value + width`.
+        width (float): width of 'range' predicates, in column units.
+    """
+
+    def __init__(self, column, kind='eq', width=0):
+        self.column = column
+        self.kind = kind
+        self.width = width
+
+    @classmethod
+    def parse(cls, spec):
+        """Builds a predicate from 'column:eq' or 'column:range:width'."""
+        column, kind, *width = spec.split(':')
+        return cls(column, kind, float(width[0]) if width else 0)
+
+    def probes(self, column, rng, trials):
+        """Draws (low, high) bounds of `trials` queries.
+
+        Values are drawn from the data itself, so frequent values are
+        queried more often, as they are in practice.
+        """
+        values = column.drop_null()
+        bounds = []
+        for _ in range(trials):
+            value = values[rng.randrange(len(values))].as_py()
+            bounds.append((value, value + self.width if self.kind == 'range' else value))
+        return bounds
+
+    def __str__(self):
+        return '{}:{}'.format(self.column, self.kind) + (':{:g}'.format(self.width) if self.kind == 'range' else '')
+
+
+def slice_skew(column, slices=DEFAULT_SLICES):
+    """Distributes a column over slices by hashing its values, as DISTKEY does.
+
+    Redshift's hash function is internal; crc32 gives the same behaviour for
+    the purpose of spotting low-cardinality or heavy-hitter keys.
+
+    Args:
+        column (pyarrow.Array or ChunkedArray): candidate key values.
+        slices (int): number of slices of the cluster.
+    Returns:
+        dict: distinct values, skew (rows on the fullest slice over the mean)
+            and rows per slice.
+    """
+    counts = pc.value_counts(column)
+    slice_rows = [0] * slices
+    for value, count in zip(counts.field('values').to_pylist(), counts.field('counts').to_pylist()):
+        slice_rows[zlib.crc32(repr(value).encode('utf-8')) % slices] += count
+    mean = sum(slice_rows) / slices
+    return {'distinct': len(counts), 'skew': max(slice_rows) / mean if mean else 0.0, 'slice_rows': slice_rows}
+
+
+def zone_map_pruning(table, sort_key, predicates, blocks, trials=50, seed=0):
+    """Estimates the share of blocks zone maps skip for each predicate.
+
+    The table is sorted by `sort_key` and cut into `blocks` blocks; a block
+    is read unless the [min, max] of the predicate column in that block
+    misses the queried bounds. Blocks are modelled across the whole table
+    rather than per slice.
+
+    Args:
+        table (pyarrow.Table): data sample.
+        sort_key (list): sort key columns, in order; empty for unsorted.
+        predicates (list): Predicate objects.
+        blocks (int): blocks per column in the full table.
+        trials (int): queries drawn per predicate.
+        seed (int): random seed of the drawn queries.
+    Returns:
+        dict: {str(predicate): share of blocks skipped}
+    """
+    ordered = table.sort_by([(column, 'ascending') for column in sort_key]) if sort_key else table
+    block_rows = max(math.ceil(ordered.num_rows / blocks), 1)
+    rng = random.Random(seed)
+    pruning = {}
+    for predicate in predicates:
+        column = ordered.column(predicate.column).combine_chunks()
+        zones = []
+        for start in range(0, len(column), block_rows):
+            bounds = pc.min_max(column.slice(start, block_rows))
+            zones.append((bounds['min'].as_py(), bounds['max'].as_py()))
+        probes = predicate.probes(column, rng, trials)
+        read = sum(1 for low, high in probes for zone_min, zone_max in zones
+                   if zone_min is not None and zone_min <= high and zone_max >= low)
+        pruning[str(predicate)] = 1 - read / (len(zones) * len(probes))
+    return pruning
+
+
+def recommend_keys(table, join_columns, predicates, slices=DEFAULT_SLICES, table_rows=None,
+                   rows_per_block=DEFAULT_ROWS_PER_BLOCK, max_skew=DEFAULT_MAX_SKEW, max_sort_columns=2):
+    """Recommends the distribution and sort keys of a table from a sample.
+
+    The distribution key is the least skewed join column within `max_skew`,
+    so joins on it are collocated; without one the table is distributed
+    EVEN. The sort key is the compound key, among the predicate columns and
+    their ordered pairs, that lets zone maps skip the most blocks on average.
+
+    Args:
+        table (pyarrow.Table): data sample.
+        join_columns (list): columns joined on, e.g. foreign keys.
+        predicates (list): Predicate objects of common queries.
+        slices (int): number of slices of the cluster.
+        table_rows (:obj:`int`, optional): rows in the full table; the
+            sample size by default.
+        rows_per_block (int): rows per 1 MB block of a column.
+        max_skew (float): highest skew accepted for a distribution key.
+        max_sort_columns (int): longest compound sort key tried.
+    Returns:
+        dict: diststyle, distkey, sortkey, and the skew and pruning reports.
+    """
+    skew = {column: slice_skew(table.column(column), slices) for column in join_columns}
+    balanced = [column for column in join_columns if skew[column]['skew'] <= max_skew]
+    distkey = min(balanced, key=lambda column: skew[column]['skew']) if balanced else None
+
+    blocks = max(math.ceil((table_rows or table.num_rows) / rows_per_block), 1)
+    blocks = min(blocks, max(table.num_rows // 10, 1))
+    columns = list(dict.fromkeys(predicate.column for predicate in predicates))
+    candidates = [list(key) for size in range(1, max_sort_columns + 1)
+                  for key in itertools.permutations(columns, size)]
+    pruning = {', '.join(key): zone_map_pruning(table, key, predicates, blocks) for key in candidates}
+    pruning['(unsorted)'] = zone_map_pruning(table, [], predicates, blocks)
+
+    def score(key):
+        return sum(pruning[', '.join(key)].values()) / len(predicates)
+
+    sortkey = max(candidates, key=lambda key: (round(score(key), 3), -len(key))) if candidates else []
+    return {'diststyle': 'KEY' if distkey else 'EVEN',
+            'distkey': distkey,
+            'sortkey': sortkey,
+            'skew': skew,
+            'pruning': pruning}
@@ -0,0 +1,220 @@
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlparse
+
+from helpers.connections import warehouse_dialect
+
+
+METRICS_SINK_ENV = 'I94_METRICS_SINK'
+XCOM_KEY = 'load_metrics'
+
+
+class JsonLinesSink:
+    """Appends every record as one JSON line to a local file."""
+
+    def __init__(self, path):
+        """Args:
+            path (str): file the records are appended to.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, record):
+        line = json.dumps(record, default=str)
+        with self._lock, open(self.path, 'a') as f:
+            f.write(line + '\n')
+
+
+class StatsdSink:
+    """Sends the phase timings, rows and bytes of every record to StatsD over UDP.
+
+    Metrics are named <prefix>.<task_id>.<phase>.{time,rows,bytes}, with
+    dots in task IDs replaced by underscores.
+    """
+
+    def __init__(self, host='localhost', port=8125, prefix='i94'):
+        """Args:
+            host (str): StatsD host.
+            port (int): StatsD UDP port.
+            prefix (str): prefix of every metric name.
+        """
+        self.address = (host, port)
+        self.prefix = prefix
+
+    def lines(self, record):
+        """Formats a record as StatsD lines."""
+        base = '{}.{}'.format(self.prefix, record['task_id'].replace('.', '_'))
+        lines = ['{}.total.time:{:.0f}|ms'.format(base, record['seconds'] * 1000)]
+        for phase in record['phases']:
+            name = '{}.{}'.format(base, phase['name'])
+            lines.append('{}.time:{:.0f}|ms'.format(name, phase['seconds'] * 1000))
+            for field in ('rows', 'bytes'):
+                if phase[field] is not None:
+                    lines.append('{}.{}:{}|c'.format(name, field, phase[field]))
+        return lines
+
+    def send(self, record):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            for line in self.lines(record):
+                sock.sendto(line.encode('utf-8'), self.address)
+        finally:
+            sock.close()
+
+
+def sink_from_url(url):
+    """Builds a metrics sink from a URL.
+
+    Args:
+        url (str): 'jsonl:///path/to/metrics.jsonl' or
+            'statsd://host:port/prefix'; empty for no sink.
+    Returns:
+        JsonLinesSink, StatsdSink or None.
+    """
+    if not url:
+        return None
+    parsed = urlparse(url)
+    if parsed.scheme == 'jsonl':
+        return JsonLinesSink(parsed.path)
+    if parsed.scheme == 'statsd':
+        return StatsdSink(parsed.hostname or 'localhost', parsed.port or 8125, parsed.path.strip('/') or 'i94')
+    raise ValueError('Unknown metrics sink: {}'.format(url))
+
+
+def default_sink():
+    """Returns the sink configured by the I94_METRICS_SINK environment variable."""
+    return sink_from_url(os.environ.get(METRICS_SINK_ENV))
+
+
+class LoadMetrics:
+    """Phase timings, rows and bytes of one task run.
+
+    Attributes:
+        phases (list): {'name', 'seconds', 'rows', 'bytes'} in run order.
+        files (list): per-file statistics reported by the warehouse.
+    """
+
+    def __init__(self, task_id, table=None, sink=None):
+        """Args:
+            task_id (str): task being measured.
+            table (:obj:`str`, optional): table the task loads or checks.
+            sink (:obj:`object`, optional): sink with a send(record)
+                method; defaults to default_sink().
+        """
+        self.task_id = task_id
+        self.table = table
+        self.sink = sink if sink is not None else default_sink()
+        self.phases = []
+        self.files = []
+        self._start = time.perf_counter()
+
+    def record(self, name, seconds, rows=None, size=None):
+        """Adds a phase measured by the caller."""
+        self.phases.append({'name': name, 'seconds': round(seconds, 6), 'rows': rows, 'bytes': size})
+
+    @contextmanager
+    def phase(self, name, rows=None, size=None):
+        """Times the enclosed block as a phase.
+
+        The yielded dict's 'rows' and 'bytes' can be set once they are known.
+        """
+        entry = {'name': name, 'seconds': 0.0, 'rows': rows, 'bytes': size}
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry['seconds'] = round(time.perf_counter() - start, 6)
+            self.phases.append(entry)
+
+    def as_record(self, status):
+        return {'task_id': self.task_id,
+                'table': self.table,
+                'status': status,
+                'recorded_at': datetime.utcnow().isoformat(),
+                'seconds': round(time.perf_counter() - self._start, 6),
+                'phases': self.phases,
+                'files': self.files}
+
+    def emit(self, context, log=None, status='success'):
+        """Pushes the record to XCom as `load_metrics` and sends it to the sink.
+
+        A failing sink is logged, never raised, so metrics cannot fail a load.
+        """
+        record = self.as_record(status)
+        context['ti'].xcom_push(key=XCOM_KEY, value=record)
+        if log:
+            log.info('Phases ({}, {:.3f} s): {}'.format(status, record['seconds'], ', '.join(
+                '{name} {seconds:.3f} s'.format(**phase) for phase in self.phases)))
+        if self.sink is not None:
+            try:
+                self.sink.send(record)
+            except Exception as e:
+                if log:
+                    log.warning('Could not send load metrics: {}'.format(e))
+        return record
+
+    @contextmanager
+    def emitted(self, context, log=None):
+        """Emits the record when the enclosed block ends, as 'failed' if it raised."""
+        try:
+            yield self
+        except Exception:
+            self.emit(context, log, status='failed')
+            raise
+        self.emit(context, log)
+
+
+class TimedReader:
+    """Wraps a file-like object, timing and counting the bytes of its reads.
+
+    Separates the download from the parsing of a streamed object.
+
+    Attributes:
+        seconds (float): time spent in read calls.
+        bytes (int): bytes read.
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.seconds = 0.0
+        self.bytes = 0
+
+    def read(self, *args, **kwargs):
+        start = time.perf_counter()
+        data = self.raw.read(*args, **kwargs)
+        self.seconds += time.perf_counter() - start
+        self.bytes += len(data)
+        return data
+
+
+def last_copy_id(cursor):
+    """Returns the query ID of the last COPY of the session, None off Redshift."""
+    if warehouse_dialect(cursor) != 'redshift':
+        return None
+    cursor.execute('SELECT pg_last_copy_id()')
+    return cursor.fetchone()[0]
+
+
+def copy_file_stats(cursor, query_id):
+    """Per-file statistics of a committed COPY, from stl_file_scan.
+
+    Args:
+        cursor (cursor): open DB-API cursor.
+        query_id (int): query ID of the COPY, from last_copy_id().
+    Returns:
+        list: {'file', 'lines', 'bytes', 'seconds'} for every file loaded.
+    """
+    cursor.execute("""
+        SELECT TRIM(name), SUM(lines), SUM(bytes), SUM(loadtime)
+        FROM stl_file_scan
+        WHERE query = %s
+        GROUP BY 1
+        ORDER BY 1
+    """, (query_id,))
+    return [{'file': name, 'lines': lines, 'bytes': size, 'seconds': loadtime / 1e6}
+            for name, lines, size, loadtime in cursor.fetchall()]
@@ -0,0 +1,64 @@
+import hashlib
+from datetime import datetime
+
+from helpers.sql_queries_create import SqlQueriesCreate
+
+
+def ensure_load_state(cursor):
+    """Creates the load watermark table if it does not exist yet."""
+    cursor.execute(SqlQueriesCreate.load_watermarks_create)
+
+
+def source_fingerprint(objects):
+    """Fingerprints a set of source objects by key, ETag and size.
+
+    Args:
+        objects (iterable): (key, etag, size) of every source object.
+    Returns:
+        str: hex digest, or None if there are no objects.
+    """
+    lines = sorted('{}:{}:{}'.format(key, etag.strip('"'), size) for key, etag, size in objects)
+    if not lines:
+        return None
+    return hashlib.md5('\n'.join(lines).encode('utf-8')).hexdigest()
+
+
+def last_load(cursor, table, source_key):
+    """Returns the fingerprint and row count of the last successful load of a source.
+
+    Args:
+        cursor (cursor): open DB-API cursor.
+        table (str): destination table name.
+        source_key (str): rendered S3 key (or partition) of the source.
+    Returns:
+        tuple: (fingerprint, row_count), or (None, None) if the source was
+            never loaded.
+    """
+    cursor.execute("""
+        SELECT fingerprint, row_count FROM public.load_watermarks
+        WHERE table_name = %s AND partition_key = %s
+        ORDER BY loaded_at DESC
+        LIMIT 1
+    """, (table, source_key))
+    row = cursor.fetchone()
+    return (row[0], row[1]) if row else (None, None)
+
+
+def record_load(cursor, table, source_key, fingerprint, row_count=None):
+    """Records a successful load of a source in the watermark table.
+
+    Args:
+        cursor (cursor): open DB-API cursor.
+        table (str): destination table name.
+        source_key (str): rendered S3 key (or partition) of the source.
+        fingerprint (str): fingerprint of the loaded source objects.
+        row_count (:obj:`int`, optional): rows loaded from the source.
+    """
+    cursor.execute("""
+        DELETE FROM public.load_watermarks
+        WHERE table_name = %s AND partition_key = %s
+    """, (table, source_key))
+    cursor.execute("""
+        INSERT INTO public.load_watermarks (table_name, partition_key, fingerprint, row_count, loaded_at)
+        VALUES (%s, %s, %s, %s, %s)
+    """, (table, source_key, fingerprint, row_count, datetime.utcnow()))
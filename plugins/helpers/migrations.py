@@ -0,0 +1,153 @@
+import os
+import re
+from datetime import datetime
+
+from helpers.ddl import foreign_keys, replace_statements, table_name
+from helpers.load_state import ensure_load_state
+from helpers.sql_queries_create import SqlQueriesCreate
+
+
+# The create tasks only run CREATE TABLE IF NOT EXISTS, so a table whose
+# statement in SqlQueriesCreate changed keeps its former layout in an
+# existing warehouse. Every such change adds a migration dropping the tables
+# it alters; the create tasks then recreate them with the new layout and,
+# their watermarks being deleted, the loads copy them again.
+SCHEMA_MIGRATIONS = [
+    {'version': 1,
+     'description': 'Store the immigration dates as DATE',
+     'tables': ['public.staging_immigration']},
+    {'version': 2,
+     'description': 'Add city_key to the temperatures',
+     'tables': ['public.staging_temperature']},
+    {'version': 3,
+     'description': 'Pivot the demographics to one row per city',
+     'tables': ['public.staging_demographics']},
+    {'version': 4,
+     'description': 'Split the airport coordinates into latitude and longitude',
+     'tables': ['public.staging_airports']},
+    {'version': 5,
+     'description': 'Key the ports and states with SMALLINT surrogate keys and keep the raw codes',
+     # CASCADE drops the foreign keys of staging_demographics and dim_i94port_airports,
+     # so they are recreated too.
+     'tables': ['public.staging_immigration', 'public.staging_demographics', 'public.dim_i94port_airports',
+                'public.dim_i94port', 'public.dim_i94addr']},
+    {'version': 6,
+     'description': 'Drop the raw code columns and key the port airports by port_key',
+     'tables': ['public.staging_immigration', 'public.dim_i94port_airports']},
+    {'version': 7,
+     'description': 'Store cicid as BIGINT',
+     'tables': ['public.staging_immigration']},
+    {'version': 8,
+     'description': 'Distribute the immigration rows evenly and sort them by arrdate and i94port',
+     'tables': ['public.staging_immigration']},
+]
+
+
+def applied_versions(cursor):
+    """Returns the versions of the migrations already applied to the warehouse."""
+    cursor.execute(SqlQueriesCreate.schema_migrations_create)
+    cursor.execute('SELECT version FROM public.schema_migrations')
+    return {row[0] for row in cursor.fetchall()}
+
+
+def apply_migrations(cursor, migrations=SCHEMA_MIGRATIONS):
+    """Applies the migrations not applied yet, in version order.
+
+    Each migration drops its tables (CASCADE also drops the foreign keys
+    referencing them, which the create tasks restore) and deletes their load
+    watermarks. Run in one transaction before the create tasks.
+
+    Args:
+        cursor (cursor): open DB-API cursor.
+        migrations (list): dicts with a `version`, a `description` and the
+            `tables` to drop.
+    Returns:
+        list: versions applied.
+    """
+    applied = applied_versions(cursor)
+    ensure_load_state(cursor)
+    versions = []
+    for migration in sorted(migrations, key=lambda migration: migration['version']):
+        if migration['version'] in applied:
+            continue
+        for table in migration['tables']:
+            cursor.execute('DROP TABLE IF EXISTS {} CASCADE'.format(table))
+            cursor.execute('DELETE FROM public.load_watermarks WHERE table_name = %s', (table,))
+        cursor.execute('INSERT INTO public.schema_migrations (version, description, applied_at) VALUES (%s, %s, %s)',
+                       (migration['version'], migration['description'], datetime.utcnow()))
+        versions.append(migration['version'])
+    return versions
+
+
+def changed_tables(statements, rewritten):
+    """Lists the tables a migration has to drop for rewritten SqlQueriesCreate statements.
+
+    Besides the tables whose statement changed, every table with a foreign
+    key to one of them is listed, as dropping with CASCADE removes its key.
+
+    Args:
+        statements (dict): {attribute: CREATE TABLE statement} of every
+            table, before the rewrite.
+        rewritten (dict): {attribute: new CREATE TABLE statement}
+    Returns:
+        list: schema-qualified tables, in `statements` order.
+    """
+    changed = {table_name(statements[attribute]) for attribute, ddl in rewritten.items()
+               if statements[attribute].split() != ddl.split()}
+    referencing = {table_name(ddl): {ref_table for _, ref_table, _ in foreign_keys(ddl)}
+                   for ddl in statements.values()}
+    while True:
+        added = {table for table, ref_tables in referencing.items() if ref_tables & changed} - changed
+        if not added:
+            break
+        changed |= added
+    return ['public.{}'.format(table_name(ddl)) for ddl in statements.values() if table_name(ddl) in changed]
+
+
+def add_migration(source, description, tables):
+    """Appends a migration to SCHEMA_MIGRATIONS in the source of this module.
+
+    Args:
+        source (str): text of migrations.py.
+        description (str): what the migration changes.
+        tables (list): schema-qualified tables to drop.
+    Returns:
+        tuple: (updated source, version of the new migration)
+    """
+    start = source.index('SCHEMA_MIGRATIONS = [')
+    end = source.index('\n]\n', start)
+    version = max(int(v) for v in re.findall(r"'version':\s*(\d+)", source[start:end])) + 1
+    entry = "\n    {{'version': {},\n     'description': {!r},\n     'tables': {!r}}},".format(
+        version, description, list(tables))
+    return source[:end] + entry + source[end:], version
+
+
+def save_statements(statements, description):
+    """Rewrites statements of SqlQueriesCreate and adds the migration recreating their tables.
+
+    Used by the `--write` option of infer_schema.py and analyze_keys.py.
+
+    Args:
+        statements (dict): {SqlQueriesCreate attribute: new CREATE TABLE statement}
+        description (str): what the migration changes.
+    Returns:
+        tuple: (version of the new migration, tables it drops), or None if
+            no statement changed.
+    """
+    current = {name: value for name, value in vars(SqlQueriesCreate).items()
+               if isinstance(value, str) and 'CREATE TABLE' in value}
+    tables = changed_tables(current, statements)
+    if not tables:
+        return None
+    helpers_dir = os.path.dirname(os.path.abspath(__file__))
+    create_path = os.path.join(helpers_dir, 'sql_queries_create.py')
+    migrations_path = os.path.join(helpers_dir, 'migrations.py')
+    with open(create_path) as f:
+        create_source = replace_statements(f.read(), statements)
+    with open(migrations_path) as f:
+        migrations_source, version = add_migration(f.read(), description, tables)
+    with open(create_path, 'w') as f:
+        f.write(create_source)
+    with open(migrations_path, 'w') as f:
+        f.write(migrations_source)
+    return version, tables
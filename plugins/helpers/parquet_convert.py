@@ -0,0 +1,186 @@
+import hashlib
+import os
+import re
+
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+
+_COLUMN = re.compile(r'^\s*(?P<name>\w+)\s+(?P<type>[A-Za-z]+)(?:\s*\([\d,\s]+\))?', re.MULTILINE)
+_NOT_COLUMNS = {'CREATE', 'PRIMARY', 'FOREIGN', 'UNIQUE', 'DISTSTYLE', 'DISTKEY', 'SORTKEY',
+                'COMPOUND', 'INTERLEAVED', 'CONSTRAINT'}
+
+ARROW_TYPES = {
+    'SMALLINT': pa.int16(),
+    'INT': pa.int32(),
+    'INTEGER': pa.int32(),
+    'BIGINT': pa.int64(),
+    'FLOAT': pa.float64(),
+    'REAL': pa.float32(),
+    'DOUBLE': pa.float64(),
+    'DECIMAL': pa.float64(),
+    'BOOLEAN': pa.bool_(),
+    'DATE': pa.date32(),
+    'TIMESTAMP': pa.timestamp('us'),
+    'CHAR': pa.string(),
+    'VARCHAR': pa.string(),
+}
+
+
+def ddl_columns(ddl):
+    """Parses the column names and SQL types of a CREATE TABLE statement.
+
+    Args:
+        ddl (str): a CREATE TABLE statement from SqlQueriesCreate.
+    Returns:
+        list: (name, SQL type) in table order.
+    """
+    body = ddl[ddl.index('(') + 1:]
+    return [(m.group('name'), m.group('type').upper())
+            for m in _COLUMN.finditer(body)
+            if m.group('name').upper() not in _NOT_COLUMNS]
+
+
+def ddl_schema(ddl):
+    """Returns the Arrow schema matching the columns of a CREATE TABLE statement.
+
+    Args:
+        ddl (str): a CREATE TABLE statement from SqlQueriesCreate.
+    Returns:
+        pyarrow.Schema
+    """
+    return pa.schema([(name, ARROW_TYPES[sql_type]) for name, sql_type in ddl_columns(ddl)])
+
+
+def schema_digest(ddl):
+    """Returns a short hash of the Arrow schema of a CREATE TABLE statement.
+
+    Conversion markers include it, so that renaming or retyping a column
+    converts the source again, while layout or constraint edits do not.
+
+    Args:
+        ddl (str): a CREATE TABLE statement from SqlQueriesCreate.
+    Returns:
+        str: the first 8 hex digits of the MD5 of the column names and types.
+    """
+    columns = ','.join('{} {}'.format(field.name, field.type) for field in ddl_schema(ddl))
+    return hashlib.md5(columns.encode('utf-8')).hexdigest()[:8]
+
+
+def read_csv_batches(path, schema, delimiter=',', block_size=16 * 1024 ** 2):
+    """Streams a CSV file as typed record batches of roughly `block_size` bytes.
+
+    The header row is skipped and the columns are named and typed after
+    `schema`, in order. Only empty fields are nulls, so codes such as 'NA'
+    (North America) are kept.
+
+    Args:
+        path (str): local CSV file.
+        schema (pyarrow.Schema): target column names and types.
+        delimiter (str): CSV delimiter.
+        block_size (int): bytes of CSV parsed per batch.
+    Returns:
+        pyarrow.csv.CSVStreamingReader
+    """
+    return pv.open_csv(
+        path,
+        read_options=pv.ReadOptions(column_names=schema.names, skip_rows=1, block_size=block_size),
+        parse_options=pv.ParseOptions(delimiter=delimiter),
+        convert_options=pv.ConvertOptions(column_types=schema, null_values=[''], strings_can_be_null=True)
+    )
+
+
+class ParquetPartWriter:
+    """Writes record batches to one or more compressed Parquet files.
+
+    Batches are buffered until a full row group is available, so memory use
+    is bounded by `row_group_size` rows. A new part is started every
+    `rows_per_file` rows so the files can be COPYed in parallel.
+
+    Attributes:
+        parts (list): [path, rows] of every part written so far.
+    """
+
+    def __init__(self, schema, output_dir, row_group_size=500000, rows_per_file=None,
+                 compression='snappy', name_prefix='part'):
+        """Args:
+            schema (pyarrow.Schema): schema of the Parquet files.
+            output_dir (str): local directory for the parts.
+            row_group_size (int): rows per Parquet row group.
+            rows_per_file (:obj:`int`, optional): maximum rows per part.
+            compression (str): Parquet compression codec.
+            name_prefix (str): parts are named <name_prefix>-0000.parquet, ...
+        """
+        self.schema = schema
+        self.output_dir = output_dir
+        self.row_group_size = row_group_size
+        self.rows_per_file = rows_per_file
+        self.compression = compression
+        self.name_prefix = name_prefix
+        self.parts = []
+        self._writer = None
+        self._buffered = []
+        self._buffered_rows = 0
+
+    def _flush(self, rows):
+        table = pa.Table.from_batches(self._buffered, schema=self.schema)
+        if self._writer is None:
+            path = os.path.join(self.output_dir, '{}-{:04d}.parquet'.format(self.name_prefix, len(self.parts)))
+            self._writer = pq.ParquetWriter(path, self.schema, compression=self.compression)
+            self.parts.append([path, 0])
+        self._writer.write_table(table.slice(0, rows), row_group_size=self.row_group_size)
+        self.parts[-1][1] += rows
+        self._buffered = table.slice(rows).to_batches()
+        self._buffered_rows -= rows
+        if self.rows_per_file and self.parts[-1][1] >= self.rows_per_file:
+            self._writer.close()
+            self._writer = None
+
+    def _next_flush_rows(self):
+        rows = self.row_group_size
+        if self.rows_per_file:
+            rows = min(rows, self.rows_per_file - (self.parts[-1][1] if self._writer is not None else 0))
+        return rows
+
+    def write(self, batch):
+        """Buffers a RecordBatch matching the schema, writing every full row group."""
+        self._buffered.append(batch)
+        self._buffered_rows += batch.num_rows
+        while self._buffered_rows >= self._next_flush_rows():
+            self._flush(self._next_flush_rows())
+
+    def close(self):
+        """Writes the remaining rows and closes the last part.
+
+        Returns:
+            list: (path, rows) of every part written.
+        """
+        if self._buffered_rows:
+            self._flush(self._buffered_rows)
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        return [tuple(part) for part in self.parts]
+
+
+def write_parquet_parts(batches, schema, output_dir, row_group_size=500000,
+                        rows_per_file=None, compression='snappy'):
+    """Writes record batches to one or more compressed Parquet files.
+
+    See ParquetPartWriter.
+
+    Args:
+        batches (iterable): pyarrow RecordBatches matching `schema`.
+        schema (pyarrow.Schema): schema of the Parquet files.
+        output_dir (str): local directory for the parts.
+        row_group_size (int): rows per Parquet row group.
+        rows_per_file (:obj:`int`, optional): maximum rows per part.
+        compression (str): Parquet compression codec.
+    Returns:
+        list: (path, rows) of every part written.
+    """
+    writer = ParquetPartWriter(schema, output_dir, row_group_size, rows_per_file, compression)
+    for batch in batches:
+        writer.write(batch)
+    return writer.close()
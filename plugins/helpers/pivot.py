@@ -0,0 +1,77 @@
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+def pivot_source_schema(schema, pivot_column, value_column, columns):
+    """Returns the schema of the long-format rows a pivoted schema is built from.
+
+    The long rows hold every column of `schema` that is not pivoted, then
+    `pivot_column` and `value_column`, as the last two columns of
+    us-cities-demographics.csv do.
+
+    Args:
+        schema (pyarrow.Schema): schema of the pivoted rows.
+        pivot_column (str): column naming the pivoted column of a row, e.g. 'race'.
+        value_column (str): column holding the pivoted value, e.g. 'count'.
+        columns (dict): {value of `pivot_column`: pivoted column}.
+    Returns:
+        pyarrow.Schema
+    """
+    pivoted = set(columns.values())
+    value_type = schema.field(next(iter(columns.values()))).type
+    return pa.schema([field for field in schema if field.name not in pivoted]
+                     + [(pivot_column, pa.string()), (value_column, value_type)])
+
+
+def _aggregate(table, index, pivoted):
+    """Groups a table by `index`, summing the `pivoted` columns.
+
+    The other columns repeat the same value on every row of an index, so
+    any of them will do; 'max' keeps the column names and types.
+    """
+    aggregations = [(name, 'sum' if name in pivoted else 'max') for name in table.column_names if name not in index]
+    grouped = table.group_by(index).aggregate(aggregations)
+    # Group-by outputs are named <column>_<function>.
+    return grouped.rename_columns([name if name in index else name.rsplit('_', 1)[0]
+                                   for name in grouped.column_names])
+
+
+def _partial_pivot(table, index, pivot_column, value_column, columns):
+    """Pivots a table, summing the values of every index and pivot value."""
+    unknown = set(pc.unique(table.column(pivot_column)).to_pylist()) - set(columns) - {None}
+    if unknown:
+        raise ValueError('Unknown {} values: {}'.format(pivot_column, ', '.join(sorted(unknown))))
+    for value, column in columns.items():
+        table = table.append_column(column, pc.if_else(pc.equal(table.column(pivot_column), value),
+                                                       table.column(value_column), None))
+    return _aggregate(table.drop([pivot_column, value_column]), index, set(columns.values()))
+
+
+def pivot_batches(batches, schema, index, pivot_column, value_column, columns):
+    """Pivots long-format rows into one row per index, with a column per pivot value.
+
+    Every batch is pivoted and aggregated as it streams in, and its partial
+    rows are added to the rows of the earlier batches, so memory use is
+    bounded by the number of output rows plus one batch. A value of `pivot_column` missing from `columns` fails the
+    pivot rather than being dropped.
+
+    Args:
+        batches (iterable): RecordBatches typed after pivot_source_schema().
+        schema (pyarrow.Schema): schema of the pivoted rows.
+        index (list): columns identifying an output row, e.g. ['city', 'state'].
+        pivot_column (str): column naming the pivoted column of a row, e.g. 'race'.
+        value_column (str): column holding the pivoted value, e.g. 'count'.
+        columns (dict): {value of `pivot_column`: pivoted column}.
+    Yields:
+        pyarrow.RecordBatch: rows matching `schema`.
+    """
+    table = None
+    for batch in batches:
+        if not batch.num_rows:
+            continue
+        partial = _partial_pivot(pa.Table.from_batches([batch]), index, pivot_column, value_column, columns)
+        table = partial if table is None else _aggregate(pa.concat_tables([table, partial]), index,
+                                                         set(columns.values()))
+    if table is None:
+        return
+    yield from table.select(schema.names).cast(schema).sort_by([(name, 'ascending') for name in index]).to_batches()
@@ -0,0 +1,108 @@
+import codecs
+import csv
+import gzip
+import struct
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from helpers.connections import warehouse_dialect
+
+
+def copied_row_count(cursor):
+    """Returns the number of rows loaded by the last COPY on this session.
+
+    Redshift reports it through pg_last_copy_count(); on Postgres (e.g. a
+    local stand-in replaying the COPY from STDIN) the cursor's rowcount is
+    used instead.
+
+    Args:
+        cursor (cursor): the cursor that ran the COPY.
+    Returns:
+        int: rows loaded.
+    """
+    rowcount = cursor.rowcount
+    if warehouse_dialect(cursor) != 'redshift':
+        return rowcount
+    cursor.execute('SELECT pg_last_copy_count()')
+    return cursor.fetchone()[0]
+
+
+def parquet_row_count(s3_client, bucket, key):
+    """Reads the row count of a Parquet object from its footer only.
+
+    Args:
+        s3_client (boto client object): the s3 client.
+        bucket (str): S3 Bucket of the object.
+        key (str): S3 Key of the object.
+    Returns:
+        int: rows in the file.
+    """
+    tail = s3_client.get_object(Bucket=bucket, Key=key, Range='bytes=-8')['Body'].read()
+    footer_length = struct.unpack('<I', tail[:4])[0]
+    footer = s3_client.get_object(Bucket=bucket, Key=key,
+                                  Range='bytes=-{}'.format(footer_length + 8))['Body'].read()
+    return pq.read_metadata(pa.BufferReader(b'PAR1' + footer)).num_rows
+
+
+def csv_row_count(s3_client, bucket, key, delimiter=',', ignore_headers=0, compression=''):
+    """Counts the data rows of a CSV object by streaming it.
+
+    Args:
+        s3_client (boto client object): the s3 client.
+        bucket (str): S3 Bucket of the object.
+        key (str): S3 Key of the object.
+        delimiter (str): CSV delimiter.
+        ignore_headers (int): number of header lines to skip.
+        compression (:obj:`str`, optional): 'GZIP' for gzipped objects.
+    Returns:
+        int: rows in the file.
+    """
+    body = s3_client.get_object(Bucket=bucket, Key=key)['Body']
+    if compression.upper() == 'GZIP':
+        body = gzip.GzipFile(fileobj=body)
+    rows = sum(1 for _ in csv.reader(codecs.getreader('utf-8')(body), delimiter=delimiter))
+    return max(rows - ignore_headers, 0)
+
+
+def source_keys(s3_client, bucket, key):
+    """Lists the data objects a COPY from `key` reads.
+
+    Args:
+        s3_client (boto client object): the s3 client.
+        bucket (str): S3 Bucket of the source.
+        key (str): S3 Key or prefix of the source.
+    Returns:
+        list: S3 Keys of the data objects.
+    """
+    keys = []
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=key):
+        keys.extend(obj['Key'] for obj in page.get('Contents', []) if obj['Size'] > 0)
+    return keys
+
+
+def source_row_count(s3_client, bucket, key, file_format='csv', delimiter=',', ignore_headers=0, compression=''):
+    """Counts the rows a COPY from `key` should load, without the warehouse.
+
+    Parquet sources are counted from their footers; CSV sources are
+    streamed and counted.
+
+    Args:
+        s3_client (boto client object): the s3 client.
+        bucket (str): S3 Bucket of the source.
+        key (str): S3 Key or prefix of the source.
+        file_format (str): 'csv' or 'parquet'.
+        delimiter (str): CSV delimiter.
+        ignore_headers (int): number of header lines per CSV file.
+        compression (:obj:`str`, optional): 'GZIP' for gzipped CSV files.
+    Returns:
+        int: expected rows.
+    """
+    total = 0
+    for data_key in source_keys(s3_client, bucket, key):
+        if file_format == 'parquet':
+            total += parquet_row_count(s3_client, bucket, data_key)
+        else:
+            total += csv_row_count(s3_client, bucket, data_key, delimiter, ignore_headers, compression)
+    return total
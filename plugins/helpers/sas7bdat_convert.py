@@ -0,0 +1,123 @@
+import os
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from helpers.parquet_convert import ParquetPartWriter
+
+
+# SAS7BDAT stores numbers as doubles and text as fixed-width strings.
+SAS_TYPES = {b'd': pa.float64(), b's': pa.string()}
+
+
+def open_sas7bdat(path, chunk_rows=200000, encoding='latin-1'):
+    """Opens a SAS7BDAT file for reading `chunk_rows` rows at a time.
+
+    Dates are left as SAS day offsets, as the DAG converts them after the
+    staging Parquet files are written.
+
+    Args:
+        path (str): local SAS7BDAT file.
+        chunk_rows (int): rows per chunk.
+        encoding (str): encoding of the text columns.
+    Returns:
+        pandas.io.sas.sas7bdat.SAS7BDATReader: iterator of DataFrames.
+    """
+    from pandas.io.sas.sas7bdat import SAS7BDATReader
+    return SAS7BDATReader(path, convert_dates=False, encoding=encoding, chunksize=chunk_rows)
+
+
+def sas7bdat_schema(reader, columns=None):
+    """Returns the Arrow schema of a SAS7BDAT file from its header.
+
+    Types come from the file rather than from the data, so that a chunk in
+    which a text column is entirely blank is still written as strings.
+
+    Args:
+        reader (SAS7BDATReader): reader returned by open_sas7bdat.
+        columns (:obj:`list`, optional): columns to keep, in order; the
+            monthly I94 files do not all have the same extra columns.
+    Returns:
+        pyarrow.Schema
+    """
+    types = dict(zip(reader.column_names, (SAS_TYPES[ctype] for ctype in reader.column_types)))
+    missing = [column for column in columns or [] if column not in types]
+    if missing:
+        raise ValueError('Columns missing from the SAS7BDAT file: {}'.format(', '.join(missing)))
+    return pa.schema([(name, types[name]) for name in columns or reader.column_names])
+
+
+def partition_dir(partition_columns, values):
+    """Formats the Hive-style partition directory of a tuple of values, e.g. 'i94yr=2016/i94mon=4'."""
+    return '/'.join('{}={}'.format(column, int(value) if float(value).is_integer() else value)
+                    for column, value in zip(partition_columns, values))
+
+
+def split_partitions(table, partition_columns):
+    """Splits a table by the values of its partition columns.
+
+    Args:
+        table (pyarrow.Table): rows to split.
+        partition_columns (list): columns whose values name the partition.
+    Returns:
+        list: (partition directory, pyarrow.Table) for every partition in `table`.
+    """
+    for column in partition_columns:
+        if table.column(column).null_count:
+            raise ValueError(f'{table.column(column).null_count} rows have no {column}')
+    values = table.group_by(list(partition_columns)).aggregate([]).to_pylist()
+    if len(values) == 1:
+        return [(partition_dir(partition_columns, values[0].values()), table)]
+    partitions = []
+    for value in values:
+        mask = None
+        for column in partition_columns:
+            equal = pc.equal(table.column(column), value[column])
+            mask = equal if mask is None else pc.and_(mask, equal)
+        partitions.append((partition_dir(partition_columns, value.values()), table.filter(mask)))
+    return partitions
+
+
+def convert_sas7bdat(path, output_dir, columns=None, partition_columns=('i94yr', 'i94mon'),
+                     chunk_rows=200000, row_group_size=500000, rows_per_file=None, encoding='latin-1'):
+    """Converts a SAS7BDAT file into Parquet parts partitioned by column values.
+
+    The file is read `chunk_rows` rows at a time and every partition buffers
+    at most one row group, so memory use does not grow with the file size.
+    The partition columns are kept inside the Parquet files, as Redshift
+    does not load them from the path. Runs in a worker process of
+    SAS7BDATToParquetOperator, so it only takes and returns plain values.
+
+    Args:
+        path (str): local SAS7BDAT file.
+        output_dir (str): local directory; parts are written to
+            <output_dir>/<column>=<value>/.../<file name>-0000.parquet.
+        columns (:obj:`list`, optional): columns to keep, in order.
+        partition_columns (tuple): columns the parts are partitioned by.
+        chunk_rows (int): rows read from the SAS7BDAT file at a time.
+        row_group_size (int): rows per Parquet row group.
+        rows_per_file (:obj:`int`, optional): maximum rows per part.
+        encoding (str): encoding of the text columns.
+    Returns:
+        list: (partition directory, local path, rows) of every part written.
+    """
+    name_prefix = os.path.splitext(os.path.basename(path))[0]
+    writers = {}
+    reader = open_sas7bdat(path, chunk_rows, encoding)
+    try:
+        schema = sas7bdat_schema(reader, columns)
+        for chunk in reader:
+            table = pa.Table.from_pandas(chunk[schema.names], schema=schema, preserve_index=False)
+            for partition, rows in split_partitions(table, partition_columns):
+                if partition not in writers:
+                    partition_path = os.path.join(output_dir, partition)
+                    os.makedirs(partition_path, exist_ok=True)
+                    writers[partition] = ParquetPartWriter(schema, partition_path, row_group_size,
+                                                           rows_per_file, name_prefix=name_prefix)
+                for batch in rows.to_batches():
+                    writers[partition].write(batch)
+    finally:
+        reader.close()
+    return [(partition, part_path, rows)
+            for partition, writer in writers.items()
+            for part_path, rows in writer.close()]
@@ -0,0 +1,81 @@
+from datetime import date
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+SAS_EPOCH = date(1960, 1, 1)
+MIN_DATE = date(1900, 1, 1)
+MAX_DATE = date(2100, 12, 31)
+SAS_DAYS = 'sas'
+
+_UNIX_EPOCH = date(1970, 1, 1)
+
+
+def _within_range(dates):
+    """Nulls the dates of a date32 array outside [MIN_DATE, MAX_DATE]."""
+    valid = pc.and_(pc.greater_equal(dates, pa.scalar(MIN_DATE)), pc.less_equal(dates, pa.scalar(MAX_DATE)))
+    return pc.if_else(valid, dates, pa.scalar(None, pa.date32()))
+
+
+def sas_days_to_date(values):
+    """Converts SAS dates (days since 1960-01-01) to a date32 array.
+
+    Non-finite, fractional and out-of-range values become nulls.
+
+    Args:
+        values (pyarrow.Array): numeric SAS dates.
+    Returns:
+        pyarrow.Array: date32 values.
+    """
+    days = pc.cast(values, pa.float64())
+    whole = pc.and_(pc.is_finite(days), pc.equal(days, pc.floor(days)))
+    days = pc.if_else(whole, days, pa.scalar(None, pa.float64()))
+    unix_days = pc.add(days, float((SAS_EPOCH - _UNIX_EPOCH).days))
+    # Clamp before the int32 cast so sentinels cannot overflow it; the range
+    # check below turns them into nulls.
+    unix_days = pc.min_element_wise(pc.max_element_wise(unix_days, -2.0 ** 31), 2.0 ** 31 - 1)
+    return _within_range(pc.cast(pc.cast(unix_days, pa.int32()), pa.date32()))
+
+
+def parse_date_strings(values, date_format):
+    """Parses date strings such as '20160401' to a date32 array.
+
+    Unparseable, impossible (e.g. February 30) and out-of-range values
+    become nulls.
+
+    Args:
+        values (pyarrow.Array): date strings.
+        date_format (str): strptime format, e.g. '%Y%m%d'.
+    Returns:
+        pyarrow.Array: date32 values.
+    """
+    values = pc.utf8_trim_whitespace(pc.cast(values, pa.string()))
+    timestamps = pc.strptime(values, format=date_format, unit='s', error_is_null=True)
+    # strptime rolls impossible dates over (0230 -> 0301); keep round trips only.
+    exact = pc.equal(pc.strftime(timestamps, format=date_format), values)
+    timestamps = pc.if_else(exact, timestamps, pa.scalar(None, timestamps.type))
+    return _within_range(pc.cast(timestamps, pa.date32()))
+
+
+def convert_dates(table, date_columns):
+    """Converts columns of a table to DATE, counting the invalid values.
+
+    Args:
+        table (pyarrow.Table): source rows.
+        date_columns (dict): {column: SAS_DAYS or a strptime format}
+    Returns:
+        tuple: (converted table, {column: values turned to null})
+    """
+    invalid = {}
+    for column, date_format in date_columns.items():
+        idx = table.schema.get_field_index(column)
+        values = table.column(idx).combine_chunks()
+        converted = sas_days_to_date(values) if date_format == SAS_DAYS else parse_date_strings(values, date_format)
+        # Empty strings are missing, not invalid.
+        missing = values.null_count
+        if pa.types.is_string(values.type):
+            missing += pc.sum(pc.equal(pc.utf8_trim_whitespace(values), '')).as_py() or 0
+        invalid[column] = converted.null_count - missing
+        table = table.set_column(idx, pa.field(column, pa.date32()), converted)
+    return table, invalid
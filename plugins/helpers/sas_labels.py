@@ -0,0 +1,178 @@
+import codecs
+import json
+import os
+import re
+import tempfile
+import time
+
+from helpers.load_metrics import TimedReader
+
+
+SAS_LABELS_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'sas_labels_cache')
+
+
+_QUOTED = r"'(?P<{0}q>(?:[^']|'')*)'|\"(?P<{0}d>(?:[^\"]|\"\")*)\""
+_PAIR = re.compile(
+    r"\s*(?:" + _QUOTED.format('code') + r"|(?P<codeb>[^\s=;'\"]+))"
+    r"\s*=\s*"
+    r"(?:" + _QUOTED.format('label') + r"|(?P<labelb>(?:(?!\*/)[^;'\"])*))"
+)
+_VALUE_HEADER = re.compile(r"\s*value\s+\$?(?P<name>\w+)", re.IGNORECASE)
+_COMMENT_HEADER = re.compile(r"\s*/\*\s*(?P<name>\w+)\s+-\s")
+_BLOCK_END = re.compile(r"\s*(?:;|\*/)")
+
+
+def _unquote(match, group):
+    """Returns the text of a quoted or bare token matched by _PAIR."""
+    if match.group(group + 'q') is not None:
+        return match.group(group + 'q').replace("''", "'")
+    if match.group(group + 'd') is not None:
+        return match.group(group + 'd').replace('""', '"')
+    return match.group(group + 'b').strip()
+
+
+def iter_sas_labels(lines):
+    """Streams the code:label pairs of every block in the SAS labels file.
+
+    Blocks are opened either by a `value <name>` statement or by a comment
+    header such as `/* I94VISA - ...` and are closed by a `;` (or the end of
+    the comment). Codes and labels may be quoted with ' or ", in which case
+    they can contain `=` and `;`. The file is read one line at a time, so
+    memory use does not grow with the size of the file.
+
+    Args:
+        lines (iterable): lines of the SAS labels file, e.g. a file object.
+    Yields:
+        tuple: (value_name, code, label)
+    """
+    name = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        header = _VALUE_HEADER.match(line)
+        if header:
+            name = header.group('name')
+            pos = header.end()
+        elif name is None:
+            comment = _COMMENT_HEADER.match(line)
+            if comment and '*/' not in line:
+                name = comment.group('name')
+            continue
+        else:
+            pos = 0
+
+        while True:
+            pair = _PAIR.match(line, pos)
+            if pair:
+                yield name, _unquote(pair, 'code'), _unquote(pair, 'label')
+                pos = pair.end()
+                continue
+            if _BLOCK_END.match(line, pos):
+                name = None
+            break
+
+
+def iter_sas_value(lines, value_name):
+    """Streams the (code, label) pairs of a single block.
+
+    Reading stops as soon as the block has been consumed. The DAG does not
+    use it: SASLabelsCache tokenizes the whole file once per ETag for every
+    dimension, which saves more than streaming one block per task would.
+
+    Args:
+        lines (iterable): lines of the SAS labels file, e.g. a file object.
+        value_name (str): value in SAS labels to extract.
+    Yields:
+        tuple: (code, label)
+    """
+    found = False
+    for name, code, label in iter_sas_labels(lines):
+        if name == value_name:
+            found = True
+            yield code, label
+        elif found:
+            return
+
+
+def parse_sas_labels(lines):
+    """Parses every code:label block of the SAS labels file in one pass.
+
+    Args:
+        lines (iterable): lines of the SAS labels file, e.g. a file object.
+    Returns:
+        dict: {value_name: [[code, label], ...]} for every block found.
+    """
+    labels = {}
+    for name, code, label in iter_sas_labels(lines):
+        labels.setdefault(name, []).append([code, label])
+    return labels
+
+
+class SASLabelsCache:
+    """Local cache of the parsed SAS labels file, keyed by the S3 ETag.
+
+    The file is downloaded and parsed at most once per ETag; every dimension
+    load then reads its block from the cache. A cache miss (e.g. on a worker
+    that does not share the cache directory) falls back to a download.
+    """
+
+    def __init__(self, cache_dir=SAS_LABELS_CACHE_DIR):
+        """Args:
+            cache_dir (str): directory holding the cached, parsed labels.
+        """
+        self.cache_dir = cache_dir
+
+    def path(self, etag):
+        """Returns the cache file path for an ETag."""
+        return os.path.join(self.cache_dir, '{}.json'.format(etag))
+
+    def get_labels(self, s3_hook, bucket, key, log=None, metrics=None):
+        """Returns the parsed labels for s3://bucket/key.
+
+        Args:
+            s3_hook (S3Hook): hook used to reach the bucket.
+            bucket (str): S3 Bucket for SAS labels.
+            key (str): S3 Key for SAS labels.
+            log (:obj:`Logger`, optional): logger for cache hits/misses.
+            metrics (:obj:`LoadMetrics`, optional): records a 'cache_read'
+                phase, or 'download' and 'parse' phases on a cache miss.
+        Returns:
+            dict: {value_name: [[code, label], ...]}
+        """
+        start = time.perf_counter()
+        s3_object = s3_hook.get_key(key, bucket)
+        etag = s3_object.e_tag.strip('"')
+        cache_path = self.path(etag)
+
+        if os.path.exists(cache_path):
+            if log:
+                log.info('SAS labels cache hit: {}'.format(cache_path))
+            with open(cache_path) as f:
+                labels = json.load(f)
+            if metrics:
+                metrics.record('cache_read', time.perf_counter() - start,
+                               sum(len(rows) for rows in labels.values()), os.path.getsize(cache_path))
+            return labels
+
+        if log:
+            log.info('SAS labels cache miss, downloading s3://{}/{}'.format(bucket, key))
+        raw = TimedReader(s3_object.get()['Body'])
+        labels = parse_sas_labels(codecs.getreader('utf-8')(raw))
+        if metrics:
+            # The file is parsed as it streams in: time spent waiting on S3
+            # is the download, the rest of the elapsed time is the parse.
+            elapsed = time.perf_counter() - start
+            metrics.record('download', raw.seconds, size=raw.bytes)
+            metrics.record('parse', elapsed - raw.seconds, sum(len(rows) for rows in labels.values()))
+
+        # Write to a temporary file first so that concurrent readers never
+        # see a partially written cache entry.
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(labels, f)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return labels
@@ -0,0 +1,274 @@
+import re
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from helpers.ddl import foreign_keys
+
+
+MAX_DISTINCT = 256
+MAX_CHAR_LENGTH = 16
+MAX_VARCHAR_LENGTH = 65535
+
+_INT_TYPES = [('SMALLINT', -2 ** 15, 2 ** 15 - 1), ('INT', -2 ** 31, 2 ** 31 - 1), ('BIGINT', -2 ** 63, 2 ** 63 - 1)]
+_TYPE_RANK = ['SMALLINT', 'INT', 'BIGINT', 'FLOAT']
+_COLUMN_LINE = re.compile(r'^(?P<indent>\s*)(?P<name>\w+)\s+(?P<type>[A-Za-z]+(?:\s*\([\d,\s]+\))?)'
+                          r'(?:\s+ENCODE\s+\w+)?(?P<rest>.*?)(?P<comma>,?)\s*$')
+
+
+def _merge_kinds(a, b):
+    """Returns the narrowest kind able to hold values of kinds `a` and `b`."""
+    if a is None or a == b:
+        return b
+    if {a, b} == {'int', 'float'}:
+        return 'float'
+    return 'string'
+
+
+def _is_whole(arr):
+    """True if every float in a null-free array is a finite whole number."""
+    return pc.all(pc.and_(pc.is_finite(arr), pc.equal(arr, pc.floor(arr)))).as_py()
+
+
+class ColumnProfile:
+    """Accumulates what is seen of one column across batches.
+
+    Attributes:
+        kind (str): narrowest kind holding every value seen: 'int', 'float',
+            'date', 'timestamp', 'bool' or 'string'; None if all nulls.
+        minimum, maximum: range of numeric values.
+        max_bytes (int): longest UTF-8 encoded string value.
+        min_chars (int): shortest string value, in characters.
+        ascii (bool): every string value is ASCII.
+        distinct (set): distinct values, up to MAX_DISTINCT (None beyond).
+        nulls (int): null values seen.
+        rows (int): values seen.
+    """
+
+    def __init__(self):
+        self.kind = None
+        self.minimum = None
+        self.maximum = None
+        self.max_bytes = 0
+        self.min_chars = None
+        self.ascii = True
+        self.distinct = set()
+        self.nulls = 0
+        self.rows = 0
+
+    def update(self, arr, from_text=False):
+        """Profiles a pyarrow Array of the column.
+
+        Args:
+            arr (pyarrow.Array): values of the column.
+            from_text (bool): values are text from a CSV, to be tried as
+                integers, floats and dates before falling back to strings.
+        """
+        self.rows += len(arr)
+        self.nulls += arr.null_count
+        arr = arr.drop_null()
+        if len(arr) == 0:
+            return
+
+        kind, values = self._classify(arr, from_text)
+        self.kind = _merge_kinds(self.kind, kind)
+
+        if kind in ('int', 'float'):
+            bounds = pc.min_max(values)
+            low, high = bounds['min'].as_py(), bounds['max'].as_py()
+            self.minimum = low if self.minimum is None else min(self.minimum, low)
+            self.maximum = high if self.maximum is None else max(self.maximum, high)
+
+        text = pc.cast(arr, pa.string())
+        self.max_bytes = max(self.max_bytes, pc.max(pc.binary_length(text)).as_py())
+        shortest = pc.min(pc.utf8_length(text)).as_py()
+        self.min_chars = shortest if self.min_chars is None else min(self.min_chars, shortest)
+        self.ascii = self.ascii and pc.all(pc.string_is_ascii(text)).as_py()
+
+        if self.distinct is not None:
+            self.distinct.update(pc.unique(text).to_pylist())
+            if len(self.distinct) > MAX_DISTINCT:
+                self.distinct = None
+
+    @staticmethod
+    def _classify(arr, from_text):
+        """Returns the kind of a null-free array and its values cast to it."""
+        if pa.types.is_string(arr.type) or pa.types.is_large_string(arr.type):
+            # Codes such as '01' or '007' would lose their leading zeros as numbers.
+            if not from_text or pc.any(pc.match_substring_regex(arr, r'^[-+]?0\d')).as_py():
+                return 'string', arr
+            for typ in (pa.int64(), pa.float64(), pa.date32()):
+                try:
+                    return ColumnProfile._classify(pc.cast(arr, typ), False)
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                    pass
+            return 'string', arr
+        if pa.types.is_integer(arr.type):
+            return 'int', arr
+        if pa.types.is_floating(arr.type):
+            return ('int', arr) if _is_whole(arr) else ('float', arr)
+        if pa.types.is_boolean(arr.type):
+            return 'bool', arr
+        if pa.types.is_date(arr.type):
+            return 'date', arr
+        if pa.types.is_timestamp(arr.type):
+            return 'timestamp', arr
+        return 'string', arr
+
+    def sql_type(self):
+        """Returns the narrowest SQL type holding every value seen, or None
+        if only nulls were seen."""
+        if self.kind == 'int':
+            for name, low, high in _INT_TYPES:
+                if low <= self.minimum and self.maximum <= high:
+                    return name
+            return 'FLOAT'
+        if self.kind == 'float':
+            return 'FLOAT'
+        if self.kind in ('date', 'timestamp', 'bool'):
+            return {'date': 'DATE', 'timestamp': 'TIMESTAMP', 'bool': 'BOOLEAN'}[self.kind]
+        if self.kind == 'string':
+            # CHAR is single-byte only in Redshift; keep it for fixed-width codes.
+            if self.ascii and self.min_chars == self.max_bytes <= MAX_CHAR_LENGTH:
+                return 'CHAR({})'.format(self.max_bytes)
+            return 'VARCHAR({})'.format(varchar_length(self.max_bytes))
+        return None
+
+    def encoding(self, sql_type, sort_key=False):
+        """Picks the Redshift compression encoding for the column.
+
+        Args:
+            sql_type (str): the column's SQL type.
+            sort_key (bool): the column is the (first) sort key, which is
+                left uncompressed so range-restricted scans stay cheap.
+        Returns:
+            str: encoding name.
+        """
+        base = sql_type.split('(')[0].upper()
+        if sort_key or base == 'BOOLEAN':
+            return 'RAW'
+        if base in ('SMALLINT', 'INT', 'INTEGER', 'BIGINT', 'DATE', 'TIMESTAMP', 'DECIMAL'):
+            return 'AZ64'
+        if base in ('CHAR', 'VARCHAR') and self.distinct is not None:
+            return 'BYTEDICT'
+        return 'ZSTD'
+
+
+def varchar_length(max_bytes):
+    """Rounds a VARCHAR length up to the next power of two, leaving headroom
+    for values longer than the sampled ones."""
+    length = 8
+    while length < max_bytes:
+        length *= 2
+    return min(length, MAX_VARCHAR_LENGTH)
+
+
+def profile_batches(batches, names, from_text=False, max_rows=None):
+    """Profiles every column of a stream of record batches.
+
+    Columns are matched to `names` by position, as COPY does.
+
+    Args:
+        batches (iterable): pyarrow RecordBatches.
+        names (list): column names, in table order.
+        from_text (bool): batches hold CSV text.
+        max_rows (:obj:`int`, optional): stop after this many rows.
+    Returns:
+        dict: {name: ColumnProfile}
+    """
+    profiles = {name: ColumnProfile() for name in names}
+    rows = 0
+    for batch in batches:
+        if max_rows is not None and rows + batch.num_rows > max_rows:
+            batch = batch.slice(0, max_rows - rows)
+        for name, column in zip(names, batch.columns):
+            profiles[name].update(column, from_text)
+        rows += batch.num_rows
+        if max_rows is not None and rows >= max_rows:
+            break
+    return profiles
+
+
+def keep_parquet_floats(profiles, arrow_types):
+    """Keeps FLOAT for columns stored as doubles in Parquet.
+
+    COPY ... FORMAT AS PARQUET does not convert between Parquet and column
+    types, so a double column holding whole numbers can only be narrowed to
+    an integer type once the converter writes it with that type.
+
+    Args:
+        profiles (dict): {column: ColumnProfile} of a Parquet source.
+        arrow_types (dict): {column: arrow type as loaded}.
+    Returns:
+        list: the columns that would otherwise have been narrowed.
+    """
+    kept = []
+    for name, arrow_type in arrow_types.items():
+        if pa.types.is_floating(arrow_type) and profiles[name].kind == 'int':
+            profiles[name].kind = 'float'
+            kept.append(name)
+    return kept
+
+
+def _wider_type(a, b):
+    """Returns the narrowest type both sides of a join key fit in."""
+    if a == b:
+        return a
+    base_a, base_b = a.split('(')[0], b.split('(')[0]
+    if base_a in _TYPE_RANK and base_b in _TYPE_RANK:
+        return max(a, b, key=_TYPE_RANK.index)
+    if base_a in ('CHAR', 'VARCHAR') and base_b in ('CHAR', 'VARCHAR'):
+        length = max(int(re.search(r'\d+', t).group()) for t in (a, b))
+        return '{}({})'.format('CHAR' if base_a == base_b == 'CHAR' else 'VARCHAR', length)
+    return b
+
+
+def infer_types(ddls, profiles):
+    """Infers the narrowest type of every profiled column of many tables.
+
+    Foreign key columns and the columns they reference get the same type,
+    so joins compare (and hash) identical types.
+
+    Args:
+        ddls (dict): {table: CREATE TABLE statement}
+        profiles (dict): {table: {column: ColumnProfile}}
+    Returns:
+        dict: {table: {column: SQL type}}, unprofiled and all-null columns
+            left out.
+    """
+    types = {table: {column: profile.sql_type() for column, profile in columns.items()
+                     if profile.sql_type() is not None}
+             for table, columns in profiles.items()}
+    for table, ddl in ddls.items():
+        for column, ref_table, ref_column in foreign_keys(ddl):
+            ours = types.get(table, {}).get(column)
+            theirs = types.get(ref_table, {}).get(ref_column)
+            if ours and theirs:
+                types[table][column] = types[ref_table][ref_column] = _wider_type(ours, theirs)
+    return types
+
+
+def render_ddl(ddl, types, profiles):
+    """Rewrites a CREATE TABLE statement with inferred types and encodings.
+
+    Constraints, keys and table attributes are kept as they are.
+
+    Args:
+        ddl (str): CREATE TABLE statement.
+        types (dict): {column: SQL type} for the table.
+        profiles (dict): {column: ColumnProfile} for the table.
+    Returns:
+        str: the rewritten statement.
+    """
+    lines = []
+    for line in ddl.splitlines():
+        match = _COLUMN_LINE.match(line)
+        if not match or match.group('name') not in profiles:
+            lines.append(line)
+            continue
+        name = match.group('name')
+        sql_type = types.get(name, match.group('type'))
+        encoding = profiles[name].encoding(sql_type, sort_key='SORTKEY' in match.group('rest').upper())
+        lines.append('{}{} {} ENCODE {}{}{}'.format(match.group('indent'), name, sql_type, encoding,
+                                                    match.group('rest'), match.group('comma')))
+    return '\n'.join(lines)
@@ -1,20 +1,20 @@
 class SqlQueriesCreate:
     staging_immigration_create = ("""
         CREATE TABLE IF NOT EXISTS public.staging_immigration (
-            cicid FLOAT PRIMARY KEY,
-            i94yr FLOAT SORTKEY,
-            i94mon FLOAT DISTKEY,
+            cicid BIGINT PRIMARY KEY,
+            i94yr FLOAT,
+            i94mon FLOAT,
             i94cit FLOAT REFERENCES public.dim_i94cit(code),
             i94res FLOAT REFERENCES public.dim_i94cit(code),
-            i94port CHAR(3) REFERENCES public.dim_i94port(code),
-            arrdate FLOAT,
+            i94port SMALLINT REFERENCES public.dim_i94port(port_key),
+            arrdate DATE,
             i94mode FLOAT REFERENCES public.dim_i94mode(code),
-            i94addr VARCHAR REFERENCES public.dim_i94addr(code),
-            depdate FLOAT,
+            i94addr SMALLINT REFERENCES public.dim_i94addr(addr_key),
+            depdate DATE,
             i94bir FLOAT,
             i94visa FLOAT REFERENCES public.dim_i94visa(code),
             count FLOAT,
-            dtadfile VARCHAR,
+            dtadfile DATE,
             visapost CHAR(3),
             occup CHAR(3),
             entdepa CHAR(1),
@@ -22,14 +22,16 @@ class SqlQueriesCreate:
             entdepu CHAR(1),
             matflag CHAR(1),
             biryear FLOAT,
-            dtaddto VARCHAR,
+            dtaddto DATE,
             gender CHAR(1),
             insnum VARCHAR,
             airline VARCHAR,
             admnum FLOAT,
             fltno VARCHAR,
             visatype VARCHAR
-        );
+        )
+        DISTSTYLE EVEN
+        COMPOUND SORTKEY (arrdate, i94port);
     """)
 
     staging_temperature_create = ("""
@@ -40,8 +42,10 @@ class SqlQueriesCreate:
             City VARCHAR,
             Country VARCHAR,
             Latitude VARCHAR,
-            Longitude VARCHAR
-        );
+            Longitude VARCHAR,
+            city_key VARCHAR
+        )
+        DISTSTYLE ALL;
     """)
     
     staging_demographics_create = ("""
@@ -56,8 +60,11 @@ class SqlQueriesCreate:
             foreign_born INT,
             average_household_size FLOAT,
             state_code CHAR(2) REFERENCES public.dim_i94addr(code),
-            race VARCHAR,
-            count INT
+            american_indian_and_alaska_native INT,
+            asian INT,
+            black_or_african_american INT,
+            hispanic_or_latino INT,
+            white INT
         )
         DISTSTYLE ALL;
     """)
@@ -75,8 +82,10 @@ class SqlQueriesCreate:
             gps_code VARCHAR,
             iata_code VARCHAR,
             local_code VARCHAR,
-            coordinates VARCHAR
-        );
+            latitude FLOAT,
+            longitude FLOAT
+        )
+        DISTSTYLE ALL;
     """)
     
     dim_i94cit_create = ("""
@@ -91,7 +100,8 @@ class SqlQueriesCreate:
                      
     dim_i94port_create = ("""
         CREATE TABLE IF NOT EXISTS public.dim_i94port (
-            code CHAR(3) PRIMARY KEY,
+            port_key SMALLINT PRIMARY KEY,
+            code CHAR(3) UNIQUE,
             port VARCHAR
         )
         DISTSTYLE ALL
@@ -107,7 +117,8 @@ class SqlQueriesCreate:
 
     dim_i94addr_create = ("""
         CREATE TABLE IF NOT EXISTS public.dim_i94addr (
-            code CHAR(2) PRIMARY KEY,
+            addr_key SMALLINT PRIMARY KEY,
+            code CHAR(2) UNIQUE,
             addr VARCHAR
         )
         DISTSTYLE ALL
@@ -121,6 +132,37 @@ class SqlQueriesCreate:
         DISTSTYLE ALL
     """)
 
+    dim_i94port_airports_create = ("""
+        CREATE TABLE IF NOT EXISTS public.dim_i94port_airports (
+            port_key SMALLINT SORTKEY REFERENCES public.dim_i94port(port_key),
+            ident VARCHAR,
+            iata_code VARCHAR,
+            airport_type VARCHAR,
+            airport_rank SMALLINT
+        )
+        DISTSTYLE ALL;
+    """)
+
+    load_watermarks_create = ("""
+        CREATE TABLE IF NOT EXISTS public.load_watermarks (
+            table_name VARCHAR(256) NOT NULL,
+            partition_key VARCHAR(1024) NOT NULL,
+            fingerprint VARCHAR(32),
+            row_count BIGINT,
+            loaded_at TIMESTAMP
+        )
+        DISTSTYLE ALL;
+    """)
+
+    schema_migrations_create = ("""
+        CREATE TABLE IF NOT EXISTS public.schema_migrations (
+            version INT NOT NULL,
+            description VARCHAR(256),
+            applied_at TIMESTAMP
+        )
+        DISTSTYLE ALL;
+    """)
+
     staging_tables = {'immigration': staging_immigration_create,
                       'demographics': staging_demographics_create,
                       'airport': staging_airports_create,
@@ -130,5 +172,6 @@ class SqlQueriesCreate:
                   'i94port': dim_i94port_create,
                   'i94mode': dim_i94mode_create,
                   'i94addr': dim_i94addr_create,
-                  'i94visa': dim_i94visa_create}
+                  'i94visa': dim_i94visa_create,
+                  'i94port_airports': dim_i94port_airports_create}
 
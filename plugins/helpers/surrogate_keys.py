@@ -0,0 +1,85 @@
+import json
+
+
+SURROGATE_KEYS_PREFIX = 'surrogate_keys'
+# Keys are stored as SMALLINT.
+MAX_KEY = 2 ** 15 - 1
+
+
+def mapping_key(sas_value, prefix=SURROGATE_KEYS_PREFIX):
+    """S3 Key of the code to surrogate key mapping of a SAS labels value, e.g. 'surrogate_keys/i94prtl.json'."""
+    return '{}/{}.json'.format(prefix, sas_value)
+
+
+def read_mapping(s3_hook, bucket, key):
+    """Reads a code to surrogate key mapping from S3.
+
+    Args:
+        s3_hook (S3Hook): hook used to reach the bucket.
+        bucket (str): S3 Bucket of the mapping.
+        key (str): S3 Key of the mapping, from mapping_key().
+    Returns:
+        dict: {code: key}, empty if no key has been assigned yet.
+    """
+    if not s3_hook.check_for_key(key, bucket):
+        return {}
+    return json.loads(s3_hook.read_key(key, bucket))
+
+
+def write_mapping(s3_hook, bucket, key, mapping):
+    """Writes a code to surrogate key mapping to S3, ordered by key."""
+    s3_hook.load_string(json.dumps(dict(sorted(mapping.items(), key=lambda item: item[1]))),
+                        key, bucket, replace=True)
+
+
+def assign_keys(mapping, codes):
+    """Assigns the next dense surrogate keys to the codes missing from a mapping.
+
+    Keys are never reassigned or reused, even for codes no longer in the
+    labels, so the keys loaded in earlier runs keep their meaning.
+
+    Args:
+        mapping (dict): {code: key} assigned so far.
+        codes (iterable): codes of the dimension, in labels order.
+    Returns:
+        tuple: ({code: key} with every code of `codes`, [codes given a new key])
+    """
+    mapping = dict(mapping)
+    new_codes = []
+    next_key = max(mapping.values(), default=0) + 1
+    for code in codes:
+        code = code.strip()
+        if code in mapping:
+            continue
+        if next_key > MAX_KEY:
+            raise ValueError(f'More than {MAX_KEY} codes, {code} has no SMALLINT key left')
+        mapping[code] = next_key
+        new_codes.append(code)
+        next_key += 1
+    return mapping, new_codes
+
+
+def replace_codes(table, key_columns):
+    """Replaces code columns of a table with their SMALLINT surrogate keys, counting the unknown codes.
+
+    Args:
+        table (pyarrow.Table): source rows.
+        key_columns (dict): {column: {code: key}}
+    Returns:
+        tuple: (converted table, {column: codes without a key, null in `column`})
+    """
+    # The DAG file imports this module, so pyarrow is only loaded here.
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    unknown = {}
+    for column, mapping in key_columns.items():
+        idx = table.schema.get_field_index(column)
+        codes = pc.utf8_trim_whitespace(pc.cast(table.column(idx).combine_chunks(), pa.string()))
+        positions = pc.index_in(codes, value_set=pa.array(list(mapping), pa.string()))
+        keys = pc.take(pa.array(list(mapping.values()), pa.int16()), positions)
+        # Missing and empty codes are not unknown.
+        present = pc.and_(pc.is_valid(codes), pc.not_equal(codes, ''))
+        unknown[column] = pc.sum(pc.and_(present, pc.is_null(keys))).as_py() or 0
+        table = table.set_column(idx, pa.field(column, pa.int16()), keys)
+    return table, unknown
@@ -0,0 +1,113 @@
+from helpers.ddl import rename_table
+
+SHADOW_SUFFIX = '__shadow'
+RETIRED_SUFFIX = '__retired'
+
+
+def _split(table):
+    """Splits 'schema.table' into ('schema.', 'table')."""
+    schema, _, name = table.rpartition('.')
+    return (schema + '.' if schema else ''), name
+
+
+def shadow_table(table):
+    """Returns the name of the shadow table used to swap-load `table`."""
+    return table + SHADOW_SUFFIX
+
+
+def dependent_objects(cursor, table):
+    """Lists the views and foreign keys bound to `table`.
+
+    They would follow `table` when it is renamed away and then block its
+    drop. Late-binding views (WITH NO SCHEMA BINDING) are not listed, as they
+    resolve the table by name.
+
+    Args:
+        cursor (cursor): open DB-API cursor.
+        table (str): destination table name.
+    Returns:
+        list: names of the dependent views and referencing tables.
+    """
+    cursor.execute("""
+        SELECT DISTINCT dependent.relname
+        FROM pg_depend d
+        JOIN pg_rewrite r ON r.oid = d.objid
+        JOIN pg_class dependent ON dependent.oid = r.ev_class
+        WHERE d.refobjid = %s::regclass AND dependent.oid <> d.refobjid
+        UNION
+        SELECT DISTINCT referencing.relname
+        FROM pg_constraint c
+        JOIN pg_class referencing ON referencing.oid = c.conrelid
+        WHERE c.contype = 'f' AND c.confrelid = %s::regclass AND c.conrelid <> c.confrelid
+    """, (table, table))
+    return sorted(row[0] for row in cursor.fetchall())
+
+
+def copy_grants(cursor, table, target):
+    """Grants on `target` the privileges other users and groups have on `table`.
+
+    Args:
+        cursor (cursor): open DB-API cursor.
+        table (str): table to read the privileges of.
+        target (str): table to grant them on.
+    """
+    schema, name = _split(table)
+    cursor.execute("""
+        SELECT grantee, privilege_type
+        FROM information_schema.table_privileges
+        WHERE table_schema = %s AND table_name = %s AND grantee <> current_user
+    """, (schema.rstrip('.') or 'public', name))
+    for grantee, privilege in cursor.fetchall():
+        grantee = grantee if grantee.upper() == 'PUBLIC' else '"{}"'.format(grantee)
+        cursor.execute('GRANT {} ON {} TO {}'.format(privilege, target, grantee))
+
+
+def create_shadow(cursor, table, ddl=None):
+    """(Re)creates an empty shadow table for `table`.
+
+    The shadow is created from `ddl`, so that it keeps the primary and
+    foreign keys that `LIKE` drops, and is given the grants of `table`. A
+    shadow left over by a failed run is dropped first. Views and foreign
+    keys bound to `table` would block the swap, so they fail the load
+    before anything is copied.
+
+    Args:
+        cursor (cursor): open DB-API cursor.
+        table (str): destination table name.
+        ddl (:obj:`str`, optional): CREATE TABLE statement of `table`;
+            without it the shadow is created LIKE `table`.
+    Returns:
+        str: the shadow table name.
+    Raises:
+        ValueError: if views or foreign keys depend on `table`.
+    """
+    dependents = dependent_objects(cursor, table)
+    if dependents:
+        raise ValueError(f'Cannot swap-load {table}: {", ".join(dependents)} depend on it. '
+                         f'Recreate the views WITH NO SCHEMA BINDING or use another load mode.')
+    shadow = shadow_table(table)
+    cursor.execute('DROP TABLE IF EXISTS {}'.format(shadow))
+    if ddl:
+        cursor.execute(rename_table(ddl, shadow))
+    else:
+        cursor.execute('CREATE TABLE {} (LIKE {})'.format(shadow, table))
+    copy_grants(cursor, table, shadow)
+    return shadow
+
+
+def swap_in_shadow(cursor, table):
+    """Replaces `table` with its shadow by renaming both.
+
+    Run in the same transaction as the load of the shadow: until it
+    commits, readers keep seeing the previous contents of `table`.
+
+    Args:
+        cursor (cursor): open DB-API cursor.
+        table (str): destination table name.
+    """
+    schema, name = _split(table)
+    retired = name + RETIRED_SUFFIX
+    cursor.execute('DROP TABLE IF EXISTS {}{}'.format(schema, retired))
+    cursor.execute('ALTER TABLE {} RENAME TO {}'.format(table, retired))
+    cursor.execute('ALTER TABLE {} RENAME TO {}'.format(shadow_table(table), name))
+    cursor.execute('DROP TABLE {}{}'.format(schema, retired))
@@ -1,23 +1,68 @@
+from helpers.sql_queries_create import SqlQueriesCreate
+
 s3_table_keys = [
   {'name': 'public.staging_immigration',
-   'key': 'sas_data',
+   'key': 'sas_data/i94yr={execution_date.year}/i94mon={execution_date.month}/',
    'file_format': 'parquet',
-   'sep': ''
+   'sep': '',
+   'sas7bdat_prefix': 'immigration/',
+   'sas7bdat_output_prefix': 'sas_data',
+   'ddl': SqlQueriesCreate.staging_immigration_create,
+   'dates_prefix': 'parquet/immigration/i94yr={execution_date.year}/i94mon={execution_date.month}',
+   'date_columns': {'arrdate': 'sas', 'depdate': 'sas', 'dtadfile': '%Y%m%d', 'dtaddto': '%m%d%Y'},
+   'key_columns': {'i94port': 'i94prtl', 'i94addr': 'i94addrl'},
+   'load_mode': 'incremental',
+   'partition_filter': 'i94yr = {execution_date.year} AND i94mon = {execution_date.month}',
+   'dq_checks': [{'name': 'cicid_not_null', 'condition': 'cicid IS NULL', 'expected_result': 0}]
   },
   {'name': 'public.staging_airports',
    'key': 'airport/airport-codes_csv.csv',
-   'file_format': 'csv',
-   'sep': ','
+   'file_format': 'parquet',
+   'load_mode': 'swap',
+   'sep': ',',
+   'parquet_prefix': 'parquet/airport',
+   'ddl': SqlQueriesCreate.staging_airports_create,
+   'airports': {'require_iata': True},
+   'dq_checks': [{'name': 'ident_not_null', 'condition': 'ident IS NULL', 'expected_result': 0}]
   },
   {'name': 'public.staging_temperature',
    'key': 'temperature/GlobalLandTemperaturesByCity.csv',
-   'file_format': 'csv',
-   'sep': ','
+   'file_format': 'parquet',
+   'load_mode': 'swap',
+   'sep': ',',
+   'parquet_prefix': 'parquet/temperature',
+   'ddl': SqlQueriesCreate.staging_temperature_create,
+   'reduce': {'start_date': '2000-01-01', 'countries': ['United States'], 'aggregate': None},
+   'rows_per_file': 1000000,
+   'dq_checks': [{'name': 'dt_not_null', 'condition': 'dt IS NULL', 'expected_result': 0}]
   },
   {'name': 'public.staging_demographics',
    'key': 'demographics/us-cities-demographics.csv',
-   'file_format': 'csv',
-   'sep': ';'
+   'file_format': 'parquet',
+   'load_mode': 'swap',
+   'sep': ';',
+   'parquet_prefix': 'parquet/demographics',
+   'ddl': SqlQueriesCreate.staging_demographics_create,
+   'pivot': {'index': ['city', 'state'],
+             'pivot_column': 'race',
+             'value_column': 'count',
+             'columns': {'American Indian and Alaska Native': 'american_indian_and_alaska_native',
+                         'Asian': 'asian',
+                         'Black or African-American': 'black_or_african_american',
+                         'Hispanic or Latino': 'hispanic_or_latino',
+                         'White': 'white'}},
+   'dq_checks': [{'name': 'city_not_null', 'condition': 'city IS NULL', 'expected_result': 0}]
+  },
+  {'name': 'public.dim_i94port_airports',
+   'key': 'parquet/i94port_airports/',
+   'file_format': 'parquet',
+   'load_mode': 'swap',
+   'sep': '',
+   'lookup_prefix': 'parquet/i94port_airports',
+   'lookup_source': 'public.staging_airports',
+   'key_columns': {'port_key': 'i94prtl'},
+   'ddl': SqlQueriesCreate.dim_i94port_airports_create,
+   'dq_checks': [{'name': 'port_key_not_null', 'condition': 'port_key IS NULL', 'expected_result': 0}]
   }
 ]
 
@@ -26,26 +71,28 @@ sas_table_configs = [
   {'name': 'dim_i94cit',
    'value': 'i94cntyl',
    'columns': ['code', 'country'],
-   'qc_check': [{'qc_sql': "SELECT COUNT(*) FROM public.dim_i94cit WHERE code is null", 'expected_result': 0}]
+   'dq_checks': [{'name': 'code_not_null', 'condition': 'code IS NULL', 'expected_result': 0}]
   },
   {'name': 'dim_i94port',
    'value': 'i94prtl',
    'columns': ['code', 'port'],
-   'qc_check': [{'qc_sql': "SELECT COUNT(*) FROM public.dim_i94port WHERE code is null", 'expected_result': 0}]
+   'surrogate_key': 'port_key',
+   'dq_checks': [{'name': 'code_not_null', 'condition': 'code IS NULL', 'expected_result': 0}]
   },
   {'name': 'dim_i94mode',
    'value': 'i94model',
    'columns': ['code', 'mode'],
-   'qc_check': [{'qc_sql': "SELECT COUNT(*) FROM public.dim_i94mode WHERE code is null", 'expected_result': 0}]
+   'dq_checks': [{'name': 'code_not_null', 'condition': 'code IS NULL', 'expected_result': 0}]
   },
   {'name': 'dim_i94addr',
    'value': 'i94addrl',
    'columns': ['code', 'addr'],
-   'qc_check': [{'qc_sql': "SELECT COUNT(*) FROM public.dim_i94addr WHERE code is null", 'expected_result': 0}]
+   'surrogate_key': 'addr_key',
+   'dq_checks': [{'name': 'code_not_null', 'condition': 'code IS NULL', 'expected_result': 0}]
   },
   {'name': 'dim_i94visa',
    'value': 'I94VISA',
    'columns': ['code', 'type'],
-   'qc_check': [{'qc_sql': "SELECT COUNT(*) FROM public.dim_i94visa WHERE code is null", 'expected_result': 0}]
+   'dq_checks': [{'name': 'code_not_null', 'condition': 'code IS NULL', 'expected_result': 0}]
   }
 ]
@@ -0,0 +1,88 @@
+DEFAULT_THRESHOLDS = {'stats_off': 10.0, 'unsorted': 5.0, 'ghost': 5.0}
+
+_REDSHIFT_STATS = """
+    SELECT "schema" || '.' || "table",
+           COALESCE(unsorted, 0),
+           COALESCE(stats_off, 0),
+           tbl_rows,
+           estimated_visible_rows
+    FROM svv_table_info
+    WHERE "schema" || '.' || "table" IN ({})
+"""
+
+_POSTGRES_STATS = """
+    SELECT schemaname || '.' || relname,
+           NULL,
+           CASE WHEN last_analyze IS NULL AND last_autoanalyze IS NULL THEN 100.0
+                ELSE 100.0 * n_mod_since_analyze / GREATEST(n_live_tup, 1) END,
+           n_live_tup + n_dead_tup,
+           n_live_tup
+    FROM pg_stat_user_tables
+    WHERE schemaname || '.' || relname IN ({})
+"""
+
+
+def qualified_name(table):
+    """Returns `table` prefixed with the public schema if it has none."""
+    return table if '.' in table else 'public.' + table
+
+
+def table_stats(cursor, tables, dialect='redshift'):
+    """Reads the maintenance figures of tables.
+
+    On Redshift they come from svv_table_info. On Postgres, used as a local
+    stand-in, pg_stat_user_tables provides the dead tuples and the rows
+    modified since the last ANALYZE; there is no sort order to report.
+
+    Args:
+        cursor (cursor): open DB-API cursor.
+        tables (list): table names, optionally schema-qualified.
+        dialect (str): 'redshift' or 'postgres'.
+    Returns:
+        dict: {qualified table: {'unsorted', 'stats_off', 'ghost', 'rows'}},
+            percentages except for rows. Empty tables may be missing.
+    """
+    if not tables:
+        # `IN ()` is a syntax error.
+        return {}
+    names = [qualified_name(table) for table in tables]
+    sql = _REDSHIFT_STATS if dialect == 'redshift' else _POSTGRES_STATS
+    cursor.execute(sql.format(', '.join(['%s'] * len(names))), names)
+    stats = {}
+    for name, unsorted, stats_off, total_rows, visible_rows in cursor.fetchall():
+        total_rows = total_rows or 0
+        ghost_rows = max(total_rows - (visible_rows or 0), 0)
+        stats[name] = {'unsorted': float(unsorted) if unsorted is not None else None,
+                       'stats_off': float(stats_off or 0),
+                       'ghost': 100.0 * ghost_rows / total_rows if total_rows else 0.0,
+                       'rows': visible_rows}
+    return stats
+
+
+def maintenance_actions(table, stats, thresholds=DEFAULT_THRESHOLDS, dialect='redshift'):
+    """Lists the statements to run on a table whose figures exceed the thresholds.
+
+    Args:
+        table (str): qualified table name.
+        stats (dict): figures of the table, as returned by `table_stats`.
+        thresholds (dict): maximum 'stats_off', 'unsorted' and 'ghost'
+            percentages tolerated.
+        dialect (str): 'redshift' or 'postgres'.
+    Returns:
+        list: SQL statements, VACUUM before ANALYZE.
+    """
+    unsorted = stats['unsorted'] is not None and stats['unsorted'] > thresholds['unsorted']
+    ghost = stats['ghost'] > thresholds['ghost']
+    actions = []
+    if dialect == 'redshift':
+        if unsorted and ghost:
+            actions.append('VACUUM FULL {}'.format(table))
+        elif unsorted:
+            actions.append('VACUUM SORT ONLY {}'.format(table))
+        elif ghost:
+            actions.append('VACUUM DELETE ONLY {}'.format(table))
+    elif ghost:
+        actions.append('VACUUM {}'.format(table))
+    if stats['stats_off'] > thresholds['stats_off']:
+        actions.append('ANALYZE {}'.format(table))
+    return actions
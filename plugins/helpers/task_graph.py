@@ -0,0 +1,212 @@
+from helpers.ddl import foreign_keys, table_name
+
+
+START_TASK_ID = 'Begin_execution'
+END_TASK_ID = 'Stop_execution'
+CACHE_LABELS_TASK_ID = 'cache_sas_labels'
+MAINTENANCE_TASK_ID = 'maintain_tables'
+MIGRATE_TASK_ID = 'migrate_schema'
+
+# Tasks of the stage-barrier layout, only built to compare critical paths.
+DIM_BARRIER_TASK_ID = 'DimTables_created'
+STAGING_BARRIER_TASK_ID = 'StagingTables_created'
+COPIED_BARRIER_TASK_ID = 'Tables_copied'
+BATCHED_CHECK_TASK_ID = 'qc_tables'
+
+
+def create_task_id(key):
+    """Task ID creating the table of a SqlQueriesCreate.dim_tables/staging_tables key."""
+    return f'create_{key}_table'
+
+
+def extract_task_id(table):
+    """Task ID converting the raw files behind the S3 source of a table config, or None."""
+    if 'sas7bdat_prefix' in table:
+        return f'convert_{table["name"]}_from_sas7bdat'
+    return None
+
+
+def preprocess_task_id(table):
+    """Task ID preparing the S3 source of a table config, or None if it is copied as is."""
+    if 'parquet_prefix' in table:
+        return f'convert_{table["name"]}_to_parquet'
+    if 'dates_prefix' in table:
+        return f'convert_{table["name"]}_dates'
+    if 'lookup_prefix' in table:
+        return f'build_{table["name"]}_lookup'
+    return None
+
+
+def load_task_id(table):
+    """Task ID loading a table config of s3_table_keys or sas_table_configs."""
+    source = 'sas' if 'value' in table else 's3'
+    return f'load_{table["name"]}_from_{source}'
+
+
+def check_task_id(table):
+    """Task ID running the data quality checks of a table config."""
+    return f'qc_{table["name"]}'
+
+
+def table_dependencies(ddls):
+    """Maps every table to the tables its foreign keys reference.
+
+    Redshift does not enforce foreign keys, but a referenced table must
+    exist when the referencing table is created.
+
+    Args:
+        ddls (iterable): CREATE TABLE statements.
+    Returns:
+        dict: {table: set of referenced tables}, both without their schema;
+            references to tables outside `ddls` are left out.
+    """
+    tables = {table_name(ddl): ddl for ddl in ddls}
+    return {table: {ref_table for _, ref_table, _ in foreign_keys(ddl) if ref_table in tables and ref_table != table}
+            for table, ddl in tables.items()}
+
+
+def _add_leaves(graph):
+    """Makes END_TASK_ID wait for every task nothing else waits for."""
+    upstream = set().union(*graph.values())
+    graph.setdefault(END_TASK_ID, set()).update(task_id for task_id in graph
+                                                if task_id not in upstream and task_id != END_TASK_ID)
+    return graph
+
+
+def _add_source_chain(graph, table, load_id):
+    """Runs the tasks preparing the S3 source of a table one after another, then its load."""
+    chain = [task_id for task_id in (extract_task_id(table), preprocess_task_id(table)) if task_id]
+    for upstream_id, task_id in zip([START_TASK_ID] + chain, chain):
+        graph[task_id] = {upstream_id}
+    if chain:
+        graph[load_id].add(chain[-1])
+    return graph
+
+
+def _add_lookup_source(graph, table, s3_tables, *upstream_ids):
+    """Makes the task building a lookup table wait for the source of the table it is built from."""
+    if 'lookup_source' in table:
+        source = next(source for source in s3_tables if source['name'] == table['lookup_source'])
+        graph[preprocess_task_id(table)] = {preprocess_task_id(source) or START_TASK_ID, *upstream_ids}
+    return graph
+
+
+def _add_key_sources(graph, table, sas_tables):
+    """Makes the task rewriting codes to surrogate keys wait for the dimension loads assigning them."""
+    if 'key_columns' in table:
+        sas_values = set(table['key_columns'].values())
+        graph[preprocess_task_id(table)].update(load_task_id(dim) for dim in sas_tables if dim['value'] in sas_values)
+    return graph
+
+
+def task_graph(ddls, s3_tables, sas_tables):
+    """Builds the task dependencies from the table dependencies.
+
+    Every table is its own create >> load >> check chain: a table is created
+    once the schema migrations ran and the tables it references exist, and
+    its load waits only for its own table and source, so the small dimension
+    loads run alongside the large staging COPYs.
+
+    Args:
+        ddls (dict): {SqlQueriesCreate key: CREATE TABLE statement}.
+        s3_tables (list): table configs of s3_table_keys.
+        sas_tables (list): table configs of sas_table_configs.
+    Returns:
+        dict: {task_id: set of upstream task IDs}
+    """
+    create_ids = {table_name(ddl): create_task_id(key) for key, ddl in ddls.items()}
+    graph = {START_TASK_ID: set(), MIGRATE_TASK_ID: {START_TASK_ID}, CACHE_LABELS_TASK_ID: {START_TASK_ID},
+             MAINTENANCE_TASK_ID: set()}
+    for table, references in table_dependencies(ddls.values()).items():
+        graph[create_ids[table]] = {create_ids[ref_table] for ref_table in references} or {MIGRATE_TASK_ID}
+
+    for table in s3_tables + sas_tables:
+        load_id = load_task_id(table)
+        graph[load_id] = {create_ids[table['name'].split('.')[-1]]}
+        _add_source_chain(graph, table, load_id)
+        _add_lookup_source(graph, table, s3_tables, CACHE_LABELS_TASK_ID)
+        _add_key_sources(graph, table, sas_tables)
+        if 'value' in table:
+            graph[load_id].add(CACHE_LABELS_TASK_ID)
+        graph[check_task_id(table)] = {load_id}
+        graph[MAINTENANCE_TASK_ID].add(check_task_id(table))
+    return _add_leaves(graph)
+
+
+def barrier_task_graph(dim_ddls, staging_ddls, s3_tables, sas_tables):
+    """Builds the stage-barrier layout the DAG used before task_graph.
+
+    Every dimension table is created before any staging table, every
+    staging table before any COPY, every COPY finishes before the SAS
+    labels are parsed, and one task checks all tables. The dimension loads
+    come after every COPY, so the surrogate keys rewritten into the staging
+    tables are those of the previous run.
+
+    Args:
+        dim_ddls (dict): SqlQueriesCreate.dim_tables.
+        staging_ddls (dict): SqlQueriesCreate.staging_tables.
+        s3_tables (list): table configs of s3_table_keys.
+        sas_tables (list): table configs of sas_table_configs.
+    Returns:
+        dict: {task_id: set of upstream task IDs}
+    """
+    graph = {START_TASK_ID: set(),
+             MIGRATE_TASK_ID: {START_TASK_ID},
+             DIM_BARRIER_TASK_ID: {create_task_id(key) for key in dim_ddls},
+             STAGING_BARRIER_TASK_ID: {create_task_id(key) for key in staging_ddls},
+             COPIED_BARRIER_TASK_ID: {load_task_id(table) for table in s3_tables},
+             CACHE_LABELS_TASK_ID: {COPIED_BARRIER_TASK_ID},
+             BATCHED_CHECK_TASK_ID: {COPIED_BARRIER_TASK_ID} | {load_task_id(table) for table in sas_tables},
+             MAINTENANCE_TASK_ID: {BATCHED_CHECK_TASK_ID}}
+    graph.update({create_task_id(key): {MIGRATE_TASK_ID} for key in dim_ddls})
+    graph.update({create_task_id(key): {DIM_BARRIER_TASK_ID} for key in staging_ddls})
+    for table in s3_tables:
+        graph[load_task_id(table)] = {STAGING_BARRIER_TASK_ID}
+        _add_source_chain(graph, table, load_task_id(table))
+        _add_lookup_source(graph, table, s3_tables)
+    for table in sas_tables:
+        graph[load_task_id(table)] = {CACHE_LABELS_TASK_ID}
+    return _add_leaves(graph)
+
+
+def finish_times(graph, durations):
+    """Computes when every task of a task graph finishes with unlimited parallelism.
+
+    Args:
+        graph (dict): {task_id: set of upstream task IDs}
+        durations (dict): {task_id: seconds}; missing tasks take no time.
+    Returns:
+        tuple: ({task_id: seconds from the start}, {task_id: the upstream task it waits for last})
+    """
+    finish = {}
+    previous = {}
+
+    def finish_time(task_id):
+        if task_id not in finish:
+            start = 0.0
+            for upstream_id in sorted(graph.get(task_id, ())):
+                if finish_time(upstream_id) > start or task_id not in previous:
+                    start, previous[task_id] = max(start, finish[upstream_id]), upstream_id
+            finish[task_id] = start + durations.get(task_id, 0.0)
+        return finish[task_id]
+
+    for task_id in graph:
+        finish_time(task_id)
+    return finish, previous
+
+
+def critical_path(graph, durations):
+    """Finds the longest chain of task durations through a task graph.
+
+    Args:
+        graph (dict): {task_id: set of upstream task IDs}
+        durations (dict): {task_id: seconds}; missing tasks take no time.
+    Returns:
+        tuple: (seconds, [task IDs of the path, first to last])
+    """
+    finish, previous = finish_times(graph, durations)
+    last = max(finish, key=finish.get)
+    path = [last]
+    while path[-1] in previous:
+        path.append(previous[path[-1]])
+    return finish[last], path[::-1]
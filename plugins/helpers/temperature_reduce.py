@@ -0,0 +1,134 @@
+from datetime import date
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+# Columns of GlobalLandTemperaturesByCity.csv, in file order.
+SOURCE_SCHEMA = pa.schema([
+    ('dt', pa.date32()),
+    ('AverageTemperature', pa.float64()),
+    ('AverageTemperatureUncertainty', pa.float64()),
+    ('City', pa.string()),
+    ('Country', pa.string()),
+    ('Latitude', pa.string()),
+    ('Longitude', pa.string()),
+])
+
+MEASURES = ['AverageTemperature', 'AverageTemperatureUncertainty']
+# A city is told apart from others of the same name by its coordinates.
+CITY_COLUMNS = ['City', 'Country', 'Latitude', 'Longitude']
+AGGREGATES = ('month', 'year')
+# Columns of the partial means, summed when partials are combined.
+PARTIAL_COLUMNS = [f'{measure}_{function}' for measure in MEASURES for function in ('sum', 'count')]
+
+
+def normalize_key(values):
+    """Upper-cases a string array and collapses everything but letters and digits into single spaces.
+
+    Args:
+        values (pyarrow.Array): strings such as ' New  York-City'.
+    Returns:
+        pyarrow.Array: normalized strings, e.g. 'NEW YORK CITY'.
+    """
+    spaced = pc.replace_substring_regex(pc.utf8_upper(values), r'[^\p{L}\p{N}]+', ' ')
+    return pc.utf8_trim_whitespace(spaced)
+
+
+def city_key(city, country):
+    """Builds the city/country join key, e.g. 'NEW YORK|UNITED STATES'."""
+    return pc.binary_join_element_wise(normalize_key(city), normalize_key(country), '|')
+
+
+def filter_batch(batch, start_date=None, end_date=None, countries=None):
+    """Keeps the rows of a batch measured in [start_date, end_date) in one of `countries`.
+
+    Args:
+        batch (pyarrow.RecordBatch): rows typed after SOURCE_SCHEMA.
+        start_date (:obj:`str`, optional): first date kept, 'YYYY-MM-DD'.
+        end_date (:obj:`str`, optional): first date dropped, 'YYYY-MM-DD'.
+        countries (:obj:`list`, optional): values of the Country column kept.
+    Returns:
+        pyarrow.RecordBatch
+    """
+    conditions = []
+    if start_date:
+        conditions.append(pc.greater_equal(batch.column('dt'), pa.scalar(date.fromisoformat(start_date))))
+    if end_date:
+        conditions.append(pc.less(batch.column('dt'), pa.scalar(date.fromisoformat(end_date))))
+    if countries:
+        conditions.append(pc.is_in(batch.column('Country'), value_set=pa.array(countries, pa.string())))
+    if not conditions:
+        return batch
+    mask = conditions[0]
+    for condition in conditions[1:]:
+        mask = pc.and_(mask, condition)
+    return batch.filter(mask)
+
+
+def with_city_key(table):
+    """Appends the city_key column to a table with City and Country columns."""
+    return table.append_column('city_key', city_key(table.column('City'), table.column('Country')))
+
+
+def _partial_means(table, aggregate):
+    """Sums and counts the measures of a table per city and period."""
+    table = table.set_column(0, 'dt', pc.floor_temporal(table.column('dt'), unit=aggregate))
+    partial = table.group_by(['dt'] + CITY_COLUMNS).aggregate(
+        [(measure, function) for measure in MEASURES for function in ('sum', 'count')])
+    return partial.select(['dt'] + CITY_COLUMNS + PARTIAL_COLUMNS)
+
+
+def _combine_partials(totals, partial):
+    """Adds the sums and counts of a partial to the running totals of the same city and period."""
+    if totals is None:
+        return partial
+    combined = pa.concat_tables([totals, partial]).group_by(['dt'] + CITY_COLUMNS).aggregate(
+        [(column, 'sum') for column in PARTIAL_COLUMNS])
+    combined = combined.rename_columns([name[:-len('_sum')] if name[:-len('_sum')] in PARTIAL_COLUMNS else name
+                                        for name in combined.column_names])
+    return combined.select(['dt'] + CITY_COLUMNS + PARTIAL_COLUMNS)
+
+
+def reduce_temperatures(batches, schema, start_date=None, end_date=None, countries=None, aggregate=None):
+    """Filters the temperature rows and optionally averages them per city and period.
+
+    The batches are filtered as they stream in. With `aggregate`, each
+    batch is reduced to per-city sums and counts and added to running
+    totals, which become means at the end, so memory use is bounded by the
+    number of output rows plus one batch.
+    Cities sharing a name within a country keep their own rows.
+
+    Args:
+        batches (iterable): pyarrow RecordBatches typed after SOURCE_SCHEMA.
+        schema (pyarrow.Schema): output schema, SOURCE_SCHEMA and city_key.
+        start_date (:obj:`str`, optional): first date kept, 'YYYY-MM-DD'.
+        end_date (:obj:`str`, optional): first date dropped, 'YYYY-MM-DD'.
+        countries (:obj:`list`, optional): values of the Country column kept.
+        aggregate (:obj:`str`, optional): 'month' or 'year' to average the
+            measures per city over that period, dated its first day.
+    Yields:
+        pyarrow.RecordBatch: rows matching `schema`.
+    """
+    if aggregate and aggregate not in AGGREGATES:
+        raise ValueError('aggregate must be one of {}, not {}'.format(AGGREGATES, aggregate))
+
+    totals = None
+    for batch in batches:
+        batch = filter_batch(batch, start_date, end_date, countries)
+        if not batch.num_rows:
+            continue
+        if aggregate:
+            totals = _combine_partials(totals, _partial_means(pa.Table.from_batches([batch]), aggregate))
+        else:
+            yield from with_city_key(pa.Table.from_batches([batch])).select(schema.names).cast(schema).to_batches()
+    if totals is None:
+        return
+
+    means = {key: totals.column(key) for key in ['dt'] + CITY_COLUMNS}
+    for measure in MEASURES:
+        # The sum of a period without any measurement is null, and so is its mean.
+        count = pc.cast(totals.column(f'{measure}_count'), pa.float64())
+        means[measure] = pc.divide(totals.column(f'{measure}_sum'), count)
+    table = with_city_key(pa.table(means)).select(schema.names).cast(schema)
+    yield from table.sort_by([('city_key', 'ascending'), ('dt', 'ascending')]).to_batches()
@@ -1,9 +1,29 @@
 from operators.copy_to_redshift import CopyToRedshiftOperator
 from operators.data_quality import DataQualityOperator
 from operators.sas_to_redshift import SASToRedshiftOperator
+from operators.sas_labels_cache import SASLabelsCacheOperator
+from operators.csv_to_parquet import CsvToParquetOperator
+from operators.table_maintenance import TableMaintenanceOperator
+from operators.sas_dates_to_parquet import SASDatesToParquetOperator
+from operators.sas7bdat_to_parquet import SAS7BDATToParquetOperator
+from operators.temperature_to_parquet import TemperatureToParquetOperator
+from operators.pivot_to_parquet import PivotToParquetOperator
+from operators.airports_to_parquet import AirportsToParquetOperator
+from operators.port_airports import PortAirportsOperator
+from operators.migrate_schema import MigrateSchemaOperator
 
 __all__ = [
     'CopyToRedshiftOperator',
 	'DataQualityOperator',
-	'SASToRedshiftOperator'
+	'SASToRedshiftOperator',
+	'SASLabelsCacheOperator',
+	'CsvToParquetOperator',
+	'TableMaintenanceOperator',
+	'SASDatesToParquetOperator',
+	'SAS7BDATToParquetOperator',
+	'TemperatureToParquetOperator',
+	'PivotToParquetOperator',
+	'AirportsToParquetOperator',
+	'PortAirportsOperator',
+	'MigrateSchemaOperator'
 ]
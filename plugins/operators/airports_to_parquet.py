@@ -0,0 +1,33 @@
+from airflow.utils.decorators import apply_defaults
+
+from operators.csv_to_parquet import CsvToParquetOperator
+
+
+class AirportsToParquetOperator(CsvToParquetOperator):
+    """Operator to type the airport codes CSV and keep the airports with an IATA code.
+    """
+
+    @apply_defaults
+    def __init__(self,
+                 require_iata=True,
+                 *args, **kwargs):
+        """Streams airport-codes_csv.csv like CsvToParquetOperator, splitting
+        its 'longitude, latitude' coordinates into the FLOAT latitude and
+        longitude columns of `ddl`.
+        Args:
+            require_iata (bool): drop the airports without an iata_code.
+        """
+        super(AirportsToParquetOperator, self).__init__(*args, **kwargs)
+        self.require_iata = require_iata
+
+    def settings(self):
+        return {'require_iata': self.require_iata}
+
+    def source_schema(self):
+        from helpers.airports import SOURCE_SCHEMA
+        return SOURCE_SCHEMA
+
+    def transform(self, batches, schema):
+        from helpers.airports import reduce_airports
+        self.log.info(f'Reducing airports: {self.settings()}')
+        return reduce_airports(batches, schema, **self.settings())
@@ -1,9 +1,13 @@
-from airflow.hooks.postgres_hook import PostgresHook
-from airflow.contrib.hooks.aws_hook import AwsHook
 from airflow.models import BaseOperator
 from airflow.utils.decorators import apply_defaults
+from contextlib import ExitStack
 from datetime import datetime
 
+from helpers.connections import get_pool, redshift_session
+from helpers.load_metrics import LoadMetrics, copy_file_stats, last_copy_id
+from helpers.load_state import ensure_load_state, last_load, record_load, source_fingerprint
+from helpers.swap_load import create_shadow, shadow_table, swap_in_shadow
+
 class CopyToRedshiftOperator(BaseOperator):
     """Operator to Copy data from S3 into Redshift.
     
@@ -19,6 +23,7 @@ class CopyToRedshiftOperator(BaseOperator):
         FROM '{from_sql}'
         {credentials}
         {format_sql}
+        {compression_sql}
         {ignore_headers_sql}
         {delimiter_sql}
         COMPUPDATE OFF;
@@ -35,8 +40,43 @@ class CopyToRedshiftOperator(BaseOperator):
                  file_format="csv",
                  ignore_headers=1,
                  delimiter=',',
+                 load_mode="full",
+                 partition_filter="",
+                 compression="",
+                 skip_unchanged=True,
+                 count_source_rows=True,
+                 ddl="",
                  *args, **kwargs):
-
+        """Args:
+            redshift_conn_id (str): Airflow ID for redshift connection.
+            aws_credentials_id (str): Airflow ID for AWS credentials.
+            iam_role (str): IAM Role ARN used to COPY parquet files.
+            table (str): destination table name.
+            s3_bucket (str): S3 Bucket of the source data.
+            s3_key (str): S3 Key (or prefix) of the source data, formatted
+                with the task context, e.g. 'sas_data/i94yr={execution_date.year}/'.
+            file_format (str): 'csv' or 'parquet'.
+            ignore_headers (int): number of CSV header lines to skip.
+            delimiter (str): CSV delimiter.
+            load_mode (str): 'full' empties the table before the COPY;
+                'incremental' loads only the rendered `s3_key` partition;
+                'swap' COPYs into a shadow table created from `ddl`, validates
+                its row count and renames it over `table` in the same
+                transaction, so no deleted rows are left behind and readers
+                never see a partially loaded table.
+            partition_filter (:obj:`str`, optional): in 'incremental' mode, a
+                WHERE clause (formatted with the task context) selecting the
+                rows of the partition to replace. Without it rows are appended.
+            compression (:obj:`str`, optional): e.g. 'GZIP' for compressed sources.
+            skip_unchanged (bool): skip the load when the source objects (keys,
+                ETags and sizes) match the last successful load of the rendered
+                `s3_key`, as recorded in public.load_watermarks.
+            count_source_rows (bool): count the rows of the source objects
+                (Parquet footers or CSV lines) so DataQualityOperator can
+                reconcile them with the rows loaded.
+            ddl (:obj:`str`, optional): CREATE TABLE statement of `table`, used
+                to create the shadow table in 'swap' mode (LIKE `table` without it).
+        """
         super(CopyToRedshiftOperator, self).__init__(*args, **kwargs)
         self.redshift_conn_id = redshift_conn_id
         self.aws_credentials_id = aws_credentials_id
@@ -47,47 +87,190 @@ class CopyToRedshiftOperator(BaseOperator):
         self.ignore_headers = ignore_headers
         self.delimiter = delimiter
         self.iam_role = iam_role
-        
+        self.load_mode = load_mode
+        self.partition_filter = partition_filter
+        self.compression = compression
+        self.skip_unchanged = skip_unchanged
+        self.count_source_rows = count_source_rows
+        self.ddl = ddl
+
+    @staticmethod
+    def build_copy_sql(table, s3_path, credentials_sql, file_format='csv',
+                       delimiter=',', ignore_headers=1, compression=''):
+        """Formats the COPY command for a table.
+
+        Args:
+            table (str): destination table, optionally with a column list.
+            s3_path (str): s3:// path of the source object(s).
+            credentials_sql (str): ACCESS_KEY_ID/SECRET_ACCESS_KEY or IAM_ROLE clause.
+            file_format (str): 'csv' or 'parquet'.
+            delimiter (str): CSV delimiter.
+            ignore_headers (int): number of CSV header lines to skip.
+            compression (:obj:`str`, optional): e.g. 'GZIP' for compressed sources.
+        Returns:
+            str: the formatted COPY command.
+        """
+        if file_format == 'csv':
+            # If csv file, set delimiter and ignore headers.
+            format_sql = "CSV"
+            ignore_headers_sql = f"IGNOREHEADER {ignore_headers}" if ignore_headers else ""
+            delimiter_sql = f"DELIMITER '{delimiter}'"
+        else:
+            format_sql = "FORMAT AS PARQUET"
+            ignore_headers_sql = ""
+            delimiter_sql = ""
+
+        return CopyToRedshiftOperator.copy_sql.format(
+            copy_sql=table,
+            from_sql=s3_path,
+            credentials=credentials_sql,
+            format_sql=format_sql,
+            compression_sql=compression,
+            ignore_headers_sql=ignore_headers_sql,
+            delimiter_sql=delimiter_sql
+        )
+
+    def source_objects(self, rendered_key):
+        """Lists the (key, ETag, size) of the S3 objects loaded for a rendered key."""
+        from airflow.hooks.S3_hook import S3Hook
+        bucket = S3Hook(self.aws_credentials_id).get_bucket(self.s3_bucket)
+        return [(obj.key, obj.e_tag, obj.size) for obj in bucket.objects.filter(Prefix=rendered_key)]
+
+    def source_row_count(self, rendered_key):
+        """Counts the rows the COPY of a rendered key should load."""
+        from airflow.hooks.S3_hook import S3Hook
+        from helpers.row_counts import source_row_count
+        return source_row_count(
+            S3Hook(self.aws_credentials_id).get_conn(),
+            self.s3_bucket,
+            rendered_key,
+            file_format=self.file_format,
+            delimiter=self.delimiter,
+            ignore_headers=self.ignore_headers,
+            compression=self.compression
+        )
+
     def execute(self, context):
         """Copy data from S3 into staging table.
+
+        The rows loaded (from the COPY metadata) and, if `count_source_rows`,
+        the rows in the source objects are pushed to XCom as `rows_loaded`
+        and `source_rows`, and the phase timings as `load_metrics`.
         """
+        metrics = LoadMetrics(self.task_id, self.table)
+        with metrics.emitted(context, self.log):
+            self.load(context, metrics)
+
+    def load(self, context, metrics):
+        """Runs the load, recording its phases in `metrics`."""
+        from airflow.contrib.hooks.aws_hook import AwsHook
+        from helpers.row_counts import copied_row_count
+
         self.log.info("GATHERING CREDENTIALS AND PATHS...")
-        aws_hook = AwsHook(self.aws_credentials_id)
-        credentials = aws_hook.get_credentials()
-        redshift_hook = PostgresHook(self.redshift_conn_id)
+        with metrics.phase('credentials'):
+            credentials = AwsHook(self.aws_credentials_id).get_credentials()
         rendered_key = self.s3_key.format(**context)
         s3_path = "s3://{}/{}".format(self.s3_bucket, rendered_key)
         
         self.log.info(f"RENDERED_KEY: {rendered_key}")
         self.log.info(f"S3_PATH: {s3_path}")
         
-        redshift_hook.run('CREATE SCHEMA IF NOT EXISTS public')
-        redshift_hook.run('DELETE FROM {}'.format(self.table))
-        
         if self.file_format == 'csv':
-            # If csv file, set delimiter and ignore headers.
-            format_sql = "CSV"
-            ignore_headers_sql = "IGNOREHEADER 1"
-            delimiter_sql = f"DELIMITER '{self.delimiter}'"
             credentials_sql = f"ACCESS_KEY_ID '{credentials.access_key}' SECRET_ACCESS_KEY '{credentials.secret_key}'"
         else:
-            # If a .json is passed, use for format: else default 'auto'
-            format_sql = f"FORMAT AS PARQUET"
             credentials_sql = f"IAM_ROLE '{self.iam_role}'"
-            ignore_headers_sql = ""
-            delimiter_sql = ""
-                      
-        formatted_sql = CopyToRedshiftOperator.copy_sql.format(
-            copy_sql=self.table,
-            from_sql=s3_path,
-            credentials=credentials_sql,
-            format_sql=format_sql,
-            ignore_headers_sql=ignore_headers_sql,
-            delimiter_sql=delimiter_sql
+
+        copy_table = shadow_table(self.table) if self.load_mode == 'swap' else self.table
+        formatted_sql = CopyToRedshiftOperator.build_copy_sql(
+            table=copy_table,
+            s3_path=s3_path,
+            credentials_sql=credentials_sql,
+            file_format=self.file_format,
+            delimiter=self.delimiter,
+            ignore_headers=self.ignore_headers,
+            compression=self.compression
         )
         
+        with metrics.phase('list_source') as phase:
+            objects = self.source_objects(rendered_key)
+            source_bytes = phase['bytes'] = sum(size for _, _, size in objects)
+        fingerprint = source_fingerprint(objects)
+        self.log.info(f"SOURCE FINGERPRINT: {fingerprint}")
+
+        source_rows = None
+        if self.count_source_rows:
+            with metrics.phase('count_source') as phase:
+                source_rows = phase['rows'] = self.source_row_count(rendered_key)
+        self.log.info(f"SOURCE ROWS: {source_rows}")
+
         self.log.info(f"RUNNING COPY TO {self.table}...")
-        redshift_hook.run(formatted_sql)
+        copy_id = None
+        with ExitStack() as session:
+            with metrics.phase('connect'):
+                conn = session.enter_context(redshift_session(self.redshift_conn_id))
+                cursor = session.enter_context(conn.cursor())
+            with metrics.phase('load_state'):
+                cursor.execute('CREATE SCHEMA IF NOT EXISTS public')
+                ensure_load_state(cursor)
+                loaded, loaded_rows = last_load(cursor, self.table, rendered_key)
+            if self.skip_unchanged and fingerprint is not None and loaded == fingerprint:
+                self.log.info(f"SKIPPING {rendered_key}: UNCHANGED SINCE LAST LOAD INTO {self.table}")
+                self.push_row_counts(context, loaded_rows, source_rows)
+                return
+            if self.load_mode == 'incremental':
+                if self.partition_filter:
+                    rendered_filter = self.partition_filter.format(**context)
+                    self.log.info(f"REPLACING ROWS WHERE {rendered_filter}")
+                    with metrics.phase('delete') as phase:
+                        cursor.execute('DELETE FROM {} WHERE {}'.format(self.table, rendered_filter))
+                        phase['rows'] = cursor.rowcount
+            elif self.load_mode == 'swap':
+                self.log.info(f"LOADING SHADOW TABLE {copy_table}")
+                with metrics.phase('create_shadow'):
+                    create_shadow(cursor, self.table, self.ddl)
+            else:
+                with metrics.phase('delete') as phase:
+                    cursor.execute('DELETE FROM {}'.format(self.table))
+                    phase['rows'] = cursor.rowcount
+            with metrics.phase('copy', size=source_bytes) as phase:
+                cursor.execute(formatted_sql)
+                rows_loaded = phase['rows'] = copied_row_count(cursor)
+            copy_id = last_copy_id(cursor)
+            if self.load_mode == 'swap':
+                self.validate_shadow(rows_loaded, source_rows)
+                self.log.info(f"SWAPPING {copy_table} INTO {self.table}")
+                with metrics.phase('swap'):
+                    swap_in_shadow(cursor, self.table)
+            record_load(cursor, self.table, rendered_key, fingerprint, rows_loaded)
+            with metrics.phase('commit'):
+                session.close()
+        self.log.info(f"ROWS LOADED: {rows_loaded}")
+        if copy_id is not None:
+            with metrics.phase('load_stats'):
+                with redshift_session(self.redshift_conn_id) as conn:
+                    with conn.cursor() as cursor:
+                        metrics.files = copy_file_stats(cursor, copy_id)
+            for stats in metrics.files:
+                self.log.info('{file}: {lines} lines, {bytes} bytes in {seconds:.3f} s'.format(**stats))
+        self.log.info('Connection pool: {}'.format(get_pool(self.redshift_conn_id).metrics.as_dict()))
+        self.push_row_counts(context, rows_loaded, source_rows)
+
+    def validate_shadow(self, rows_loaded, source_rows):
+        """Refuses to swap in a shadow table that is empty or incomplete.
+
+        Raising rolls back the session, leaving `table` untouched.
+        """
+        if rows_loaded < 1:
+            raise ValueError(f"Shadow of {self.table} is empty, keeping the current table")
+        if source_rows is not None and rows_loaded != source_rows:
+            raise ValueError(f"Shadow of {self.table} has {rows_loaded} rows, expected {source_rows} "
+                             f"from the source, keeping the current table")
+
+    @staticmethod
+    def push_row_counts(context, rows_loaded, source_rows):
+        """Publishes the row counts of a load for DataQualityOperator."""
+        context['ti'].xcom_push(key='rows_loaded', value=rows_loaded)
+        context['ti'].xcom_push(key='source_rows', value=source_rows)
 
 
 
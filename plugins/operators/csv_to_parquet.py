@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import tempfile
+
+from airflow.models import BaseOperator
+from airflow.utils.decorators import apply_defaults
+
+
+class CsvToParquetOperator(BaseOperator):
+    """Operator to convert a CSV in S3 into typed, compressed Parquet parts.
+    """
+
+    ui_color = '#358140'
+
+    @apply_defaults
+    def __init__(self,
+                 aws_credentials_id="",
+                 s3_bucket="",
+                 s3_key="",
+                 output_prefix="",
+                 ddl="",
+                 delimiter=',',
+                 block_size_mb=16,
+                 row_group_size=500000,
+                 rows_per_file=None,
+                 *args, **kwargs):
+        """Streams s3://s3_bucket/s3_key in chunks into Parquet parts under
+        `output_prefix`, typed after the columns of `ddl`.
+        Args:
+            aws_credentials_id (str): Airflow ID for AWS credentials.
+            s3_bucket (str): S3 Bucket of the source CSV and the parts.
+            s3_key (str): S3 Key of the source CSV.
+            output_prefix (str): S3 prefix for the Parquet parts.
+            ddl (str): CREATE TABLE statement of the destination table; its
+                column order and types define the Parquet schema.
+            delimiter (str): CSV delimiter.
+            block_size_mb (int): MB of CSV parsed per chunk.
+            row_group_size (int): rows per Parquet row group.
+            rows_per_file (:obj:`int`, optional): maximum rows per part, so
+                that large sources are COPYed in parallel.
+        """
+        super(CsvToParquetOperator, self).__init__(*args, **kwargs)
+        self.aws_credentials_id = aws_credentials_id
+        self.s3_bucket = s3_bucket
+        self.s3_key = s3_key
+        self.output_prefix = output_prefix
+        self.ddl = ddl
+        self.delimiter = delimiter
+        self.block_size_mb = block_size_mb
+        self.row_group_size = row_group_size
+        self.rows_per_file = rows_per_file
+
+    def execute(self, context):
+        """Converts the source CSV and replaces the parts under `output_prefix`.
+        Args:
+            context (:obj:`dict`): Dict with values to apply on content.
+        Returns:
+            int: number of rows written, or None if the source is unchanged
+                since the last conversion.
+        """
+        from airflow.hooks.S3_hook import S3Hook
+        from helpers.parquet_convert import ddl_schema, read_csv_batches, write_parquet_parts
+
+        s3 = S3Hook(self.aws_credentials_id)
+        source_object = s3.get_key(self.s3_key, self.s3_bucket)
+        source_etag = self.conversion_tag(source_object.e_tag.strip('"'))
+        # Kept next to (not under) the prefix, as COPY loads every object under it.
+        etag_key = '{}.source_etag'.format(self.output_prefix)
+        if s3.check_for_key(etag_key, self.s3_bucket) and s3.read_key(etag_key, self.s3_bucket) == source_etag:
+            self.log.info(f'Source unchanged since the last conversion (ETag {source_etag}), skipping')
+            return None
+
+        source_schema = self.source_schema()
+        schema = ddl_schema(self.ddl)
+        self.log.info(f'Schema: {schema}')
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_path = os.path.join(tmp_dir, 'source.csv')
+            self.log.info(f'Downloading s3://{self.s3_bucket}/{self.s3_key}')
+            source_object.download_file(csv_path)
+
+            batches = read_csv_batches(csv_path, source_schema, self.delimiter, self.block_size_mb * 1024 ** 2)
+            parts = write_parquet_parts(self.transform(batches, schema), schema, tmp_dir,
+                                        self.row_group_size, self.rows_per_file)
+
+            keys = []
+            for path, rows in parts:
+                key = '{}/{}'.format(self.output_prefix, os.path.basename(path))
+                self.log.info(f'Uploading s3://{self.s3_bucket}/{key}: {rows} rows')
+                s3.load_file(path, key, self.s3_bucket, replace=True)
+                keys.append(key)
+
+        # Remove parts left over from a previous conversion with more files.
+        stale_keys = [key for key in s3.list_keys(self.s3_bucket, prefix=self.output_prefix + '/') or []
+                      if key.endswith('.parquet') and key not in keys]
+        if stale_keys:
+            s3.delete_objects(self.s3_bucket, stale_keys)
+
+        s3.load_string(source_etag, etag_key, self.s3_bucket, replace=True)
+        return sum(rows for _, rows in parts)
+
+    def source_schema(self):
+        """Returns the Arrow schema the CSV is parsed with: the columns of `ddl`.
+
+        Subclasses reshaping the rows override it with the columns of the file.
+        """
+        from helpers.parquet_convert import ddl_schema
+        return ddl_schema(self.ddl)
+
+    def transform(self, batches, schema):
+        """Hook for subclasses to reshape the parsed batches into `schema`.
+
+        Args:
+            batches (iterable): RecordBatches typed after source_schema().
+            schema (pyarrow.Schema): schema of the Parquet parts, from `ddl`.
+        Returns:
+            iterable: RecordBatches matching `schema`.
+        """
+        return batches
+
+    def settings(self):
+        """Returns the settings of a subclass's transform, {} for none."""
+        return {}
+
+    def conversion_tag(self, source_etag):
+        """Returns the value recorded next to the parts for a source ETag.
+
+        Hashes of the `ddl` schema and of settings() are added, so that
+        changing either converts the source again.
+        """
+        from helpers.parquet_convert import schema_digest
+        tag = '{}-{}'.format(source_etag, schema_digest(self.ddl))
+        settings = self.settings()
+        if not settings:
+            return tag
+        digest = hashlib.md5(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()
+        return '{}-{}'.format(tag, digest[:8])
@@ -1,53 +1,97 @@
-from airflow.hooks.postgres_hook import PostgresHook
 from airflow.models import BaseOperator
 from airflow.utils.decorators import apply_defaults
+from contextlib import ExitStack
+
+from helpers.connections import get_pool, redshift_session
+from helpers.load_metrics import LoadMetrics
+from helpers.dq_checks import run_checks
 
 
 class DataQualityOperator(BaseOperator):
     """Operator for data quality check on redshift tables.
     """
-    
+
     ui_color = '#89DA59'
-    
+
     @apply_defaults
     def __init__(self,
                  redshift_conn_id="",
                  table="",
-                 qc_checks=[],
+                 dq_checks=None,
+                 tables=None,
+                 min_rows=1,
                  *args, **kwargs):
         """Args:
             redshift_conn_id (str): Airflow ID for redshift connection.
             table (str): Table to quality check.
-            query (:obj:`str`, optional): QC Query.
-            result (:obj:`str`, optional): Expected result
-
+            dq_checks (:obj:`list`, optional): checks for `table`. Each
+                check is either {'name', 'condition', 'expected_result'},
+                counting the rows matching `condition`, or
+                {'qc_sql', 'expected_result'}.
+            tables (:obj:`list`, optional): checks for many tables, as
+                [{'table': str, 'checks': [...]}, ...]; replaces `table`. An
+                entry's optional 'load_task_id' names the task that loaded
+                the table: the `rows_loaded` and `source_rows` it pushed to
+                XCom are reconciled instead of a COUNT(*) of the table.
+            min_rows (int): minimum number of rows expected in every table.
         """
         super(DataQualityOperator, self).__init__(*args, **kwargs)
         self.redshift_conn_id = redshift_conn_id
-        self.table = table
-        self.qc_checks = qc_checks
+        self.tables = tables if tables is not None else [{'table': table, 'checks': dq_checks or []}]
+        self.min_rows = min_rows
+
+    def load_row_counts(self, context):
+        """Pulls the row counts published by the load tasks of the tables.
+
+        Tables whose load task did not publish `rows_loaded` fall back to
+        a COUNT(*).
+        Returns:
+            dict: {table: (rows_loaded, source_rows)}
+        """
+        row_counts = {}
+        for entry in self.tables:
+            if not entry.get('load_task_id'):
+                continue
+            rows_loaded = context['ti'].xcom_pull(task_ids=entry['load_task_id'], key='rows_loaded')
+            if rows_loaded is None:
+                self.log.info('{}: no rows_loaded from {}, counting rows'.format(entry['table'],
+                                                                                 entry['load_task_id']))
+                continue
+            source_rows = context['ti'].xcom_pull(task_ids=entry['load_task_id'], key='source_rows')
+            row_counts[entry['table']] = (rows_loaded, source_rows)
+        return row_counts
 
     def execute(self, context):
-        redshift = PostgresHook(postgres_conn_id=self.redshift_conn_id)
-        
-        # Collects the number of records
-        records = redshift.get_records("""SELECT COUNT(*) 
-FROM {}""".format(self.table))
-        
-        # Ensure that table returns results
-        if len(records) < 1 or len(records[0]) < 1:
-            raise ValueError(f'Error: No results returned for {self.table}')
-        
-        # Ensure that table has records
-        num_records = records[0][0]
-        if num_records < 1:
-            raise ValueError(f'Error: No records in {self.table}')
-        
-        for check in self.qc_checks:
-            sql = check.get('qc_sql')
-            exp_result = check.get('expected_result')
-
-            records = redshift.get_records(sql)[0]
-
-            if exp_result != records[0]:
-                raise ValueError('Quality check failed')
+        """Runs every check in one session, batching `condition` checks
+        into a single query that scans each table once. The phase timings
+        are pushed to XCom as `load_metrics`.
+        Returns:
+            list: per-check results, pushed to XCom.
+        """
+        metrics = LoadMetrics(self.task_id, ', '.join(entry['table'] for entry in self.tables))
+        with metrics.emitted(context, self.log):
+            return self.check(context, metrics)
+
+    def check(self, context, metrics):
+        """Runs the checks, recording their phases in `metrics`."""
+        with metrics.phase('row_counts') as phase:
+            row_counts = self.load_row_counts(context)
+            phase['rows'] = sum(rows_loaded or 0 for rows_loaded, _ in row_counts.values())
+        with ExitStack() as session:
+            with metrics.phase('connect'):
+                conn = session.enter_context(redshift_session(self.redshift_conn_id))
+                cursor = session.enter_context(conn.cursor())
+            with metrics.phase('checks'):
+                results = run_checks(cursor, self.tables, self.min_rows, row_counts)
+        self.log.info('Connection pool: {}'.format(get_pool(self.redshift_conn_id).metrics.as_dict()))
+
+        for result in results:
+            self.log.info('{table}.{check}: {result} (expected {expected}) '
+                          '{status} in {seconds:.3f} s'.format(status='PASSED' if result['passed'] else 'FAILED',
+                                                               **result))
+
+        failed = [result for result in results if not result['passed']]
+        if failed:
+            raise ValueError('Quality check failed: {}'.format(
+                ', '.join('{table}.{check}'.format(**result) for result in failed)))
+        return results
@@ -0,0 +1,43 @@
+from airflow.models import BaseOperator
+from airflow.utils.decorators import apply_defaults
+
+from helpers.connections import redshift_session
+from helpers.migrations import SCHEMA_MIGRATIONS, apply_migrations
+
+
+class MigrateSchemaOperator(BaseOperator):
+    """Operator to drop the tables whose layout changed, before they are created.
+    """
+
+    ui_color = '#F0EDE4'
+
+    @apply_defaults
+    def __init__(self,
+                 redshift_conn_id="",
+                 migrations=None,
+                 *args, **kwargs):
+        """Args:
+            redshift_conn_id (str): Airflow ID for redshift connection.
+            migrations (:obj:`list`, optional): migrations to apply, see
+                helpers.migrations; SCHEMA_MIGRATIONS by default.
+        """
+        super(MigrateSchemaOperator, self).__init__(*args, **kwargs)
+        self.redshift_conn_id = redshift_conn_id
+        self.migrations = SCHEMA_MIGRATIONS if migrations is None else migrations
+
+    def execute(self, context):
+        """Applies the pending migrations in one transaction.
+        Args:
+            context (:obj:`dict`): Dict with values to apply on content.
+        Returns:
+            list: versions applied by this run.
+        """
+        with redshift_session(self.redshift_conn_id) as conn:
+            with conn.cursor() as cursor:
+                versions = apply_migrations(cursor, self.migrations)
+        for migration in self.migrations:
+            if migration['version'] in versions:
+                self.log.info('Applied migration {version}: {description}, dropped {tables}'.format(**migration))
+        if not versions:
+            self.log.info('Schema up to date')
+        return versions
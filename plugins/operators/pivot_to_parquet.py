@@ -0,0 +1,45 @@
+from airflow.utils.decorators import apply_defaults
+
+from operators.csv_to_parquet import CsvToParquetOperator
+
+
+class PivotToParquetOperator(CsvToParquetOperator):
+    """Operator to pivot a long-format CSV into one Parquet row per index.
+    """
+
+    @apply_defaults
+    def __init__(self,
+                 index=None,
+                 pivot_column="",
+                 value_column="",
+                 columns=None,
+                 *args, **kwargs):
+        """Streams the CSV like CsvToParquetOperator and pivots its
+        `pivot_column`/`value_column` pairs, the last two columns of the file,
+        into the `columns` of `ddl`.
+        Args:
+            index (list): columns identifying an output row, e.g. ['city', 'state'].
+            pivot_column (str): column naming the pivoted column of a row, e.g. 'race'.
+            value_column (str): column holding the pivoted value, e.g. 'count'.
+            columns (dict): {value of `pivot_column`: column of `ddl`}.
+        """
+        super(PivotToParquetOperator, self).__init__(*args, **kwargs)
+        self.index = index
+        self.pivot_column = pivot_column
+        self.value_column = value_column
+        self.columns = columns
+
+    def settings(self):
+        return {'index': self.index, 'pivot_column': self.pivot_column,
+                'value_column': self.value_column, 'columns': self.columns}
+
+    def source_schema(self):
+        from helpers.parquet_convert import ddl_schema
+        from helpers.pivot import pivot_source_schema
+        return pivot_source_schema(ddl_schema(self.ddl), self.pivot_column, self.value_column, self.columns)
+
+    def transform(self, batches, schema):
+        from helpers.pivot import pivot_batches
+        self.log.info(f'Pivoting {self.pivot_column} into {sorted(self.columns.values())} per {self.index}')
+        return pivot_batches(batches, schema, **self.settings())
+
@@ -0,0 +1,132 @@
+import hashlib
+import os
+import tempfile
+
+from airflow.models import BaseOperator
+from airflow.utils.decorators import apply_defaults
+
+from helpers.sas_labels import SASLabelsCache, SAS_LABELS_CACHE_DIR
+from helpers.surrogate_keys import SURROGATE_KEYS_PREFIX
+
+
+class PortAirportsOperator(BaseOperator):
+    """Operator to precompute the lookup from I94 port codes to airports.
+    """
+
+    ui_color = '#358140'
+
+    @apply_defaults
+    def __init__(self,
+                 aws_credentials_id="",
+                 s3_bucket="",
+                 airports_prefix="",
+                 labels_key="",
+                 sas_value="i94prtl",
+                 output_prefix="",
+                 ddl="",
+                 key_prefix=SURROGATE_KEYS_PREFIX,
+                 cache_dir=SAS_LABELS_CACHE_DIR,
+                 *args, **kwargs):
+        """Matches the US ports of the SAS labels file to the airports
+        converted under `airports_prefix`, on the city and state of the port
+        label and the municipality and iso_region of the airport, and writes
+        the matches as Parquet under `output_prefix`, keyed by the port
+        surrogate keys SASToRedshiftOperator assigned.
+        Args:
+            aws_credentials_id (str): Airflow ID for AWS credentials.
+            s3_bucket (str): S3 Bucket of the airports, labels and lookup.
+            airports_prefix (str): S3 prefix of the staging_airports Parquet parts.
+            labels_key (str): S3 Key for SAS labels.
+            sas_value (str): value in SAS labels holding the ports.
+            output_prefix (str): S3 prefix for the lookup Parquet part.
+            ddl (str): CREATE TABLE statement of the lookup table.
+            key_prefix (str): S3 prefix of the code to key mappings.
+            cache_dir (str): local cache directory for the parsed labels.
+        """
+        super(PortAirportsOperator, self).__init__(*args, **kwargs)
+        self.aws_credentials_id = aws_credentials_id
+        self.s3_bucket = s3_bucket
+        self.airports_prefix = airports_prefix
+        self.labels_key = labels_key
+        self.sas_value = sas_value
+        self.output_prefix = output_prefix
+        self.ddl = ddl
+        self.key_prefix = key_prefix
+        self.cache_dir = cache_dir
+
+    def execute(self, context):
+        """Builds the lookup unless its airports and labels are unchanged since the last build.
+        Args:
+            context (:obj:`dict`): Dict with values to apply on content.
+        Returns:
+            int: number of rows written, or None if the inputs are unchanged.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        from airflow.hooks.S3_hook import S3Hook
+        from helpers.airports import parse_port_labels, port_airports
+        from helpers.parquet_convert import ddl_schema, schema_digest, write_parquet_parts
+        from helpers.surrogate_keys import mapping_key, read_mapping, replace_codes
+
+        s3 = S3Hook(self.aws_credentials_id)
+        bucket = s3.get_bucket(self.s3_bucket)
+        sources = sorted((obj for obj in bucket.objects.filter(Prefix=self.airports_prefix + '/')
+                          if obj.key.endswith('.parquet')), key=lambda obj: obj.key)
+        labels_etag = s3.get_key(self.labels_key, self.s3_bucket).e_tag.strip('"')
+        keys_key = mapping_key(self.sas_value, self.key_prefix)
+        if not s3.check_for_key(keys_key, self.s3_bucket):
+            raise ValueError(f'No surrogate keys at s3://{self.s3_bucket}/{keys_key}; load the port dimension first')
+        keys_etag = s3.get_key(keys_key, self.s3_bucket).e_tag.strip('"')
+        fingerprint = hashlib.md5(' '.join([labels_etag, keys_etag, self.sas_value, schema_digest(self.ddl)]
+                                           + [obj.e_tag.strip('"') for obj in sources])
+                                  .encode('utf-8')).hexdigest()
+        # Kept next to (not under) the prefix, as COPY loads every object under it.
+        marker_key = '{}.source_etag'.format(self.output_prefix)
+        if s3.check_for_key(marker_key, self.s3_bucket) and s3.read_key(marker_key, self.s3_bucket) == fingerprint:
+            self.log.info(f'Airports and labels unchanged since the last build ({fingerprint}), skipping')
+            return None
+
+        labels = SASLabelsCache(self.cache_dir).get_labels(s3, self.s3_bucket, self.labels_key, log=self.log)
+        ports = parse_port_labels(labels[self.sas_value])
+        schema = ddl_schema(self.ddl)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            airports = []
+            for obj in sources:
+                path = os.path.join(tmp_dir, os.path.basename(obj.key))
+                obj.Object().download_file(path)
+                airports.append(pq.read_table(path, columns=['ident', 'type', 'iso_region',
+                                                             'municipality', 'iata_code']))
+            if not airports:
+                raise ValueError(f'No airport parts under s3://{self.s3_bucket}/{self.airports_prefix}/')
+            lookup = port_airports(ports, pa.concat_tables(airports))
+            if not lookup.num_rows:
+                # Writing nothing would delete every part and fail the swap load; keep the last lookup instead.
+                raise ValueError(f'None of the {ports.num_rows} US ports matched an airport under '
+                                 f's3://{self.s3_bucket}/{self.airports_prefix}/')
+            self.log.info(f'{lookup.num_rows} airports matched to '
+                          f'{len(set(lookup.column("port_code").to_pylist()))} of {ports.num_rows} US ports')
+            lookup, unknown = replace_codes(lookup, {'port_code': read_mapping(s3, self.s3_bucket, keys_key)})
+            if unknown['port_code']:
+                raise ValueError(f'{unknown["port_code"]} matched ports have no key in {keys_key}; '
+                                 'load the port dimension first')
+            lookup = lookup.rename_columns(['port_key' if name == 'port_code' else name
+                                            for name in lookup.column_names])
+
+            output_dir = os.path.join(tmp_dir, 'lookup')
+            os.makedirs(output_dir)
+            parts = write_parquet_parts(lookup.select(schema.names).cast(schema).to_batches(), schema, output_dir)
+            keys = []
+            for path, rows in parts:
+                key = '{}/{}'.format(self.output_prefix, os.path.basename(path))
+                self.log.info(f'Uploading s3://{self.s3_bucket}/{key}: {rows} rows')
+                s3.load_file(path, key, self.s3_bucket, replace=True)
+                keys.append(key)
+
+        stale_keys = [key for key in s3.list_keys(self.s3_bucket, prefix=self.output_prefix + '/') or []
+                      if key.endswith('.parquet') and key not in keys]
+        if stale_keys:
+            s3.delete_objects(self.s3_bucket, stale_keys)
+
+        s3.load_string(fingerprint, marker_key, self.s3_bucket, replace=True)
+        return sum(rows for _, rows in parts)
@@ -0,0 +1,166 @@
+import hashlib
+import os
+import tempfile
+
+from airflow.models import BaseOperator
+from airflow.utils.decorators import apply_defaults
+
+
+class SAS7BDATToParquetOperator(BaseOperator):
+    """Operator to convert the monthly I94 SAS7BDAT files into partitioned Parquet.
+    """
+
+    ui_color = '#358140'
+
+    @apply_defaults
+    def __init__(self,
+                 aws_credentials_id="",
+                 s3_bucket="",
+                 s3_key="",
+                 output_prefix="",
+                 ddl="",
+                 partition_columns=('i94yr', 'i94mon'),
+                 chunk_rows=200000,
+                 row_group_size=500000,
+                 rows_per_file=1000000,
+                 max_workers=None,
+                 *args, **kwargs):
+        """Converts every SAS7BDAT file under s3://s3_bucket/s3_key into
+        Parquet parts under `output_prefix`, partitioned by
+        `partition_columns`, several files at a time in a process pool.
+        Args:
+            aws_credentials_id (str): Airflow ID for AWS credentials.
+            s3_bucket (str): S3 Bucket of the source and converted files.
+            s3_key (str): S3 prefix of the SAS7BDAT files, formatted with the
+                task context, e.g. 'immigration/'.
+            output_prefix (str): S3 prefix of the partitions, e.g. 'sas_data'.
+            ddl (:obj:`str`, optional): CREATE TABLE statement of the
+                destination table; only its columns are kept, in its order.
+            partition_columns (tuple): columns naming the partitions.
+            chunk_rows (int): rows read from a SAS7BDAT file at a time.
+            row_group_size (int): rows per Parquet row group.
+            rows_per_file (:obj:`int`, optional): maximum rows per part, so
+                that a month is COPYed in parallel.
+            max_workers (:obj:`int`, optional): files converted at a time;
+                defaults to the number of CPUs.
+        """
+        super(SAS7BDATToParquetOperator, self).__init__(*args, **kwargs)
+        self.aws_credentials_id = aws_credentials_id
+        self.s3_bucket = s3_bucket
+        self.s3_key = s3_key
+        self.output_prefix = output_prefix
+        self.ddl = ddl
+        self.partition_columns = partition_columns
+        self.chunk_rows = chunk_rows
+        self.row_group_size = row_group_size
+        self.rows_per_file = rows_per_file
+        self.max_workers = max_workers
+
+    def execute(self, context):
+        """Converts the source files that changed since their last conversion.
+
+        Files are downloaded one at a time while earlier ones are converted,
+        and at most `max_workers` + 1 are kept on local disk. The ETag of
+        every converted file is kept in <output_prefix>/<file name>.source_etag.
+        Args:
+            context (:obj:`dict`): Dict with values to apply on content.
+        Returns:
+            dict: rows written and files converted, or None if there is no
+                source file or none changed.
+        """
+        from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+        from airflow.hooks.S3_hook import S3Hook
+        from helpers.parquet_convert import ddl_columns
+        from helpers.sas7bdat_convert import convert_sas7bdat
+
+        s3 = S3Hook(self.aws_credentials_id)
+        source_prefix = self.s3_key.format(**context)
+        output_prefix = self.output_prefix.format(**context).rstrip('/')
+
+        sources = [obj for obj in s3.get_bucket(self.s3_bucket).objects.filter(Prefix=source_prefix)
+                   if obj.key.lower().endswith('.sas7bdat')]
+        if not sources:
+            self.log.info(f'No SAS7BDAT files under s3://{self.s3_bucket}/{source_prefix}, '
+                          f'leaving {output_prefix} as is')
+            return None
+
+        columns = [name for name, _ in ddl_columns(self.ddl)] if self.ddl else None
+        # The types come from the files, so only a change in the columns kept converts them again.
+        columns_digest = hashlib.md5(','.join(columns).encode('utf-8')).hexdigest()[:8] if columns else None
+
+        pending = []
+        for source in sources:
+            etag = source.e_tag.strip('"')
+            if columns_digest:
+                etag = '{}-{}'.format(etag, columns_digest)
+            marker_key = '{}/{}.source_etag'.format(output_prefix, self.file_name(source.key))
+            if s3.check_for_key(marker_key, self.s3_bucket) and s3.read_key(marker_key, self.s3_bucket) == etag:
+                self.log.info(f'{source.key} unchanged since the last conversion (ETag {etag}), skipping')
+            else:
+                pending.append((source, etag, marker_key))
+        if not pending:
+            return None
+
+        max_workers = min(self.max_workers or os.cpu_count() or 1, len(pending))
+        self.log.info(f'Converting {len(pending)} files with {max_workers} processes')
+        rows = 0
+        with tempfile.TemporaryDirectory() as tmp_dir, ProcessPoolExecutor(max_workers) as executor:
+            futures = {}
+
+            def upload_done(done):
+                nonlocal rows
+                for future in done:
+                    source, etag, marker_key, source_path = futures.pop(future)
+                    os.remove(source_path)
+                    rows += self.upload_parts(s3, source.key, output_prefix, future.result())
+                    s3.load_string(etag, marker_key, self.s3_bucket, replace=True)
+
+            for source, etag, marker_key in pending:
+                if len(futures) >= max_workers:
+                    upload_done(wait(futures, return_when=FIRST_COMPLETED).done)
+                name = self.file_name(source.key)
+                source_path = os.path.join(tmp_dir, name + '.sas7bdat')
+                self.log.info(f'Downloading s3://{self.s3_bucket}/{source.key}')
+                source.Object().download_file(source_path)
+                future = executor.submit(convert_sas7bdat, source_path, os.path.join(tmp_dir, name),
+                                         columns, tuple(self.partition_columns), self.chunk_rows,
+                                         self.row_group_size, self.rows_per_file)
+                futures[future] = (source, etag, marker_key, source_path)
+            while futures:
+                upload_done(wait(futures, return_when=FIRST_COMPLETED).done)
+        return {'rows': rows, 'files': len(pending)}
+
+    @staticmethod
+    def file_name(key):
+        """Name of a source file without its extension, e.g. 'i94_apr16_sub'."""
+        return os.path.splitext(os.path.basename(key))[0]
+
+    def upload_parts(self, s3, source_key, output_prefix, parts):
+        """Uploads the parts converted from one file, replacing the partitions' older parts.
+
+        Each partition is expected to come from a single source file.
+        Args:
+            s3 (S3Hook): hook of `aws_credentials_id`.
+            source_key (str): S3 key of the converted file.
+            output_prefix (str): rendered S3 prefix of the partitions.
+            parts (list): (partition directory, local path, rows) from
+                convert_sas7bdat.
+        Returns:
+            int: rows uploaded.
+        """
+        keys = []
+        for partition, path, rows in parts:
+            key = '{}/{}/{}'.format(output_prefix, partition, os.path.basename(path))
+            self.log.info(f'Uploading s3://{self.s3_bucket}/{key}: {rows} rows from {source_key}')
+            s3.load_file(path, key, self.s3_bucket, replace=True)
+            os.remove(path)
+            keys.append(key)
+
+        # Remove parts left over from a previous conversion with more files.
+        for partition in sorted({partition for partition, _, _ in parts}):
+            prefix = '{}/{}/'.format(output_prefix, partition)
+            stale_keys = [key for key in s3.list_keys(self.s3_bucket, prefix=prefix) or []
+                          if key.endswith('.parquet') and key not in keys]
+            if stale_keys:
+                s3.delete_objects(self.s3_bucket, stale_keys)
+        return sum(rows for _, _, rows in parts)
@@ -0,0 +1,157 @@
+import os
+import tempfile
+
+from airflow.models import BaseOperator
+from airflow.utils.decorators import apply_defaults
+
+from helpers.load_state import source_fingerprint
+from helpers.surrogate_keys import SURROGATE_KEYS_PREFIX
+
+
+class SASDatesToParquetOperator(BaseOperator):
+    """Operator to rewrite Parquet files with SAS and string dates as DATE columns
+    and dimension codes as surrogate keys.
+    """
+
+    ui_color = '#358140'
+
+    @apply_defaults
+    def __init__(self,
+                 aws_credentials_id="",
+                 s3_bucket="",
+                 s3_key="",
+                 output_prefix="",
+                 date_columns=None,
+                 key_columns=None,
+                 key_prefix=SURROGATE_KEYS_PREFIX,
+                 ddl="",
+                 max_unknown_share=0.01,
+                 *args, **kwargs):
+        """Converts the Parquet files under s3://s3_bucket/s3_key file by
+        file into Parquet files under `output_prefix`, with `date_columns`
+        stored as dates and `key_columns` as SMALLINT surrogate keys.
+        Args:
+            aws_credentials_id (str): Airflow ID for AWS credentials.
+            s3_bucket (str): S3 Bucket of the source and converted files.
+            s3_key (str): S3 prefix of the source Parquet files, formatted
+                with the task context, e.g. 'sas_data/i94yr={execution_date.year}/'.
+            output_prefix (str): S3 prefix of the converted files, formatted
+                with the task context.
+            date_columns (:obj:`dict`, optional): {column: 'sas' for SAS day
+                offsets from 1960-01-01, or a strptime format such as '%Y%m%d'}.
+            key_columns (:obj:`dict`, optional): {column: SAS labels value
+                whose surrogate keys SASToRedshiftOperator assigned, e.g.
+                'i94prtl'}; codes without a key become nulls.
+            key_prefix (str): S3 prefix of the code to key mappings.
+            ddl (:obj:`str`, optional): CREATE TABLE statement of the
+                destination table. The files are written with its column
+                types, as a Parquet COPY does not convert them, and changing
+                its columns converts the files again.
+            max_unknown_share (float): share of the rows with a code without
+                a key above which a warning is logged.
+        """
+        super(SASDatesToParquetOperator, self).__init__(*args, **kwargs)
+        self.aws_credentials_id = aws_credentials_id
+        self.s3_bucket = s3_bucket
+        self.s3_key = s3_key
+        self.output_prefix = output_prefix
+        self.date_columns = date_columns or {}
+        self.key_columns = key_columns or {}
+        self.key_prefix = key_prefix
+        self.ddl = ddl
+        self.max_unknown_share = max_unknown_share
+
+    def execute(self, context):
+        """Converts the date and key columns of every source file.
+        Args:
+            context (:obj:`dict`): Dict with values to apply on content.
+        Returns:
+            dict: rows written, invalid dates and unknown codes turned to
+                null per column, or None if the source and the keys are
+                unchanged since the last conversion.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        from airflow.hooks.S3_hook import S3Hook
+        from helpers.parquet_convert import ddl_schema, schema_digest
+        from helpers.sas_dates import convert_dates
+        from helpers.surrogate_keys import mapping_key, read_mapping, replace_codes
+
+        s3 = S3Hook(self.aws_credentials_id)
+        source_prefix = self.s3_key.format(**context)
+        output_prefix = self.output_prefix.format(**context).rstrip('/')
+
+        sources = [obj for obj in s3.get_bucket(self.s3_bucket).objects.filter(Prefix=source_prefix)
+                   if obj.key.endswith('.parquet')]
+        if not sources:
+            raise ValueError(f'No Parquet files under s3://{self.s3_bucket}/{source_prefix}')
+        # New keys convert the source again, as the codes they map were null.
+        mapping_keys = {column: mapping_key(sas_value, self.key_prefix)
+                        for column, sas_value in self.key_columns.items()}
+        missing = [key for key in mapping_keys.values() if not s3.check_for_key(key, self.s3_bucket)]
+        if missing:
+            raise ValueError(f'No surrogate keys in s3://{self.s3_bucket} under {", ".join(missing)}; '
+                             'load the dimension tables first')
+        mapping_objects = [s3.get_key(key, self.s3_bucket) for key in mapping_keys.values()]
+        fingerprint = source_fingerprint([(obj.key, obj.e_tag, obj.size) for obj in sources]
+                                         + [(obj.key, obj.e_tag, obj.content_length) for obj in mapping_objects])
+        if self.ddl:
+            fingerprint = '{}-{}'.format(fingerprint, schema_digest(self.ddl))
+        # Kept next to (not under) the prefix, as COPY loads every object under it.
+        marker_key = '{}.source_etag'.format(output_prefix)
+        if s3.check_for_key(marker_key, self.s3_bucket) and s3.read_key(marker_key, self.s3_bucket) == fingerprint:
+            self.log.info(f'Source unchanged since the last conversion ({fingerprint}), skipping')
+            return None
+
+        key_columns = {column: read_mapping(s3, self.s3_bucket, key) for column, key in mapping_keys.items()}
+        schema = ddl_schema(self.ddl) if self.ddl else None
+        rows = 0
+        invalid = {column: 0 for column in self.date_columns}
+        unknown = {column: 0 for column in self.key_columns}
+        keys = []
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for idx, source in enumerate(sources):
+                source_path = os.path.join(tmp_dir, 'source.parquet')
+                output_path = os.path.join(tmp_dir, 'part-{:04d}.parquet'.format(idx))
+                source.Object().download_file(source_path)
+
+                parquet_file = pq.ParquetFile(source_path)
+                writer = None
+                for batch in parquet_file.iter_batches():
+                    table, batch_invalid = convert_dates(pa.Table.from_batches([batch]), self.date_columns)
+                    table, batch_unknown = replace_codes(table, key_columns)
+                    if schema:
+                        # Fails rather than truncates, e.g. on a fractional cicid.
+                        table = table.select(schema.names).cast(schema)
+                    if writer is None:
+                        writer = pq.ParquetWriter(output_path, table.schema, compression='snappy')
+                    writer.write_table(table)
+                    rows += table.num_rows
+                    for column, count in batch_invalid.items():
+                        invalid[column] += count
+                    for column, count in batch_unknown.items():
+                        unknown[column] += count
+                if writer is None:
+                    continue
+                writer.close()
+
+                key = '{}/{}'.format(output_prefix, os.path.basename(output_path))
+                self.log.info(f'Uploading s3://{self.s3_bucket}/{key}')
+                s3.load_file(output_path, key, self.s3_bucket, replace=True)
+                keys.append(key)
+
+        # Remove parts left over from a previous conversion with more files.
+        stale_keys = [key for key in s3.list_keys(self.s3_bucket, prefix=output_prefix + '/') or []
+                      if key.endswith('.parquet') and key not in keys]
+        if stale_keys:
+            s3.delete_objects(self.s3_bucket, stale_keys)
+
+        for column, count in invalid.items():
+            self.log.info(f'{column}: {count} invalid dates set to null')
+        for column, count in unknown.items():
+            self.log.info(f'{column}: {count} codes without a surrogate key set to null')
+            if rows and count / rows > self.max_unknown_share:
+                self.log.warning(f'{column}: {count / rows:.1%} of the rows have a code without a surrogate key; '
+                                 f'check the {self.key_columns[column]} labels')
+        s3.load_string(fingerprint, marker_key, self.s3_bucket, replace=True)
+        return {'rows': rows, 'invalid_dates': invalid, 'unknown_codes': unknown}
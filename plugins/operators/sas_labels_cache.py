@@ -0,0 +1,47 @@
+from airflow.models import BaseOperator
+from airflow.utils.decorators import apply_defaults
+
+from helpers.sas_labels import SASLabelsCache, SAS_LABELS_CACHE_DIR
+
+
+class SASLabelsCacheOperator(BaseOperator):
+    """Operator to download and parse the SAS labels file once per run.
+    """
+
+    ui_color = '#358140'
+
+    @apply_defaults
+    def __init__(self,
+                 aws_credentials_id="",
+                 s3_bucket="",
+                 s3_key="",
+                 cache_dir=SAS_LABELS_CACHE_DIR,
+                 *args, **kwargs):
+        """Parses every value block of the SAS labels file into the local cache
+        read by SASToRedshiftOperator.
+        Args:
+            aws_credentials_id (str): Airflow ID for AWS credentials.
+            s3_bucket (str): S3 Bucket for SAS labels.
+            s3_key (str): S3 Key for SAS labels.
+            cache_dir (str): local cache directory for the parsed labels.
+        """
+        super(SASLabelsCacheOperator, self).__init__(*args, **kwargs)
+        self.aws_credentials_id = aws_credentials_id
+        self.s3_bucket = s3_bucket
+        self.s3_key = s3_key
+        self.cache_dir = cache_dir
+
+    def execute(self, context):
+        """Populates the SAS labels cache.
+        Args:
+            context (:obj:`dict`): Dict with values to apply on content.
+        Returns:
+            None
+        """
+        from airflow.hooks.S3_hook import S3Hook
+
+        s3 = S3Hook(self.aws_credentials_id)
+        self.log.info(f'S3: s3://{self.s3_bucket}/{self.s3_key}')
+        labels = SASLabelsCache(self.cache_dir).get_labels(s3, self.s3_bucket, self.s3_key, log=self.log)
+        for name, rows in labels.items():
+            self.log.info(f'{name}: {len(rows)} codes')
@@ -1,14 +1,12 @@
-import boto3
-import pandas as pd
-
 from airflow.models import BaseOperator
 from airflow.utils.decorators import apply_defaults
+from contextlib import ExitStack
 
-from airflow.hooks.base_hook import BaseHook
-from airflow.hooks.S3_hook import S3Hook
-from airflow.contrib.hooks.aws_hook import AwsHook
-
-from sqlalchemy import create_engine, text
+from helpers.connections import get_pool, redshift_session
+from helpers.load_metrics import LoadMetrics, copy_file_stats, last_copy_id
+from helpers.sas_labels import SASLabelsCache, SAS_LABELS_CACHE_DIR
+from helpers.surrogate_keys import SURROGATE_KEYS_PREFIX
+from operators.copy_to_redshift import CopyToRedshiftOperator
 
 
 class SASToRedshiftOperator(BaseOperator):
@@ -26,6 +24,12 @@ class SASToRedshiftOperator(BaseOperator):
                  s3_key="",
                  sas_value="",
                  columns="",
+                 cache_dir=SAS_LABELS_CACHE_DIR,
+                 load_mode="copy",
+                 staging_prefix="staging/sas_labels",
+                 batch_size=500,
+                 surrogate_key="",
+                 key_prefix=SURROGATE_KEYS_PREFIX,
                  *args, **kwargs):
         """Loads code:value labels from SAS labels file to Redshift table
         Args:
@@ -36,6 +40,17 @@ class SASToRedshiftOperator(BaseOperator):
             s3_key (str): S3 Key for SAS labels.
             sas_value (str): value in SAS labels to extract.
             columns (list): destination column names.
+            cache_dir (str): local cache directory for the parsed labels.
+            load_mode (str): 'copy' stages a gzipped CSV in `s3_bucket` and
+                issues a single COPY; 'insert' uses multi-row INSERTs for
+                environments without S3 access from the warehouse.
+            staging_prefix (str): S3 prefix for the staged CSV in 'copy' mode.
+            batch_size (int): rows per INSERT statement in 'insert' mode.
+            surrogate_key (:obj:`str`, optional): column loaded with a dense
+                SMALLINT key per code, ahead of `columns`. The keys are kept
+                in s3://s3_bucket/<key_prefix>/<sas_value>.json and new codes
+                get the next free key, so a code keeps its key across runs.
+            key_prefix (str): S3 prefix of the code to key mappings.
         """
         super(SASToRedshiftOperator, self).__init__(*args, **kwargs)
         self.aws_credentials_id = aws_credentials_id
@@ -45,64 +60,114 @@ class SASToRedshiftOperator(BaseOperator):
         self.s3_key = s3_key
         self.sas_value = sas_value
         self.columns = columns
+        self.cache_dir = cache_dir
+        self.load_mode = load_mode
+        self.staging_prefix = staging_prefix
+        self.batch_size = batch_size
+        self.surrogate_key = surrogate_key
+        self.key_prefix = key_prefix
     
     def execute(self, context):
         """Executes task for staging to redshift.
+        Pushes the rows loaded and the codes parsed from the labels file
+        to XCom as `rows_loaded` and `source_rows`, and the phase timings
+        as `load_metrics`.
         Args:
             context (:obj:`dict`): Dict with values to apply on content.
         Returns:
             None   
         """
+        metrics = LoadMetrics(self.task_id, self.table)
+        with metrics.emitted(context, self.log):
+            self.load(context, metrics)
+
+    def load(self, context, metrics):
+        """Runs the load, recording its phases in `metrics`."""
+        from airflow.hooks.S3_hook import S3Hook
+        from helpers.bulk_load import insert_values, rows_to_gzip_csv
+        from helpers.row_counts import copied_row_count
+
         s3 = S3Hook(self.aws_credentials_id)
 
-        redshift_conn = BaseHook.get_connection(self.redshift_conn_id)
-        self.log.info('Connecting to {}...'.format(redshift_conn.host))
-        conn = create_engine('postgresql://{}:{}@{}:{}/{}'.format(
-                             redshift_conn.login,
-                             redshift_conn.password,
-                             redshift_conn.host,
-                             redshift_conn.port,
-                             redshift_conn.schema
-                            ))
-        
         self.log.info(f'S3: s3://{self.s3_bucket}/{self.s3_key}')
-        file_str = s3.read_key(self.s3_key, self.s3_bucket)
-        self.log.info('File length: {}'.format(len(file_str)))
+        labels = SASLabelsCache(self.cache_dir).get_labels(s3, self.s3_bucket, self.s3_key, log=self.log,
+                                                           metrics=metrics)
         self.log.info('SAS Value: {}'.format(self.sas_value))
-        file_str = file_str[file_str.index(self.sas_value):]
-        file_str = file_str[:file_str.index(';')]
-        
-        lines = file_str.split('\n')[1:]
-        self.log.info('Number of Lines: {}'.format(len(lines)))
-        codes = []
-        values = []
-        
-        self.log.info('Parsing SAS file: {}/{}'.format(self.s3_bucket, self.s3_key))
-        for line in lines:
-            if '=' in line:
-                code, val = line.split('=')
-                code = code.strip()
-                val = val.strip()
-                
-                if code[0] == "'":
-                    code = code[1:-1]
-                    
-                if val[0] == "'":
-                    val = val[1:-1]
-                    
-                codes.append(code)
-                values.append(val)
+        # The file was tokenized as a stream into the cache (see iter_sas_labels);
+        # the block's pairs go to the staged CSV or the INSERTs as they are.
+        rows = labels[self.sas_value]
+        self.log.info(f'Codes: {len(rows)}')
+        columns = self.columns
+        if self.surrogate_key:
+            rows = self.with_surrogate_keys(s3, rows)
+            columns = [self.surrogate_key] + list(self.columns)
+
+        if self.load_mode == 'copy':
+            staging_key = '{}/{}.csv.gz'.format(self.staging_prefix, self.table)
+            self.log.info(f'Staging codes to s3://{self.s3_bucket}/{staging_key}')
+            with metrics.phase('stage', rows=len(rows)) as phase:
+                payload = rows_to_gzip_csv(rows)
+                phase['bytes'] = len(payload)
+                s3.load_bytes(payload, staging_key, self.s3_bucket, replace=True)
 
-        self.log.info(f'Codes: {len(code)}')
-        self.log.info(f'Values: {len(code)}')
-        self.log.info('Creating dataframe...')
-        df = pd.DataFrame(list(zip(codes, values)), columns=self.columns)
-        self.log.info('DataFrame: {}'.format(df.info()))
-        self.log.info('DataFrame Head: {}'.format(df.head(5)))
+            with metrics.phase('credentials'):
+                credentials = s3.get_credentials()
+            copy_sql = CopyToRedshiftOperator.build_copy_sql(
+                table='{} ({})'.format(self.table, ', '.join(columns)),
+                s3_path='s3://{}/{}'.format(self.s3_bucket, staging_key),
+                credentials_sql=f"ACCESS_KEY_ID '{credentials.access_key}' SECRET_ACCESS_KEY '{credentials.secret_key}'",
+                file_format='csv',
+                ignore_headers=0,
+                compression='GZIP'
+            )
 
-        truncate_query = text(f'TRUNCATE TABLE {self.table}')
-        conn.execution_options(autocommit=True).execute(truncate_query)
+        copy_id = None
+        with ExitStack() as session:
+            with metrics.phase('connect'):
+                conn = session.enter_context(redshift_session(self.redshift_conn_id))
+                cursor = session.enter_context(conn.cursor())
+            # DELETE rather than TRUNCATE: TRUNCATE commits implicitly and
+            # readers would see an empty table until the load commits.
+            with metrics.phase('delete') as phase:
+                cursor.execute(f'DELETE FROM {self.table}')
+                phase['rows'] = cursor.rowcount
+            self.log.info('Writing table {}'.format(self.table))
+            if self.load_mode == 'copy':
+                with metrics.phase('copy', size=len(payload)) as phase:
+                    cursor.execute(copy_sql)
+                    rows_loaded = phase['rows'] = copied_row_count(cursor)
+                copy_id = last_copy_id(cursor)
+            else:
+                with metrics.phase('insert') as phase:
+                    rows_loaded = phase['rows'] = insert_values(cursor, self.table, columns, rows,
+                                                                self.batch_size)
+            with metrics.phase('commit'):
+                session.close()
+        if copy_id is not None:
+            with metrics.phase('load_stats'):
+                with redshift_session(self.redshift_conn_id) as conn:
+                    with conn.cursor() as cursor:
+                        metrics.files = copy_file_stats(cursor, copy_id)
+        self.log.info(f'Rows loaded: {rows_loaded}')
+        self.log.info('Connection pool: {}'.format(get_pool(self.redshift_conn_id).metrics.as_dict()))
+        CopyToRedshiftOperator.push_row_counts(context, rows_loaded, len(rows))
+
+    def with_surrogate_keys(self, s3, rows):
+        """Prepends the surrogate key of every code to its row, assigning keys to new codes.
+
+        The mapping is saved before the load, so a failed load leaves keys
+        assigned but unused rather than reused by a later run.
+        Args:
+            s3 (S3Hook): hook of `aws_credentials_id`.
+            rows (list): [code, label] pairs.
+        Returns:
+            list: [key, code, label] rows.
+        """
+        from helpers.surrogate_keys import assign_keys, mapping_key, read_mapping, write_mapping
 
-        self.log.info('Writing table {}'.format(self.table))
-        df.to_sql(self.table, conn, index=False, if_exists='append')
-        conn.dispose()
+        key = mapping_key(self.sas_value, self.key_prefix)
+        mapping, new_codes = assign_keys(read_mapping(s3, self.s3_bucket, key), (code for code, _ in rows))
+        if new_codes:
+            self.log.info(f'Assigning keys to {len(new_codes)} new codes in s3://{self.s3_bucket}/{key}')
+            write_mapping(s3, self.s3_bucket, key, mapping)
+        return [[mapping[code.strip()], code, label] for code, label in rows]
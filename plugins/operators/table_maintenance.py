@@ -0,0 +1,74 @@
+import time
+
+from airflow.models import BaseOperator
+from airflow.utils.decorators import apply_defaults
+
+from helpers.connections import autocommit_session, get_pool, warehouse_dialect
+from helpers.table_stats import DEFAULT_THRESHOLDS, maintenance_actions, qualified_name, table_stats
+
+
+class TableMaintenanceOperator(BaseOperator):
+    """Operator to VACUUM and ANALYZE the tables that need it after a load.
+    """
+
+    ui_color = '#F0EDE4'
+
+    @apply_defaults
+    def __init__(self,
+                 redshift_conn_id="",
+                 tables=None,
+                 thresholds=None,
+                 dialect=None,
+                 *args, **kwargs):
+        """Args:
+            redshift_conn_id (str): Airflow ID for redshift connection.
+            tables (:obj:`list`, optional): table names to maintain.
+            thresholds (:obj:`dict`, optional): maximum 'stats_off',
+                'unsorted' and 'ghost' (deleted rows) percentages tolerated
+                before a table is analyzed or vacuumed; overrides
+                DEFAULT_THRESHOLDS per key.
+            dialect (:obj:`str`, optional): 'redshift' or 'postgres' for a
+                local stand-in; detected from the connection by default.
+        """
+        super(TableMaintenanceOperator, self).__init__(*args, **kwargs)
+        self.redshift_conn_id = redshift_conn_id
+        self.tables = tables or []
+        self.thresholds = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+        self.dialect = dialect
+
+    def execute(self, context):
+        """Reads the table statistics and runs only the VACUUM and ANALYZE
+        statements whose thresholds are exceeded.
+        Returns:
+            list: one dict per statement with table, sql, seconds, before
+                and after figures, pushed to XCom.
+        """
+        report = []
+        # VACUUM cannot run inside a transaction block.
+        with autocommit_session(self.redshift_conn_id) as conn:
+            with conn.cursor() as cursor:
+                dialect = self.dialect or warehouse_dialect(cursor)
+                before = table_stats(cursor, self.tables, dialect)
+                for table in map(qualified_name, self.tables):
+                    if table not in before:
+                        self.log.info(f'{table}: no statistics (empty table), skipping')
+                        continue
+                    actions = maintenance_actions(table, before[table], self.thresholds, dialect)
+                    if not actions:
+                        self.log.info(f'{table}: {before[table]} within thresholds')
+                    for sql in actions:
+                        start = time.perf_counter()
+                        cursor.execute(sql)
+                        report.append({'table': table, 'sql': sql,
+                                       'seconds': time.perf_counter() - start,
+                                       'before': before[table]})
+
+                after = table_stats(cursor, [entry['table'] for entry in report], dialect) if report else {}
+        self.log.info('Connection pool: {}'.format(get_pool(self.redshift_conn_id).metrics.as_dict()))
+
+        for entry in report:
+            entry['after'] = after.get(entry['table'])
+            self.log.info('{sql}: {seconds:.3f} s, {before} -> {after}'.format(**entry))
+        self.log.info('Maintenance: {} statements in {:.3f} s'.format(
+            len(report), sum(entry['seconds'] for entry in report)))
+        return report
@@ -0,0 +1,45 @@
+from airflow.utils.decorators import apply_defaults
+
+from operators.csv_to_parquet import CsvToParquetOperator
+
+
+class TemperatureToParquetOperator(CsvToParquetOperator):
+    """Operator to reduce the city temperatures CSV to the rows the analysis joins.
+    """
+
+    @apply_defaults
+    def __init__(self,
+                 start_date=None,
+                 end_date=None,
+                 countries=None,
+                 aggregate=None,
+                 *args, **kwargs):
+        """Streams GlobalLandTemperaturesByCity.csv like CsvToParquetOperator,
+        keeping only the rows measured in [start_date, end_date) in one of
+        `countries`, and adds a normalized `city_key` ('NEW YORK|UNITED STATES').
+        Args:
+            start_date (:obj:`str`, optional): first date kept, 'YYYY-MM-DD'.
+            end_date (:obj:`str`, optional): first date dropped, 'YYYY-MM-DD'.
+            countries (:obj:`list`, optional): values of the Country column kept.
+            aggregate (:obj:`str`, optional): 'month' or 'year' to average the
+                temperatures per city over that period.
+        """
+        super(TemperatureToParquetOperator, self).__init__(*args, **kwargs)
+        self.start_date = start_date
+        self.end_date = end_date
+        self.countries = countries
+        self.aggregate = aggregate
+
+    def settings(self):
+        return {'start_date': self.start_date, 'end_date': self.end_date,
+                'countries': self.countries, 'aggregate': self.aggregate}
+
+    def source_schema(self):
+        from helpers.temperature_reduce import SOURCE_SCHEMA
+        return SOURCE_SCHEMA
+
+    def transform(self, batches, schema):
+        from helpers.temperature_reduce import reduce_temperatures
+        self.log.info(f'Reducing temperatures: {self.settings()}')
+        return reduce_temperatures(batches, schema, **self.settings())
+
@@ -0,0 +1,69 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'plugins'))
+
+BUCKET = 'i94-test-bucket'
+
+
+class MotoS3Hook:
+    """The part of Airflow's S3Hook used by the helpers, backed by boto3.
+
+    Run inside the `s3` fixture, so every call goes to moto's in-memory S3.
+    """
+
+    def __init__(self):
+        import boto3
+        self.resource = boto3.resource('s3', region_name='us-east-1')
+        self.client = self.resource.meta.client
+
+    def get_bucket(self, bucket):
+        return self.resource.Bucket(bucket)
+
+    def get_key(self, key, bucket):
+        obj = self.resource.Object(bucket, key)
+        obj.load()
+        return obj
+
+    def check_for_key(self, key, bucket):
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=bucket, Key=key)
+            return True
+        except ClientError:
+            return False
+
+    def read_key(self, key, bucket):
+        return self.client.get_object(Bucket=bucket, Key=key)['Body'].read().decode('utf-8')
+
+    def load_string(self, string, key, bucket, replace=False):
+        self.client.put_object(Bucket=bucket, Key=key, Body=string.encode('utf-8'))
+
+    def load_bytes(self, data, key, bucket, replace=False):
+        self.client.put_object(Bucket=bucket, Key=key, Body=data)
+
+    def load_file(self, path, key, bucket, replace=False):
+        self.client.upload_file(path, bucket, key)
+
+    def list_keys(self, bucket, prefix=''):
+        paginator = self.client.get_paginator('list_objects_v2')
+        return [obj['Key'] for page in paginator.paginate(Bucket=bucket, Prefix=prefix)
+                for obj in page.get('Contents', [])]
+
+    def delete_objects(self, bucket, keys):
+        self.client.delete_objects(Bucket=bucket, Delete={'Objects': [{'Key': key} for key in keys]})
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    """Yields an S3Hook stand-in on a moto bucket named BUCKET."""
+    moto = pytest.importorskip('moto')
+    for name, value in [('AWS_ACCESS_KEY_ID', 'testing'), ('AWS_SECRET_ACCESS_KEY', 'testing'),
+                        ('AWS_SESSION_TOKEN', 'testing'), ('AWS_DEFAULT_REGION', 'us-east-1')]:
+        monkeypatch.setenv(name, value)
+    with moto.mock_aws():
+        hook = MotoS3Hook()
+        hook.client.create_bucket(Bucket=BUCKET)
+        yield hook
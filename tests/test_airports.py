@@ -0,0 +1,76 @@
+import pyarrow as pa
+
+from helpers.airports import (SOURCE_SCHEMA, parse_port_labels, place_key, port_airports, reduce_airports,
+                              split_coordinates)
+
+
+def airport(ident, airport_type, region, municipality, iata_code, coordinates='-71.00, 42.36'):
+    return {'ident': ident, 'type': airport_type, 'name': ident, 'elevation_ft': 20.0, 'continent': 'NA',
+            'iso_country': region[:2], 'iso_region': region, 'municipality': municipality, 'gps_code': ident,
+            'iata_code': iata_code, 'local_code': None, 'coordinates': coordinates}
+
+
+AIRPORTS = pa.Table.from_pylist([
+    airport('KBOS', 'large_airport', 'US-MA', 'Boston', 'BOS'),
+    airport('KOWD', 'small_airport', 'US-MA', 'Boston', 'OWD'),
+    airport('BOS1', 'heliport', 'US-MA', 'Boston', 'BHX'),
+    airport('KXXX', 'closed', 'US-MA', 'Boston', 'XXX'),
+    airport('KSTL', 'large_airport', 'US-MO', 'St. Louis', 'STL'),
+    # Same city name, other state.
+    airport('KPWM', 'medium_airport', 'US-ME', 'Portland', 'PWM'),
+    airport('EGLL', 'large_airport', 'GB-ENG', 'London', 'LHR'),
+], schema=SOURCE_SCHEMA)
+
+LABELS = [['BOS', 'BOSTON, MA  '], ['STL', 'SAINT LOUIS, MO'], ['PTL', 'PORTLAND, OR #ARPT'],
+          ['LON', 'LONDON, UNITED KINGDOM'], ['XXX', 'NOT REPORTED/UNKNOWN']]
+
+
+def test_place_key():
+    assert place_key(pa.array(['St. Louis', 'SAINT LOUIS', 'Fort  Lauderdale', 'Mount Vernon'])).to_pylist() == [
+        'ST LOUIS', 'ST LOUIS', 'FT LAUDERDALE', 'MT VERNON']
+
+
+def test_split_coordinates():
+    latitude, longitude = split_coordinates(pa.array(['-71.005, 42.364', ' 2.5e1,-3 ', 'n/a', None]))
+
+    assert latitude.to_pylist() == [42.364, -3.0, None, None]
+    assert longitude.to_pylist() == [-71.005, 25.0, None, None]
+
+
+def test_reduce_airports_types_coordinates():
+    source = AIRPORTS.to_batches()[0]
+    source = source.set_column(9, 'iata_code', pa.array(['BOS', None, None, None, 'STL', 'PWM', 'LHR']))
+    schema = pa.schema([field for field in SOURCE_SCHEMA if field.name != 'coordinates']
+                       + [('latitude', pa.float64()), ('longitude', pa.float64())])
+
+    rows = pa.Table.from_batches(list(reduce_airports([source], schema)), schema=schema)
+
+    assert rows.column('ident').to_pylist() == ['KBOS', 'KSTL', 'KPWM', 'EGLL']
+    assert rows.column('latitude').to_pylist() == [42.36] * 4
+    assert pa.Table.from_batches(list(reduce_airports([source], schema, require_iata=False))).num_rows == 7
+
+
+def test_parse_port_labels_keeps_us_ports():
+    ports = parse_port_labels(LABELS)
+
+    assert ports.to_pylist() == [{'port_code': 'BOS', 'city_key': 'BOSTON', 'state': 'MA'},
+                                 {'port_code': 'STL', 'city_key': 'ST LOUIS', 'state': 'MO'},
+                                 {'port_code': 'PTL', 'city_key': 'PORTLAND', 'state': 'OR'}]
+
+
+def test_port_airports_ranks_open_airports():
+    lookup = port_airports(parse_port_labels(LABELS), AIRPORTS)
+
+    assert lookup.to_pylist() == [
+        {'port_code': 'BOS', 'ident': 'KBOS', 'iata_code': 'BOS', 'airport_type': 'large_airport', 'airport_rank': 1},
+        {'port_code': 'BOS', 'ident': 'KOWD', 'iata_code': 'OWD', 'airport_type': 'small_airport', 'airport_rank': 2},
+        {'port_code': 'BOS', 'ident': 'BOS1', 'iata_code': 'BHX', 'airport_type': 'heliport', 'airport_rank': 3},
+        {'port_code': 'STL', 'ident': 'KSTL', 'iata_code': 'STL', 'airport_type': 'large_airport', 'airport_rank': 1},
+    ]
+    assert lookup.schema.field('airport_rank').type == pa.int16()
+
+
+def test_port_airports_without_matches():
+    lookup = port_airports(parse_port_labels([['PTL', 'PORTLAND, OR']]), AIRPORTS)
+
+    assert lookup.num_rows == 0
@@ -0,0 +1,57 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from analyze_keys import sample_parquet
+
+
+def write_parts(tmp_path, parts, rows, row_group_size):
+    for part in range(parts):
+        ids = range(part * rows, (part + 1) * rows)
+        table = pa.table({'cicid': pa.array(ids, pa.int64()),
+                          'i94port': pa.array([i % 7 for i in ids], pa.int16()),
+                          'unused': pa.array(['x'] * rows)})
+        directory = tmp_path / 'i94mon={}'.format(part + 1)
+        directory.mkdir()
+        pq.write_table(table, str(directory / 'part-0000.parquet'), row_group_size=row_group_size)
+
+
+def test_sample_parquet_draws_distinct_rows(tmp_path):
+    write_parts(tmp_path, parts=3, rows=20000, row_group_size=5000)
+
+    sample, total_rows = sample_parquet(str(tmp_path), ['cicid', 'i94port'], 6000, seed=1)
+
+    assert total_rows == 60000
+    assert sample.column_names == ['cicid', 'i94port']
+    assert 5500 < sample.num_rows < 6500
+    ids = sample.column('cicid').to_pylist()
+    assert len(set(ids)) == len(ids)
+    assert all(i94port == cicid % 7 for cicid, i94port in zip(ids, sample.column('i94port').to_pylist()))
+    # Every month is represented in proportion.
+    assert all(1500 < sum(1 for i in ids if part * 20000 <= i < (part + 1) * 20000) < 2500 for part in range(3))
+
+
+def test_sample_parquet_is_seeded(tmp_path):
+    write_parts(tmp_path, parts=1, rows=10000, row_group_size=1000)
+
+    first, _ = sample_parquet(str(tmp_path), ['cicid'], 500, seed=3)
+    second, _ = sample_parquet(str(tmp_path), ['cicid'], 500, seed=3)
+
+    assert first.equals(second)
+
+
+def test_sample_parquet_keeps_everything_above_the_total(tmp_path):
+    write_parts(tmp_path, parts=2, rows=1000, row_group_size=300)
+
+    sample, total_rows = sample_parquet(str(tmp_path), ['cicid'], 5000)
+
+    assert total_rows == 2000
+    assert sorted(sample.column('cicid').to_pylist()) == list(range(2000))
+
+
+def test_sample_parquet_empty_sample_keeps_the_schema(tmp_path):
+    write_parts(tmp_path, parts=1, rows=100, row_group_size=100)
+
+    sample, _ = sample_parquet(str(tmp_path), ['cicid', 'i94port'], 0)
+
+    assert sample.num_rows == 0
+    assert sample.schema.names == ['cicid', 'i94port']
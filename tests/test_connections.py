@@ -0,0 +1,116 @@
+import pytest
+
+from helpers.connections import ConnectionPool
+
+
+class FakeConnection:
+    """DB-API connection recording commits, rollbacks and closes."""
+
+    def __init__(self, fail_rollback=False, fail_autocommit=False):
+        self.fail_rollback = fail_rollback
+        self.fail_autocommit = fail_autocommit
+        self.closed = 0
+        self.commits = 0
+        self.rollbacks = 0
+        self._autocommit = False
+
+    @property
+    def autocommit(self):
+        return self._autocommit
+
+    @autocommit.setter
+    def autocommit(self, value):
+        if self.fail_autocommit:
+            raise RuntimeError('connection lost')
+        self._autocommit = value
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        if self.fail_rollback:
+            raise RuntimeError('connection lost')
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+
+
+def test_session_reuses_the_connection():
+    pool = ConnectionPool(FakeConnection, max_connections=1)
+    with pool.session() as first:
+        pass
+    with pool.session() as second:
+        pass
+    assert first is second and first.commits == 2
+    assert pool.metrics.as_dict()['opened'] == 1
+    assert pool.metrics.as_dict()['reused'] == 1
+
+
+def test_session_rolls_back_on_error():
+    pool = ConnectionPool(FakeConnection, max_connections=1)
+    with pytest.raises(ValueError):
+        with pool.session() as conn:
+            raise ValueError('bad statement')
+    assert conn.rollbacks == 1 and conn.commits == 0
+
+
+def test_failed_rollback_discards_the_connection():
+    pool = ConnectionPool(lambda: FakeConnection(fail_rollback=True), max_connections=1)
+    with pytest.raises(RuntimeError):
+        with pool.session() as conn:
+            raise ValueError('bad statement')
+    assert conn.closed
+    assert pool.metrics.discarded == 1
+    # The slot is free again and a new connection is opened.
+    assert pool.acquire(timeout=0.1) is not conn
+
+
+def test_pool_is_bounded():
+    pool = ConnectionPool(FakeConnection, max_connections=1)
+    conn = pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.05)
+    pool.release(conn)
+    assert pool.acquire(timeout=0.05) is conn
+
+
+def test_closed_idle_connection_is_replaced():
+    pool = ConnectionPool(FakeConnection, max_connections=1)
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.close()
+    assert pool.acquire(timeout=0.05) is not conn
+    assert pool.metrics.as_dict()['opened'] == 2
+
+
+def test_autocommit_session_switches_back():
+    pool = ConnectionPool(FakeConnection, max_connections=1)
+    with pool.autocommit_session() as conn:
+        assert conn.autocommit
+    assert not conn.autocommit and conn.commits == 0
+    assert pool.acquire(timeout=0.05) is conn
+
+
+def test_failed_autocommit_switch_frees_the_slot():
+    connections = [FakeConnection(fail_autocommit=True), FakeConnection()]
+    pool = ConnectionPool(lambda: connections.pop(0), max_connections=1)
+    with pytest.raises(RuntimeError):
+        with pool.autocommit_session():
+            pass
+    # The only slot is free again, so this does not block.
+    conn = pool.acquire(timeout=0.1)
+    assert not conn.closed
+    assert pool.metrics.discarded == 1
+
+
+def test_autocommit_session_discards_the_connection_on_error():
+    pool = ConnectionPool(FakeConnection, max_connections=1)
+    with pytest.raises(ValueError, match='VACUUM failed'):
+        with pool.autocommit_session() as conn:
+            # A broken connection cannot be switched back either.
+            conn.fail_autocommit = True
+            raise ValueError('VACUUM failed')
+    assert conn.closed
+    assert pool.metrics.discarded == 1
+    assert pool.acquire(timeout=0.1) is not conn
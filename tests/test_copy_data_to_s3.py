@@ -0,0 +1,80 @@
+import os
+
+from boto3.s3.transfer import TransferConfig
+
+import copy_data_to_s3
+from copy_data_to_s3 import MB, UploadState, file_etag, gather_files, list_existing_keys, upload_dataset
+from tests.conftest import BUCKET
+
+
+def write_file(path, size, seed=0):
+    with open(path, 'wb') as f:
+        f.write(bytes((seed + i) % 251 for i in range(size)))
+    return str(path)
+
+
+def transfer_config():
+    return TransferConfig(multipart_threshold=6 * MB, multipart_chunksize=5 * MB, max_concurrency=2)
+
+
+def test_gather_files_keeps_partition_folders(tmp_path):
+    partition = tmp_path / 'i94yr=2016' / 'i94mon=4'
+    partition.mkdir(parents=True)
+    write_file(partition / 'part-0000.parquet', 16)
+    write_file(tmp_path / 'README', 16)
+
+    assert [relative for _, relative in gather_files(str(tmp_path))] == [
+        'README', os.path.join('i94yr=2016', 'i94mon=4', 'part-0000.parquet')]
+
+
+def test_list_existing_keys_pages_through_the_prefix(s3):
+    for i in range(1005):
+        s3.client.put_object(Bucket=BUCKET, Key='demo/{:04d}.csv'.format(i), Body=b'')
+    s3.client.put_object(Bucket=BUCKET, Key='other/0000.csv', Body=b'')
+
+    keys = list_existing_keys(s3.client, BUCKET, 'demo/')
+    assert len(keys) == 1005
+    assert 'other/0000.csv' not in keys
+
+
+def test_file_etag_matches_s3(s3, tmp_path):
+    small = write_file(tmp_path / 'small.csv', 1024)
+    large = write_file(tmp_path / 'large.csv', 11 * MB)
+    config = transfer_config()
+    for path in (small, large):
+        s3.client.upload_file(path, BUCKET, 'data/' + os.path.basename(path), Config=config)
+
+    existing = list_existing_keys(s3.client, BUCKET, 'data/')
+    assert existing['data/small.csv'] == file_etag(small, config)
+    assert existing['data/large.csv'] == file_etag(large, config)
+    assert existing['data/large.csv'].endswith('-3')
+
+
+def test_upload_dataset_skips_unchanged_and_hashes_lazily(s3, tmp_path, monkeypatch):
+    first = write_file(tmp_path / 'first.csv', 2048)
+    second = write_file(tmp_path / 'second.csv', 4096)
+    filenames = [(first, 'first.csv'), (second, 'second.csv')]
+    state = UploadState(str(tmp_path / 'state.db'))
+
+    hashed = []
+    original = copy_data_to_s3.file_etag
+    monkeypatch.setattr(copy_data_to_s3, 'file_etag',
+                        lambda filename, config: hashed.append(filename) or original(filename, config))
+
+    # Nothing in the bucket yet: both files are uploaded without being hashed.
+    total_bytes, _ = upload_dataset(s3.client, BUCKET, 'demo', filenames, transfer_config(), 2, state)
+    assert total_bytes == 2048 + 4096
+    assert hashed == []
+
+    # Both unchanged: nothing is uploaded.
+    total_bytes, _ = upload_dataset(s3.client, BUCKET, 'demo', filenames, transfer_config(), 2, state)
+    assert total_bytes == 0
+    assert sorted(hashed) == sorted([first, second])
+
+    # One changed file is re-uploaded; the other is served from the state cache.
+    hashed.clear()
+    write_file(tmp_path / 'second.csv', 8192, seed=7)
+    total_bytes, _ = upload_dataset(s3.client, BUCKET, 'demo', filenames, transfer_config(), 2, state)
+    assert total_bytes == 8192
+    assert hashed == [second]
+    assert s3.client.head_object(Bucket=BUCKET, Key='demo/second.csv')['ContentLength'] == 8192
@@ -0,0 +1,95 @@
+from helpers.dq_checks import ROW_COUNT_CHECK, compile_checks, run_checks
+
+
+class ChecksCursor:
+    """DB-API cursor answering the batched query and single-value qc_sql queries."""
+
+    def __init__(self, rows, values=None):
+        self.rows = rows
+        self.values = values or {}
+        self.queries = []
+
+    def execute(self, sql):
+        self.queries.append(sql)
+        self._value = self.values.get(sql)
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return (self._value,)
+
+
+TABLE_CHECKS = [
+    {'table': 'public.staging_airports',
+     'checks': [{'name': 'ident_not_null', 'condition': 'ident IS NULL', 'expected_result': 0},
+                {'name': 'no_blank_type', 'condition': "type = ''", 'expected_result': 0}]},
+    {'table': 'public.dim_i94port',
+     'checks': [{'name': 'code_not_null', 'condition': 'code IS NULL', 'expected_result': 0},
+                {'name': 'ports', 'qc_sql': 'SELECT COUNT(DISTINCT code) FROM public.dim_i94port',
+                 'expected_result': 660}]},
+]
+
+
+def test_compile_checks_scans_each_table_once():
+    sql, layout = compile_checks(TABLE_CHECKS)
+
+    selects = sql.split('\nUNION ALL\n')
+    assert len(selects) == 2
+    assert selects[0] == ('SELECT 0 AS table_idx, COUNT(*) AS c0, '
+                          'SUM(CASE WHEN ident IS NULL THEN 1 ELSE 0 END) AS c1, '
+                          "SUM(CASE WHEN type = '' THEN 1 ELSE 0 END) AS c2 "
+                          'FROM public.staging_airports')
+    # The narrower SELECT is padded so that the UNION ALL columns line up.
+    assert selects[1] == ('SELECT 1 AS table_idx, COUNT(*) AS c0, '
+                          'SUM(CASE WHEN code IS NULL THEN 1 ELSE 0 END) AS c1, '
+                          'CAST(NULL AS BIGINT) AS c2 '
+                          'FROM public.dim_i94port')
+    assert layout == [[ROW_COUNT_CHECK, 'ident_not_null', 'no_blank_type'], [ROW_COUNT_CHECK, 'code_not_null']]
+
+
+def test_run_checks_reports_every_check():
+    cursor = ChecksCursor(rows=[(0, 4000, 0, 3), (1, 660, 0, None)],
+                          values={'SELECT COUNT(DISTINCT code) FROM public.dim_i94port': 659})
+
+    results = run_checks(cursor, TABLE_CHECKS)
+
+    # One batched query, then the qc_sql check on the same cursor.
+    assert len(cursor.queries) == 2
+    assert cursor.queries[1] == 'SELECT COUNT(DISTINCT code) FROM public.dim_i94port'
+    outcomes = {(result['table'], result['check']): (result['result'], result['expected'], result['passed'])
+                for result in results}
+    assert outcomes == {
+        ('public.staging_airports', ROW_COUNT_CHECK): (4000, 1, True),
+        ('public.staging_airports', 'ident_not_null'): (0, 0, True),
+        ('public.staging_airports', 'no_blank_type'): (3, 0, False),
+        ('public.dim_i94port', ROW_COUNT_CHECK): (660, 1, True),
+        ('public.dim_i94port', 'code_not_null'): (0, 0, True),
+        ('public.dim_i94port', 'ports'): (659, 660, False),
+    }
+
+
+def test_run_checks_min_rows():
+    cursor = ChecksCursor(rows=[(0, 0, None, None), (1, 660, 0, None)],
+                          values={'SELECT COUNT(DISTINCT code) FROM public.dim_i94port': 660})
+
+    results = run_checks(cursor, TABLE_CHECKS, min_rows=10)
+
+    failed = [(result['table'], result['check']) for result in results if not result['passed']]
+    # An empty table counts no offending rows, but fails the row count.
+    assert failed == [('public.staging_airports', ROW_COUNT_CHECK)]
+
+
+def test_run_checks_reconciles_recorded_row_counts():
+    cursor = ChecksCursor(rows=[(0, 0, 0), (1, 660, 0)],
+                          values={'SELECT COUNT(DISTINCT code) FROM public.dim_i94port': 660})
+
+    results = run_checks(cursor, TABLE_CHECKS, row_counts={'public.staging_airports': (4000, 4001)})
+
+    # The recorded table is not counted again: its SELECT only holds its checks.
+    assert 'COUNT(*)' not in cursor.queries[0].split('\nUNION ALL\n')[0]
+    outcomes = {(result['table'], result['check']): result['passed'] for result in results}
+    assert outcomes[('public.staging_airports', 'rows_loaded')]
+    assert not outcomes[('public.staging_airports', 'source_rows_match')]
+    assert ('public.staging_airports', ROW_COUNT_CHECK) not in outcomes
+    assert outcomes[('public.dim_i94port', ROW_COUNT_CHECK)]
@@ -0,0 +1,87 @@
+import ast
+
+from helpers.migrations import SCHEMA_MIGRATIONS, add_migration, apply_migrations, changed_tables
+
+
+class MigrationCursor:
+    """DB-API cursor keeping schema_migrations in memory and recording statements."""
+
+    def __init__(self, applied=()):
+        self.applied = set(applied)
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        sql = ' '.join(sql.split())
+        if sql.startswith('SELECT version FROM public.schema_migrations'):
+            self._rows = [(version,) for version in sorted(self.applied)]
+            return
+        if sql.startswith('INSERT INTO public.schema_migrations'):
+            self.applied.add(params[0])
+        self.statements.append((sql, params))
+
+    def fetchall(self):
+        return self._rows
+
+
+MIGRATIONS = [
+    {'version': 2, 'description': 'Pivot the demographics', 'tables': ['public.staging_demographics']},
+    {'version': 1, 'description': 'Store dates as DATE', 'tables': ['public.staging_immigration']},
+]
+
+
+def test_apply_migrations_drops_tables_in_version_order():
+    cursor = MigrationCursor()
+
+    assert apply_migrations(cursor, MIGRATIONS) == [1, 2]
+
+    drops = [sql for sql, _ in cursor.statements if sql.startswith('DROP')]
+    assert drops == ['DROP TABLE IF EXISTS public.staging_immigration CASCADE',
+                     'DROP TABLE IF EXISTS public.staging_demographics CASCADE']
+    deletes = [params for sql, params in cursor.statements if sql.startswith('DELETE FROM public.load_watermarks')]
+    assert deletes == [('public.staging_immigration',), ('public.staging_demographics',)]
+    assert cursor.statements[0][0].startswith('CREATE TABLE IF NOT EXISTS public.schema_migrations')
+
+
+def test_apply_migrations_runs_each_version_once():
+    cursor = MigrationCursor(applied=[1])
+
+    assert apply_migrations(cursor, MIGRATIONS) == [2]
+    assert apply_migrations(cursor, MIGRATIONS) == []
+    assert not any('staging_immigration' in sql for sql, _ in cursor.statements)
+
+
+def test_schema_migrations_have_unique_versions():
+    versions = [migration['version'] for migration in SCHEMA_MIGRATIONS]
+
+    assert len(set(versions)) == len(versions)
+    assert all(table.startswith('public.') for migration in SCHEMA_MIGRATIONS for table in migration['tables'])
+
+
+STATEMENTS = {
+    'dim_i94port_create': 'CREATE TABLE IF NOT EXISTS public.dim_i94port (\n    code CHAR(3) PRIMARY KEY\n)',
+    'staging_immigration_create': ('CREATE TABLE IF NOT EXISTS public.staging_immigration (\n'
+                                   '    i94port CHAR(3) REFERENCES public.dim_i94port(code)\n)'),
+    'staging_temperature_create': 'CREATE TABLE IF NOT EXISTS public.staging_temperature (\n    dt DATE\n)',
+}
+
+
+def test_changed_tables_include_the_tables_referencing_them():
+    rewritten = {'dim_i94port_create': STATEMENTS['dim_i94port_create'].replace('CHAR(3)', 'SMALLINT'),
+                 # Only the layout of the statement changes.
+                 'staging_temperature_create': STATEMENTS['staging_temperature_create'].replace('\n', ' ')}
+
+    assert changed_tables(STATEMENTS, rewritten) == ['public.dim_i94port', 'public.staging_immigration']
+    assert changed_tables(STATEMENTS, {'staging_temperature_create': STATEMENTS['staging_temperature_create']}) == []
+
+
+def test_add_migration_appends_the_next_version():
+    source = "import os\n\nSCHEMA_MIGRATIONS = [\n    {'version': 1,\n     'description': 'First',\n" \
+             "     'tables': ['public.a']},\n]\n\n\nOTHER = [\n]\n"
+
+    source, version = add_migration(source, "Narrow a's types", ['public.a', 'public.b'])
+
+    assert version == 2
+    migrations = ast.literal_eval(source.split('SCHEMA_MIGRATIONS = ')[1].split('\n\n\n')[0])
+    assert migrations[-1] == {'version': 2, 'description': "Narrow a's types", 'tables': ['public.a', 'public.b']}
+    assert source.endswith('OTHER = [\n]\n')
+
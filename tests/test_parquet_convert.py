@@ -0,0 +1,27 @@
+from helpers.parquet_convert import schema_digest
+
+DDL = """
+CREATE TABLE IF NOT EXISTS public.staging_airports (
+    ident VARCHAR,
+    elevation_ft FLOAT,
+    iso_region VARCHAR(8),
+    PRIMARY KEY (ident)
+) DISTSTYLE ALL;
+"""
+
+
+def test_schema_digest_follows_column_types():
+    retyped = DDL.replace('elevation_ft FLOAT', 'elevation_ft INTEGER')
+    renamed = DDL.replace('iso_region', 'region')
+
+    assert len(schema_digest(DDL)) == 8
+    assert schema_digest(retyped) != schema_digest(DDL)
+    assert schema_digest(renamed) != schema_digest(DDL)
+
+
+def test_schema_digest_ignores_layout_and_constraints():
+    reformatted = DDL.replace('    ', '  ').replace('VARCHAR(8)', 'VARCHAR(16)')
+    unconstrained = DDL.replace(',\n    PRIMARY KEY (ident)', '').replace(' DISTSTYLE ALL', '')
+
+    assert schema_digest(reformatted) == schema_digest(DDL)
+    assert schema_digest(unconstrained) == schema_digest(DDL)
@@ -0,0 +1,64 @@
+import pyarrow as pa
+import pytest
+
+from helpers.pivot import pivot_batches, pivot_source_schema
+
+
+COLUMNS = {'Asian': 'asian', 'White': 'white'}
+SCHEMA = pa.schema([('city', pa.string()), ('state', pa.string()), ('median_age', pa.float64()),
+                    ('asian', pa.int32()), ('white', pa.int32())])
+SOURCE_SCHEMA = pivot_source_schema(SCHEMA, 'race', 'count', COLUMNS)
+
+
+def batch(rows):
+    return pa.RecordBatch.from_pylist([dict(zip(SOURCE_SCHEMA.names, row)) for row in rows], schema=SOURCE_SCHEMA)
+
+
+def pivot(batches):
+    return pa.Table.from_batches(list(pivot_batches(batches, SCHEMA, ['city', 'state'], 'race', 'count', COLUMNS)),
+                                 schema=SCHEMA).to_pylist()
+
+
+def test_pivot_source_schema():
+    assert SOURCE_SCHEMA.names == ['city', 'state', 'median_age', 'race', 'count']
+    assert SOURCE_SCHEMA.field('count').type == pa.int32()
+
+
+def test_pivot_batches_one_row_per_city():
+    # The race rows of a city can be split across batches.
+    rows = pivot([batch([('Boston', 'Massachusetts', 31.8, 'Asian', 75000),
+                         ('Austin', 'Texas', 32.0, 'White', 600000)]),
+                  batch([('Boston', 'Massachusetts', 31.8, 'White', 400000),
+                         ('Austin', 'Texas', 32.0, 'Asian', 70000),
+                         ('Portland', 'Maine', 37.1, 'White', 60000)])])
+
+    assert rows == [
+        {'city': 'Austin', 'state': 'Texas', 'median_age': 32.0, 'asian': 70000, 'white': 600000},
+        {'city': 'Boston', 'state': 'Massachusetts', 'median_age': 31.8, 'asian': 75000, 'white': 400000},
+        # A race without a row stays null rather than 0.
+        {'city': 'Portland', 'state': 'Maine', 'median_age': 37.1, 'asian': None, 'white': 60000},
+    ]
+
+
+def test_pivot_batches_sums_repeated_rows():
+    rows = pivot([batch([('Boston', 'Massachusetts', 31.8, 'Asian', 5),
+                         ('Boston', 'Massachusetts', 31.8, 'Asian', 7)])])
+
+    assert [(row['asian'], row['white']) for row in rows] == [(12, None)]
+
+
+def test_pivot_batches_combines_every_batch():
+    rows = pivot([batch([('Boston', 'Massachusetts', 31.8, 'Asian', 5)]),
+                  batch([('Boston', 'Massachusetts', 31.8, 'White', 3)]),
+                  batch([('Boston', 'Massachusetts', 31.8, 'Asian', 7)])])
+
+    assert [(row['asian'], row['white']) for row in rows] == [(12, 3)]
+
+
+def test_pivot_batches_rejects_unknown_values():
+    with pytest.raises(ValueError, match='Martian'):
+        pivot([batch([('Boston', 'Massachusetts', 31.8, 'Martian', 1)])])
+
+
+def test_pivot_batches_without_rows():
+    assert pivot([batch([])]) == []
@@ -0,0 +1,102 @@
+import gzip
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from helpers.row_counts import copied_row_count, csv_row_count, parquet_row_count, source_row_count
+from tests.conftest import BUCKET
+
+
+class FakeCursor:
+    """DB-API cursor answering version() and pg_last_copy_count()."""
+
+    def __init__(self, version, rowcount, last_copy_count=None):
+        self.version = version
+        self.rowcount = rowcount
+        self.last_copy_count = last_copy_count
+        self.queries = []
+
+    def execute(self, sql):
+        self.queries.append(sql)
+        self.rowcount = 1
+        self._result = (self.version if 'version' in sql else self.last_copy_count,)
+
+    def fetchone(self):
+        return self._result
+
+
+class RecordingClient:
+    """Wraps an S3 client and records the Range of every GetObject."""
+
+    def __init__(self, client):
+        self.client = client
+        self.ranges = []
+
+    def get_object(self, **kwargs):
+        self.ranges.append(kwargs.get('Range'))
+        return self.client.get_object(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+def parquet_bytes(rows, row_group_size):
+    table = pa.table({'id': pa.array(range(rows), pa.int32()),
+                      'city': pa.array(['City {}'.format(i) for i in range(rows)])})
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, row_group_size=row_group_size)
+    return buffer.getvalue()
+
+
+def test_copied_row_count_uses_rowcount_on_postgres():
+    cursor = FakeCursor('PostgreSQL 13.4 on x86_64-pc-linux-gnu', rowcount=1234)
+
+    assert copied_row_count(cursor) == 1234
+    assert cursor.queries == ['SELECT version()']
+
+
+def test_copied_row_count_asks_redshift():
+    cursor = FakeCursor('PostgreSQL 8.0.2 on i686-pc-linux-gnu, Redshift 1.0.28965', rowcount=-1,
+                        last_copy_count=5678)
+
+    assert copied_row_count(cursor) == 5678
+    assert cursor.queries == ['SELECT version()', 'SELECT pg_last_copy_count()']
+
+
+def test_parquet_row_count_reads_the_footer_only(s3):
+    body = parquet_bytes(5000, row_group_size=100)
+    s3.client.put_object(Bucket=BUCKET, Key='parquet/part-0000.parquet', Body=body)
+    client = RecordingClient(s3.client)
+
+    assert parquet_row_count(client, BUCKET, 'parquet/part-0000.parquet') == 5000
+    assert len(client.ranges) == 2
+    assert client.ranges[0] == 'bytes=-8'
+    footer_length = int(client.ranges[1][len('bytes=-'):])
+    assert footer_length < len(body) // 2
+
+
+def test_csv_row_count_with_header(s3):
+    body = 'id,city\n1,"Boston, MA"\n2,"New\nYork"\n3,Austin\n'
+    s3.client.put_object(Bucket=BUCKET, Key='csv/cities.csv', Body=body.encode('utf-8'))
+
+    assert csv_row_count(s3.client, BUCKET, 'csv/cities.csv', ignore_headers=1) == 3
+    assert csv_row_count(s3.client, BUCKET, 'csv/cities.csv') == 4
+
+
+def test_csv_row_count_gzip(s3):
+    body = 'id;city\n' + ''.join('{};City {}\n'.format(i, i) for i in range(250))
+    s3.client.put_object(Bucket=BUCKET, Key='csv/cities.csv.gz', Body=gzip.compress(body.encode('utf-8')))
+
+    assert csv_row_count(s3.client, BUCKET, 'csv/cities.csv.gz', delimiter=';',
+                         ignore_headers=1, compression='GZIP') == 250
+
+
+def test_source_row_count_prefix(s3):
+    keys = ['parquet/part-0000.parquet', 'parquet/part-0001.parquet']
+    s3.client.put_object(Bucket=BUCKET, Key=keys[0], Body=parquet_bytes(300, row_group_size=100))
+    s3.client.put_object(Bucket=BUCKET, Key=keys[1], Body=parquet_bytes(45, row_group_size=100))
+    # Empty folder placeholders are not read.
+    s3.client.put_object(Bucket=BUCKET, Key='parquet/', Body=b'')
+
+    assert source_row_count(s3.client, BUCKET, 'parquet/', file_format='parquet') == 345
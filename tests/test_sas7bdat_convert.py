@@ -0,0 +1,86 @@
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from helpers import sas7bdat_convert
+from helpers.sas7bdat_convert import convert_sas7bdat, partition_dir, sas7bdat_schema, split_partitions
+
+
+class FakeSAS7BDATReader:
+    """The part of pandas' SAS7BDATReader used by the conversion, over DataFrame chunks."""
+
+    def __init__(self, chunks, column_types):
+        self.chunks = chunks
+        self.column_names = list(chunks[0].columns)
+        self.column_types = column_types
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        self.closed = True
+
+
+def immigration_chunk(start, rows, month):
+    return pd.DataFrame({'cicid': [float(i) for i in range(start, start + rows)],
+                         'i94yr': [2016.0] * rows,
+                         'i94mon': [float(month)] * rows,
+                         'i94port': ['BOS'] * rows,
+                         # Blank in every row of a chunk, still typed as a string.
+                         'occup': [None] * rows,
+                         'validres': [1.0] * rows})
+
+
+def test_sas7bdat_schema_from_header():
+    reader = FakeSAS7BDATReader([immigration_chunk(0, 1, 4)], [b'd', b'd', b'd', b's', b's', b'd'])
+
+    assert sas7bdat_schema(reader).types == [pa.float64()] * 3 + [pa.string()] * 2 + [pa.float64()]
+    assert sas7bdat_schema(reader, ['i94port', 'cicid']).names == ['i94port', 'cicid']
+    with pytest.raises(ValueError, match='entdepu'):
+        sas7bdat_schema(reader, ['cicid', 'entdepu'])
+
+
+def test_partition_dir():
+    assert partition_dir(['i94yr', 'i94mon'], [2016.0, 4.0]) == 'i94yr=2016/i94mon=4'
+    assert partition_dir(['i94yr', 'i94mon'], [2016.0, 4.5]) == 'i94yr=2016/i94mon=4.5'
+
+
+def test_split_partitions():
+    table = pa.table({'i94yr': [2016.0] * 4, 'i94mon': [4.0, 5.0, 4.0, 5.0], 'cicid': [1.0, 2.0, 3.0, 4.0]})
+
+    partitions = dict(split_partitions(table, ['i94yr', 'i94mon']))
+
+    assert partitions['i94yr=2016/i94mon=4'].column('cicid').to_pylist() == [1.0, 3.0]
+    assert partitions['i94yr=2016/i94mon=5'].column('cicid').to_pylist() == [2.0, 4.0]
+    with pytest.raises(ValueError, match='i94mon'):
+        split_partitions(pa.table({'i94yr': [2016.0], 'i94mon': pa.array([None], pa.float64())}),
+                         ['i94yr', 'i94mon'])
+
+
+def test_convert_sas7bdat_partitions_and_keeps_columns(tmp_path, monkeypatch):
+    # The last chunk runs into the next month, as the monthly files sometimes do.
+    reader = FakeSAS7BDATReader([immigration_chunk(0, 300, 4), immigration_chunk(300, 250, 4),
+                                 pd.concat([immigration_chunk(550, 10, 4), immigration_chunk(560, 5, 5)])],
+                                [b'd', b'd', b'd', b's', b's', b'd'])
+    monkeypatch.setattr(sas7bdat_convert, 'open_sas7bdat', lambda path, chunk_rows, encoding: reader)
+    columns = ['cicid', 'i94yr', 'i94mon', 'i94port', 'occup']
+
+    parts = convert_sas7bdat('/data/i94_apr16_sub.sas7bdat', str(tmp_path), columns=columns,
+                             row_group_size=100, rows_per_file=250)
+
+    assert reader.closed
+    assert [(partition, os.path.basename(path), rows) for partition, path, rows in parts] == [
+        ('i94yr=2016/i94mon=4', 'i94_apr16_sub-0000.parquet', 250),
+        ('i94yr=2016/i94mon=4', 'i94_apr16_sub-0001.parquet', 250),
+        ('i94yr=2016/i94mon=4', 'i94_apr16_sub-0002.parquet', 60),
+        ('i94yr=2016/i94mon=5', 'i94_apr16_sub-0000.parquet', 5),
+    ]
+    april = pq.read_table(os.path.join(str(tmp_path), 'i94yr=2016', 'i94mon=4'))
+    # The partition columns stay in the files, and the blank column is a string.
+    assert april.schema.names == columns
+    assert april.schema.field('occup').type == pa.string()
+    assert sorted(april.column('cicid').to_pylist()) == [float(i) for i in range(560)]
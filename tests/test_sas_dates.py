@@ -0,0 +1,43 @@
+from datetime import date
+
+import pyarrow as pa
+
+from helpers.sas_dates import SAS_DAYS, convert_dates, parse_date_strings, sas_days_to_date
+
+
+def test_sas_days_from_the_1960_epoch():
+    dates = sas_days_to_date(pa.array([0.0, 20545.0, -1.0, None], pa.float64()))
+
+    assert dates.type == pa.date32()
+    assert dates.to_pylist() == [date(1960, 1, 1), date(2016, 4, 1), date(1959, 12, 31), None]
+
+
+def test_sas_days_sentinels_become_null():
+    values = [float('nan'), float('inf'), -float('inf'), 20545.5, 1e12, -1e12, 2958466.0]
+
+    assert sas_days_to_date(pa.array(values, pa.float64())).to_pylist() == [None] * len(values)
+
+
+def test_parse_date_strings():
+    dates = parse_date_strings(pa.array(['20160401', ' 20160430 ', '20160230', '2016041', '99991231', None]),
+                               '%Y%m%d')
+
+    # February 30 does not roll over to March 1, and 9999 is out of range.
+    assert dates.to_pylist() == [date(2016, 4, 1), date(2016, 4, 30), None, None, None, None]
+
+
+def test_convert_dates_counts_invalid_values():
+    table = pa.table({'cicid': pa.array([1.0, 2.0, 3.0, 4.0, 5.0]),
+                      'arrdate': pa.array([20545.0, None, float('nan'), 20546.0, 1e12]),
+                      'dtaddto': pa.array(['06302016', 'D/S', '', None, '02302016'])})
+
+    converted, invalid = convert_dates(table, {'arrdate': SAS_DAYS, 'dtaddto': '%m%d%Y'})
+
+    assert converted.schema.field('arrdate').type == pa.date32()
+    assert converted.schema.field('dtaddto').type == pa.date32()
+    assert converted.column('cicid').to_pylist() == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert converted.column('arrdate').to_pylist() == [date(2016, 4, 1), None, None, date(2016, 4, 2), None]
+    assert converted.column('dtaddto').to_pylist() == [date(2016, 6, 30), None, None, None, None]
+    # Nulls and empty strings are missing rather than invalid; 'D/S' (duration
+    # of status) and February 30 are invalid.
+    assert invalid == {'arrdate': 2, 'dtaddto': 2}
@@ -0,0 +1,107 @@
+import io
+import os
+
+import pytest
+
+from helpers.sas_labels import SASLabelsCache, iter_sas_value, parse_sas_labels
+
+from tests.conftest import BUCKET
+
+LABELS_KEY = 'i94_data/I94_SAS_Labels_Descriptions.SAS'
+
+LABELS = """libname library 'Your file location' ;
+proc format library=library ;
+
+/* I94CIT & I94RES - This format shows all the valid and invalid codes for processing */
+  value i94cntyl
+   582 =  'MEXICO Air Sea, and Not Reported (I-94, no land arrivals)'
+   236 =  'AFGHANISTAN'
+   101 =  'ALBANIA'
+;
+
+/* I94PORT - This format shows all the valid and invalid codes for processing */
+  value $i94prtl
+\t'ALC'\t=\t'ALCAN, AK             '
+\t'BOS'\t=\t'BOSTON, MA            '
+\t'XXX'\t=\t'NOT REPORTED = UNKNOWN; SEE NOTES'
+;
+
+/* I94MODE - There are missing values as well as not reported (9) */
+\tvalue i94model
+\t1 = 'Air'
+\t2 = 'Sea'
+\t3 = 'Land'
+\t9 = 'Not reported' ;
+
+/* I94ADDR - There is lots of invalid codes in this variable */
+\tvalue i94addrl
+\t'AL'='ALABAMA'
+\t'MA'='MASSACHUSETTS'
+;
+
+/* I94VISA - Visa codes collapsed into three categories:
+   1 = Business
+   2 = Pleasure
+   3 = Student
+*/
+"""
+
+COUNTS = {'i94cntyl': 3, 'i94prtl': 3, 'i94model': 4, 'i94addrl': 2, 'I94VISA': 3}
+
+
+@pytest.fixture
+def labels_s3(s3):
+    s3.load_string(LABELS, LABELS_KEY, BUCKET)
+    return s3
+
+
+def test_parse_counts_every_block():
+    labels = parse_sas_labels(io.StringIO(LABELS))
+    assert {name: len(rows) for name, rows in labels.items()} == COUNTS
+
+
+def test_quoted_labels_keep_equals_and_semicolons():
+    ports = dict(iter_sas_value(io.StringIO(LABELS), 'i94prtl'))
+    assert ports['XXX'] == 'NOT REPORTED = UNKNOWN; SEE NOTES'
+    assert ports['BOS'].strip() == 'BOSTON, MA'
+
+
+def test_cache_miss_downloads_and_writes_entry(labels_s3, tmp_path):
+    cache = SASLabelsCache(str(tmp_path))
+    labels = cache.get_labels(labels_s3, BUCKET, LABELS_KEY)
+
+    etag = labels_s3.get_key(LABELS_KEY, BUCKET).e_tag.strip('"')
+    assert os.listdir(str(tmp_path)) == ['{}.json'.format(etag)]
+    assert {name: len(rows) for name, rows in labels.items()} == COUNTS
+
+
+def test_cache_hit_skips_download(labels_s3, tmp_path, monkeypatch):
+    cache = SASLabelsCache(str(tmp_path))
+    first = cache.get_labels(labels_s3, BUCKET, LABELS_KEY)
+
+    def no_download(*args, **kwargs):
+        raise AssertionError('labels downloaded on a cache hit')
+    monkeypatch.setattr('helpers.sas_labels.parse_sas_labels', no_download)
+    assert cache.get_labels(labels_s3, BUCKET, LABELS_KEY) == first
+
+
+def test_new_etag_misses_the_cache(labels_s3, tmp_path):
+    cache = SASLabelsCache(str(tmp_path))
+    cache.get_labels(labels_s3, BUCKET, LABELS_KEY)
+    labels_s3.load_string(LABELS.replace("\t'AL'='ALABAMA'\n", ''), LABELS_KEY, BUCKET)
+
+    labels = cache.get_labels(labels_s3, BUCKET, LABELS_KEY)
+    assert len(labels['i94addrl']) == 1
+    assert len(os.listdir(str(tmp_path))) == 2
+
+
+def test_failed_write_leaves_no_entry(labels_s3, tmp_path, monkeypatch):
+    cache = SASLabelsCache(str(tmp_path))
+
+    def failing_replace(src, dst):
+        raise OSError('disk full')
+    monkeypatch.setattr('helpers.sas_labels.os.replace', failing_replace)
+    with pytest.raises(OSError):
+        cache.get_labels(labels_s3, BUCKET, LABELS_KEY)
+
+    assert os.listdir(str(tmp_path)) == []
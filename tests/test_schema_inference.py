@@ -0,0 +1,51 @@
+import pyarrow as pa
+
+from helpers.schema_inference import infer_types, keep_parquet_floats, profile_batches
+
+DDLS = {
+    'dim_i94cit': 'CREATE TABLE public.dim_i94cit (\n    code FLOAT PRIMARY KEY\n)',
+    'staging_immigration': 'CREATE TABLE public.staging_immigration (\n'
+                           '    i94cit FLOAT REFERENCES public.dim_i94cit(code)\n)',
+}
+
+
+def text_profile(values):
+    batch = pa.RecordBatch.from_arrays([pa.array(values, pa.string())], names=['code'])
+    return profile_batches([batch], ['code'], from_text=True)['code']
+
+
+def test_text_integers_are_narrowed():
+    assert text_profile(['1', '250', None, '-3']).sql_type() == 'SMALLINT'
+    assert text_profile(['0', '10', '0.5']).sql_type() == 'FLOAT'
+
+
+def test_leading_zeros_stay_text():
+    assert text_profile(['01', '02', '12']).sql_type() == 'CHAR(2)'
+    assert text_profile(['007', '1234']).sql_type() == 'VARCHAR(8)'
+
+
+def test_leading_zeros_in_a_later_batch_stay_text():
+    batches = [pa.RecordBatch.from_arrays([pa.array(values)], names=['code']) for values in (['12', '34'], ['05'])]
+
+    assert profile_batches(batches, ['code'], from_text=True)['code'].sql_type() == 'CHAR(2)'
+
+
+def test_parquet_doubles_keep_float_with_their_foreign_keys():
+    codes = pa.RecordBatch.from_arrays([pa.array([101.0, 582.0, 689.0])], names=['i94cit'])
+    profiles = {'staging_immigration': profile_batches([codes], ['i94cit']),
+                'dim_i94cit': text_profile(['101', '582', '689', '999'])}
+    profiles['dim_i94cit'] = {'code': profiles['dim_i94cit']}
+
+    assert keep_parquet_floats(profiles['staging_immigration'], {'i94cit': pa.float64()}) == ['i94cit']
+    types = infer_types(DDLS, profiles)
+
+    assert types['staging_immigration']['i94cit'] == 'FLOAT'
+    assert types['dim_i94cit']['code'] == 'FLOAT'
+
+
+def test_parquet_integers_are_narrowed():
+    codes = pa.RecordBatch.from_arrays([pa.array([101, 582], pa.int64())], names=['i94cit'])
+    profiles = profile_batches([codes], ['i94cit'])
+
+    assert keep_parquet_floats(profiles, {'i94cit': pa.int64()}) == []
+    assert profiles['i94cit'].sql_type() == 'SMALLINT'
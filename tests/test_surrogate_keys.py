@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+
+import pyarrow as pa
+import pytest
+
+from helpers.surrogate_keys import MAX_KEY, assign_keys, mapping_key, read_mapping, replace_codes, write_mapping
+from tests.conftest import BUCKET
+
+
+PLUGINS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'plugins')
+
+
+def test_assign_keys_never_reassigns():
+    mapping, new_codes = assign_keys({}, ['ATL', 'BOS '])
+    assert mapping == {'ATL': 1, 'BOS': 2}
+    assert new_codes == ['ATL', 'BOS']
+
+    mapping, new_codes = assign_keys({'BOS': 2}, ['ATL', 'BOS', 'CHI'])
+    assert mapping == {'BOS': 2, 'ATL': 3, 'CHI': 4}
+    assert new_codes == ['ATL', 'CHI']
+
+
+def test_assign_keys_stops_at_smallint():
+    with pytest.raises(ValueError, match='NEW'):
+        assign_keys({'OLD': MAX_KEY}, ['NEW'])
+
+
+def test_mapping_round_trip(s3):
+    key = mapping_key('i94prtl')
+
+    assert key == 'surrogate_keys/i94prtl.json'
+    assert read_mapping(s3, BUCKET, key) == {}
+    write_mapping(s3, BUCKET, key, {'BOS': 2, 'ATL': 1})
+    assert list(read_mapping(s3, BUCKET, key).items()) == [('ATL', 1), ('BOS', 2)]
+
+
+def test_replace_codes_keeps_unknown_codes():
+    table = pa.table({'cicid': [1.0, 2.0, 3.0, 4.0, 5.0],
+                      'i94port': ['ATL', 'XXX', None, 'BOS ', ''],
+                      'i94addr': ['GA', '99', 'MA', None, 'MA']})
+    mappings = {'i94port': {'ATL': 1, 'BOS': 2}, 'i94addr': {'GA': 1, 'MA': 2}}
+
+    converted, unknown = replace_codes(table, mappings)
+
+    assert converted.column_names == ['cicid', 'i94port', 'i94addr']
+    assert converted.schema.field('i94port').type == pa.int16()
+    assert converted.column('i94port').to_pylist() == [1, None, None, 2, None]
+    assert converted.column('i94addr').to_pylist() == [1, None, 2, None, 2]
+    # Missing and empty codes are not unknown.
+    assert unknown == {'i94port': 1, 'i94addr': 1}
+
+
+def test_import_does_not_load_pyarrow():
+    # The DAG file imports this module while the scheduler parses it.
+    code = 'import sys, helpers.surrogate_keys; print("pyarrow" in sys.modules)'
+    output = subprocess.run([sys.executable, '-c', code], check=True, stdout=subprocess.PIPE,
+                            universal_newlines=True, env={'PYTHONPATH': PLUGINS_DIR}).stdout
+    assert output.strip() == 'False'
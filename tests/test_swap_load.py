@@ -0,0 +1,78 @@
+import pytest
+
+from helpers.ddl import rename_table
+from helpers.sql_queries_create import SqlQueriesCreate
+from helpers.swap_load import create_shadow, swap_in_shadow
+
+
+class CatalogCursor:
+    """DB-API cursor answering the catalog queries of swap_load."""
+
+    def __init__(self, dependents=(), grants=()):
+        self.dependents = [(name,) for name in dependents]
+        self.grants = list(grants)
+        self.queries = []
+        self._rows = []
+
+    def execute(self, sql, params=None):
+        self.queries.append(' '.join(sql.split()))
+        if 'pg_depend' in sql:
+            self._rows = self.dependents
+        elif 'table_privileges' in sql:
+            self.params = params
+            self._rows = self.grants
+        else:
+            self._rows = []
+
+    def fetchall(self):
+        return self._rows
+
+
+def test_rename_table_keeps_columns_and_keys():
+    ddl = rename_table(SqlQueriesCreate.dim_i94port_airports_create, 'public.dim_i94port_airports__shadow')
+
+    assert 'public.dim_i94port_airports__shadow (' in ddl
+    assert 'REFERENCES public.dim_i94port(port_key)' in ddl
+    assert ddl.replace('__shadow', '') == SqlQueriesCreate.dim_i94port_airports_create
+
+
+def test_create_shadow_from_ddl_with_grants():
+    cursor = CatalogCursor(grants=[('analyst', 'SELECT'), ('PUBLIC', 'SELECT')])
+
+    shadow = create_shadow(cursor, 'public.staging_airports', SqlQueriesCreate.staging_airports_create)
+
+    assert shadow == 'public.staging_airports__shadow'
+    assert cursor.params == ('public', 'staging_airports')
+    statements = [sql for sql in cursor.queries if 'pg_depend' not in sql and 'table_privileges' not in sql]
+    assert statements[0] == 'DROP TABLE IF EXISTS public.staging_airports__shadow'
+    assert statements[1].startswith('CREATE TABLE IF NOT EXISTS public.staging_airports__shadow (')
+    assert statements[1].endswith('DISTSTYLE ALL;')
+    assert statements[2:] == ['GRANT SELECT ON public.staging_airports__shadow TO "analyst"',
+                              'GRANT SELECT ON public.staging_airports__shadow TO PUBLIC']
+
+
+def test_create_shadow_without_ddl_uses_like():
+    cursor = CatalogCursor()
+
+    create_shadow(cursor, 'public.staging_airports')
+
+    assert 'CREATE TABLE public.staging_airports__shadow (LIKE public.staging_airports)' in cursor.queries
+
+
+def test_create_shadow_refuses_bound_views():
+    cursor = CatalogCursor(dependents=['airports_by_state'])
+
+    with pytest.raises(ValueError, match='airports_by_state'):
+        create_shadow(cursor, 'public.staging_airports', SqlQueriesCreate.staging_airports_create)
+    assert not any(sql.startswith(('DROP', 'CREATE')) for sql in cursor.queries)
+
+
+def test_swap_in_shadow_renames_and_drops():
+    cursor = CatalogCursor()
+
+    swap_in_shadow(cursor, 'public.staging_airports')
+
+    assert cursor.queries == ['DROP TABLE IF EXISTS public.staging_airports__retired',
+                              'ALTER TABLE public.staging_airports RENAME TO staging_airports__retired',
+                              'ALTER TABLE public.staging_airports__shadow RENAME TO staging_airports',
+                              'DROP TABLE public.staging_airports__retired']
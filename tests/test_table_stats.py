@@ -0,0 +1,85 @@
+import pytest
+
+from helpers.table_stats import maintenance_actions, qualified_name, table_stats
+
+
+class StatsCursor:
+    """DB-API cursor returning fixed svv_table_info or pg_stat_user_tables rows."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, sql, params=None):
+        self.sql, self.params = sql, params
+
+    def fetchall(self):
+        return self.rows
+
+
+def figures(unsorted=0.0, stats_off=0.0, ghost=0.0):
+    return {'unsorted': unsorted, 'stats_off': stats_off, 'ghost': ghost, 'rows': 1000}
+
+
+def test_table_stats_percentages():
+    cursor = StatsCursor([('public.staging_immigration', 12.5, 30.0, 1200, 1000),
+                          ('public.dim_i94port', None, None, 0, 0)])
+
+    stats = table_stats(cursor, ['public.staging_immigration', 'dim_i94port'])
+
+    assert cursor.params == ['public.staging_immigration', 'public.dim_i94port']
+    assert 'svv_table_info' in cursor.sql
+    assert stats['public.staging_immigration'] == {'unsorted': 12.5, 'stats_off': 30.0,
+                                                   'ghost': pytest.approx(100.0 * 200 / 1200), 'rows': 1000}
+    assert stats['public.dim_i94port'] == {'unsorted': None, 'stats_off': 0.0, 'ghost': 0.0, 'rows': 0}
+
+
+def test_table_stats_postgres_has_no_sort_order():
+    cursor = StatsCursor([('public.staging_airports', None, 100.0, 50, 50)])
+
+    stats = table_stats(cursor, ['staging_airports'], dialect='postgres')
+
+    assert 'pg_stat_user_tables' in cursor.sql
+    assert stats['public.staging_airports']['unsorted'] is None
+    assert stats['public.staging_airports']['ghost'] == 0.0
+
+
+def test_table_stats_without_tables():
+    cursor = StatsCursor([])
+
+    assert table_stats(cursor, []) == {}
+    assert not hasattr(cursor, 'sql')
+
+
+@pytest.mark.parametrize('stats, expected', [
+    (figures(), []),
+    # Exactly at a threshold is still tolerated.
+    (figures(unsorted=5.0, stats_off=10.0, ghost=5.0), []),
+    (figures(unsorted=5.1), ['VACUUM SORT ONLY t']),
+    (figures(ghost=5.1), ['VACUUM DELETE ONLY t']),
+    (figures(unsorted=20.0, ghost=20.0), ['VACUUM FULL t']),
+    (figures(stats_off=10.1), ['ANALYZE t']),
+    (figures(unsorted=20.0, ghost=20.0, stats_off=50.0), ['VACUUM FULL t', 'ANALYZE t']),
+    (figures(ghost=50.0, stats_off=50.0), ['VACUUM DELETE ONLY t', 'ANALYZE t']),
+])
+def test_maintenance_actions_redshift(stats, expected):
+    assert maintenance_actions('t', stats) == expected
+
+
+@pytest.mark.parametrize('stats, expected', [
+    (figures(unsorted=None), []),
+    (figures(unsorted=None, ghost=5.1), ['VACUUM t']),
+    (figures(unsorted=None, ghost=5.1, stats_off=100.0), ['VACUUM t', 'ANALYZE t']),
+])
+def test_maintenance_actions_postgres(stats, expected):
+    assert maintenance_actions('t', stats, dialect='postgres') == expected
+
+
+def test_maintenance_actions_custom_thresholds():
+    thresholds = {'stats_off': 0.0, 'unsorted': 50.0, 'ghost': 50.0}
+
+    assert maintenance_actions('t', figures(unsorted=20.0, ghost=20.0, stats_off=1.0), thresholds) == ['ANALYZE t']
+
+
+def test_qualified_name():
+    assert qualified_name('dim_i94port') == 'public.dim_i94port'
+    assert qualified_name('staging.dim_i94port') == 'staging.dim_i94port'
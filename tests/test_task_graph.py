@@ -0,0 +1,103 @@
+import pytest
+
+from helpers.ddl import table_name
+from helpers.sql_queries_create import SqlQueriesCreate
+from helpers.table_configs import s3_table_keys, sas_table_configs
+from helpers.task_graph import (CACHE_LABELS_TASK_ID, END_TASK_ID, MAINTENANCE_TASK_ID, START_TASK_ID,
+                                barrier_task_graph, check_task_id, create_task_id, critical_path, load_task_id,
+                                preprocess_task_id, table_dependencies, task_graph)
+
+
+DDLS = {**SqlQueriesCreate.dim_tables, **SqlQueriesCreate.staging_tables}
+CREATE_IDS = {table_name(ddl): create_task_id(key) for key, ddl in DDLS.items()}
+
+
+def topological_order(graph):
+    """Orders the tasks of a graph upstream first; fails on a cycle."""
+    order, visiting, done = [], set(), set()
+
+    def visit(task_id):
+        if task_id in done:
+            return
+        assert task_id not in visiting, 'cycle through {}'.format(task_id)
+        visiting.add(task_id)
+        for upstream_id in sorted(graph.get(task_id, ())):
+            visit(upstream_id)
+        visiting.discard(task_id)
+        done.add(task_id)
+        order.append(task_id)
+
+    for task_id in sorted(graph):
+        visit(task_id)
+    return order
+
+
+def ancestors(graph, task_id):
+    """Returns every task a task waits for, directly or not."""
+    seen = set()
+    pending = list(graph.get(task_id, ()))
+    while pending:
+        upstream_id = pending.pop()
+        if upstream_id not in seen:
+            seen.add(upstream_id)
+            pending.extend(graph.get(upstream_id, ()))
+    return seen
+
+
+@pytest.fixture
+def graph():
+    return task_graph(DDLS, s3_table_keys, sas_table_configs)
+
+
+@pytest.mark.parametrize('build', [
+    lambda: task_graph(DDLS, s3_table_keys, sas_table_configs),
+    lambda: barrier_task_graph(SqlQueriesCreate.dim_tables, SqlQueriesCreate.staging_tables,
+                               s3_table_keys, sas_table_configs),
+])
+def test_graphs_are_acyclic_and_closed(build):
+    graph = build()
+
+    order = topological_order(graph)
+    assert order[0] == START_TASK_ID
+    assert order[-1] == END_TASK_ID
+    # Every upstream task is a task of the graph.
+    assert set().union(*graph.values()) <= set(graph)
+
+
+def test_tables_are_created_after_the_tables_they_reference(graph):
+    references = table_dependencies(DDLS.values())
+
+    assert references['staging_immigration'] >= {'dim_i94cit', 'dim_i94port', 'dim_i94addr'}
+    for table, ref_tables in references.items():
+        assert graph[CREATE_IDS[table]] >= {CREATE_IDS[ref_table] for ref_table in ref_tables}
+
+
+def test_every_table_is_its_own_chain(graph):
+    for table in s3_table_keys + sas_table_configs:
+        assert CREATE_IDS[table['name'].split('.')[-1]] in graph[load_task_id(table)]
+        assert graph[check_task_id(table)] == {load_task_id(table)}
+        assert check_task_id(table) in graph[MAINTENANCE_TASK_ID]
+    assert graph[END_TASK_ID] == {MAINTENANCE_TASK_ID}
+
+
+def test_dimension_loads_do_not_wait_for_the_staging_copies(graph):
+    s3_loads = {load_task_id(table) for table in s3_table_keys}
+    for table in sas_table_configs:
+        assert graph[load_task_id(table)] >= {CACHE_LABELS_TASK_ID}
+        assert not ancestors(graph, load_task_id(table)) & s3_loads
+
+
+def test_key_rewrites_wait_for_the_dimension_loads(graph):
+    dims = {table['value']: load_task_id(table) for table in sas_table_configs}
+    for table in s3_table_keys:
+        for sas_value in table.get('key_columns', {}).values():
+            assert dims[sas_value] in graph[preprocess_task_id(table)]
+
+
+def test_critical_path():
+    graph = {'a': set(), 'b': {'a'}, 'c': {'a'}, 'd': {'b', 'c'}}
+
+    seconds, path = critical_path(graph, {'a': 1.0, 'b': 5.0, 'c': 2.0, 'd': 1.0})
+
+    assert seconds == 7.0
+    assert path == ['a', 'b', 'd']
@@ -0,0 +1,91 @@
+from datetime import date
+
+import pyarrow as pa
+import pytest
+
+from helpers.temperature_reduce import SOURCE_SCHEMA, city_key, filter_batch, normalize_key, reduce_temperatures
+
+
+SCHEMA = SOURCE_SCHEMA.append(pa.field('city_key', pa.string()))
+
+
+def batch(rows):
+    """Builds a SOURCE_SCHEMA batch from (dt, temperature, city, country, latitude) tuples."""
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays([pa.array(columns[0], pa.date32()),
+                                       pa.array(columns[1], pa.float64()),
+                                       pa.array([0.5] * len(rows), pa.float64()),
+                                       pa.array(columns[2], pa.string()),
+                                       pa.array(columns[3], pa.string()),
+                                       pa.array(columns[4], pa.string()),
+                                       pa.array(['71.05W'] * len(rows), pa.string())], schema=SOURCE_SCHEMA)
+
+
+def rows_of(batches):
+    return pa.Table.from_batches(list(batches), schema=SCHEMA).to_pylist()
+
+
+BATCHES = [
+    batch([(date(1999, 12, 1), 1.0, 'Boston', 'United States', '42.59N'),
+           (date(2000, 1, 1), 2.0, 'Boston', 'United States', '42.59N'),
+           (date(2000, 1, 1), 9.0, 'Århus', 'Denmark', '57.05N')]),
+    batch([(date(2000, 2, 1), 4.0, 'Boston', 'United States', '42.59N'),
+           (date(2000, 3, 1), None, 'Boston', 'United States', '42.59N'),
+           # Another Springfield of the same country keeps its own rows.
+           (date(2000, 1, 1), 5.0, 'Springfield', 'United States', '39.38N'),
+           (date(2000, 2, 1), 7.0, 'Springfield', 'United States', '42.59N')]),
+]
+
+
+def test_normalize_key():
+    keys = normalize_key(pa.array([' New  York-City', 'Århus', 'St. Louis', None]))
+
+    assert keys.to_pylist() == ['NEW YORK CITY', 'ÅRHUS', 'ST LOUIS', None]
+    assert city_key(pa.array(['Boston']), pa.array(['United States'])).to_pylist() == ['BOSTON|UNITED STATES']
+
+
+def test_filter_batch():
+    kept = filter_batch(BATCHES[0], start_date='2000-01-01', end_date='2000-02-01', countries=['United States'])
+
+    assert kept.column('dt').to_pylist() == [date(2000, 1, 1)]
+    assert filter_batch(BATCHES[0]).num_rows == 3
+
+
+def test_reduce_temperatures_filters_and_keys_rows():
+    rows = rows_of(reduce_temperatures(BATCHES, SCHEMA, start_date='2000-01-01', countries=['United States']))
+
+    assert [(row['dt'], row['City'], row['AverageTemperature']) for row in rows] == [
+        (date(2000, 1, 1), 'Boston', 2.0), (date(2000, 2, 1), 'Boston', 4.0), (date(2000, 3, 1), 'Boston', None),
+        (date(2000, 1, 1), 'Springfield', 5.0), (date(2000, 2, 1), 'Springfield', 7.0)]
+    assert {row['city_key'] for row in rows} == {'BOSTON|UNITED STATES', 'SPRINGFIELD|UNITED STATES'}
+
+
+def test_reduce_temperatures_averages_per_city_and_year():
+    rows = rows_of(reduce_temperatures(BATCHES, SCHEMA, countries=['United States'], aggregate='year'))
+
+    means = {(row['dt'], row['City'], row['Latitude']): row['AverageTemperature'] for row in rows}
+    # The months without a measurement are left out of the mean, and the two
+    # Springfields are averaged apart.
+    assert means == {(date(1999, 1, 1), 'Boston', '42.59N'): 1.0,
+                     (date(2000, 1, 1), 'Boston', '42.59N'): 3.0,
+                     (date(2000, 1, 1), 'Springfield', '39.38N'): 5.0,
+                     (date(2000, 1, 1), 'Springfield', '42.59N'): 7.0}
+    assert all(row['AverageTemperatureUncertainty'] == 0.5 for row in rows)
+
+
+def test_reduce_temperatures_combines_every_batch():
+    more = [batch([(date(2000, 4, 1), 6.0, 'Boston', 'United States', '42.59N'),
+                   (date(2000, 5, 1), None, 'Portland', 'United States', '43.39N')]),
+            batch([(date(2000, 6, 1), None, 'Portland', 'United States', '43.39N')])]
+    rows = rows_of(reduce_temperatures(BATCHES + more, SCHEMA, start_date='2000-01-01', countries=['United States'],
+                                       aggregate='year'))
+
+    means = {(row['City'], row['Latitude']): row['AverageTemperature'] for row in rows}
+    # A city without any measurement in the period gets a null mean.
+    assert means == {('Boston', '42.59N'): 4.0, ('Portland', '43.39N'): None,
+                     ('Springfield', '39.38N'): 5.0, ('Springfield', '42.59N'): 7.0}
+
+
+def test_reduce_temperatures_rejects_unknown_periods():
+    with pytest.raises(ValueError, match='week'):
+        list(reduce_temperatures(BATCHES, SCHEMA, aggregate='week'))